@@ -0,0 +1,108 @@
+"""Benchmarks of the backtest pipeline for airspeed velocity (asv)
+
+Run with `asv run` from the repository root. The stages and inputs are
+those of `pairs bench` (see `pairs.core.bench`); asv times them and
+measures the peak memory of the process, and keeps the results of every
+commit.
+
+"""
+import numpy as np
+from pairs.core import bench
+from pairs.core.analyze.cointegration import is_cointegrated
+from pairs.core.analyze.model import model
+from pairs.core.backtest import describe
+from pairs.core.backtest import kernel
+from pairs.core.backtest.backtest import _run_reference
+from pairs.core.backtest.calculate_inputs import setup
+from pairs.core.backtest.ledger import positions_frame
+
+PARAMS = bench.PARAMS
+COLUMNS = ['price_l', 'price_r', 'size_l', 'size_r', 'spread', 'band_upper',
+           'band_lower']
+EXITS = ['exit_band_upper', 'exit_band_lower']
+
+
+def exit_bands(data):
+    return {x: data[x].to_numpy(dtype=np.float64) for x in EXITS}
+
+
+class Pipeline:
+    """Stages whose cost grows linearly with the number of bars"""
+
+    params = ['fb_amzn', '1k', '100k', '10M']
+    param_names = ['input']
+    timeout = 600
+
+    def setup(self, name):
+        self.df = bench.load_input(name)
+        self.data = setup(self.df, PARAMS, engine='incremental')
+        self.arrays = [self.data[x].to_numpy(dtype=np.float64)
+                       for x in COLUMNS]
+        self.exits = exit_bands(self.data)
+
+    def time_setup(self, name):
+        setup(self.df, PARAMS, engine='incremental')
+
+    def peakmem_setup(self, name):
+        setup(self.df, PARAMS, engine='incremental')
+
+    def time_backtest(self, name):
+        kernel.run_state_machine(*self.arrays, PARAMS['window_std'],
+                                 PARAMS['factor_profit_std'],
+                                 PARAMS['factor_loss_size'], **self.exits)
+
+    def time_model(self, name):
+        last = self.data.iloc[-PARAMS['window_std'] - 1:]
+        model(last, last['size_l'].iat[-1], last['size_r'].iat[-1])
+
+
+class Stats:
+    """Stages that run the cointegration test, see `bench.MAX_BARS`"""
+
+    params = ['fb_amzn', '1k', '100k']
+    param_names = ['input']
+    timeout = 600
+
+    def setup(self, name):
+        self.data = setup(bench.load_input(name), PARAMS,
+                          engine='incremental')
+        trades = kernel.run_state_machine(
+            *[self.data[x].to_numpy(dtype=np.float64) for x in COLUMNS],
+            PARAMS['window_std'], PARAMS['factor_profit_std'],
+            PARAMS['factor_loss_size'], **exit_bands(self.data))
+        self.positions = positions_frame(self.data, trades)
+        self.stats = describe.create_stats(self.data, self.positions,
+                                           PARAMS)
+
+    def time_is_cointegrated(self, name):
+        is_cointegrated(self.data)
+
+    def time_create_stats(self, name):
+        describe.create_stats(self.data, self.positions, PARAMS)
+
+    def time_create_stats_table(self, name):
+        describe.create_stats_table(self.data, self.positions, self.stats)
+
+
+class ReferenceLoop:
+    """The row-by-row reference engine
+
+    Every bar reads its own row only, so time and memory traffic grow
+    linearly with the number of bars; shifting the whole dataframe on
+    every bar made them grow quadratically.
+
+    """
+
+    params = ['fb_amzn', '1k', '5k']
+    param_names = ['input']
+    timeout = 600
+
+    def setup(self, name):
+        self.data = setup(bench.load_input(name), PARAMS,
+                          engine='incremental')
+
+    def time_reference(self, name):
+        _run_reference(self.data, PARAMS, lambda x: x)
+
+    def peakmem_reference(self, name):
+        _run_reference(self.data, PARAMS, lambda x: x)
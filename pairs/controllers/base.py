@@ -2,14 +2,52 @@
 from cement import Controller, ex
 from cement.utils.version import get_version_banner
 from ..core.version import get_version
-from ..core.backtest.backtest import backtest
+from ..core.exc import PairsError
+from ..core import options
 from ..core.helpers import fmt_term
-from os.path import join, exists
+from os import makedirs
+from os.path import join, exists, dirname
 from textwrap import wrap
+import json
 import yaml
 from pathlib import Path
 HOME = str(Path.home())
 
+# the backtest, data and table modules import pandas, statsmodels and
+# yfinance, which take a second or more to import, so commands import
+# them when they run and `pairs --help` or `--version` stays fast
+
+# intervals of yfinance backtested with the backtest_daily params
+DAILY_INTERVALS = ['1d', '5d', '1wk', '1mo', '3mo']
+
+INTRADAY_PARAMS = options.PARAM_NAMES
+
+# arguments of the param values searched by sweep and walk-forward
+GRID_ARGUMENTS = [
+    ( [ '--window-std' ],
+     { 'help' : ('values for window_std, either a list "5,10,20" '
+                 'or a range "start:stop:step". Params that are '
+                 'not passed are taken from the config.'),
+        'action'  : 'store',
+        'dest' : 'window_std' } ),
+    ( [ '--window-corr' ],
+     { 'help' : 'values for window_corr, see --window-std',
+        'action'  : 'store',
+        'dest' : 'window_corr' } ),
+    ( [ '--factor-std' ],
+     { 'help' : 'values for factor_std, see --window-std',
+        'action'  : 'store',
+        'dest' : 'factor_std' } ),
+    ( [ '--factor-profit-std' ],
+     { 'help' : 'values for factor_profit_std, see --window-std',
+        'action'  : 'store',
+        'dest' : 'factor_profit_std' } ),
+    ( [ '--factor-loss-size' ],
+     { 'help' : 'values for factor_loss_size, see --window-std',
+        'action'  : 'store',
+        'dest' : 'factor_loss_size' } ),
+]
+
 VERSION_BANNER = """
 A CLI for evaluating pairs trades %s
 %s
@@ -45,6 +83,33 @@ class Base(Controller):
         self.app.args.print_help()
 
 
+    def _grid(self):
+        """Param values passed with `GRID_ARGUMENTS`"""
+        from ..core.backtest import sweep as sw
+        grid = dict()
+        for k in options.PARAM_NAMES:
+            if getattr(self.app.pargs, k) is not None:
+                dtype = int if k.startswith('window') else float
+                grid[k] = sw.parse_values(getattr(self.app.pargs, k), dtype)
+        return grid
+
+
+    def _provider(self):
+        """Data provider named by the 'provider' config setting"""
+        label = self.app.config.get('pairs', 'provider')
+        return self.app.handler.resolve('provider', label, setup=True)
+
+
+    def _days(self):
+        return int(self.app.config.get('pairs', 'history_days'))
+
+
+    def _costs(self):
+        """Cost model of the 'costs' config sections"""
+        from ..core.backtest.costs import CostModel
+        return CostModel.from_config(self.app.config)
+
+
     @ex(help='Setup and modify app configuration settings.')
     def configure(self):
         """Setup app configuration"""
@@ -85,6 +150,7 @@ class Base(Controller):
                         cf.set(section, key, value)
 
         p('')
+        makedirs(dirname(fp), exist_ok=True)
         with open(fp, 'w') as f:
             _ = yaml.dump(cf.get_dict(), f)
         p(f"Done, wrote (overwrote) config file to '{fp}'.")
@@ -101,22 +167,529 @@ class Base(Controller):
                          'then "FB,AMZN" will be used as an example.'),
                 'action'  : 'store',
                 'dest' : 'symbols' } ),
+            ( [ '-i', '--interval' ],
+             { 'help' : ('bar interval e.g. "1d" or "1m". Intervals shorter '
+                         'than a day run an intraday backtest with the '
+                         'backtest_intraday config section.'),
+                'action'  : 'store',
+                'dest' : 'interval' } ),
+            ( [ '--profile' ],
+             { 'help' : ('log wall time, CPU time and allocations of every '
+                         'stage of the backtest'),
+                'action'  : 'store_true',
+                'dest' : 'profile' } ),
+            ( [ '--profile-output' ],
+             { 'help' : ('with --profile, also write cProfile stats to this '
+                         'file (for pstats or snakeviz)'),
+                'action'  : 'store',
+                'dest' : 'profile_output' } ),
         ],
     )
     def analyze_pair(self):
         """Perform a backtest on a pair"""
 
+        from ..core.profiling import Profiler
+        pargs = self.app.pargs
+        profiler = None
+        if pargs.profile:
+            profiler = Profiler(log=self.app.log.info,
+                                cprofile=pargs.profile_output).start()
+        try:
+            self._analyze_pair(profiler)
+        finally:
+            if profiler is not None:
+                profiler.stop()
+                profiler.report()
+
+
+    def _analyze_pair(self, profiler=None):
+        from ..core.backtest.backtest import backtest
+        interval = self.app.pargs.interval
+        if interval is not None and interval not in DAILY_INTERVALS:
+            return self._analyze_intraday(interval, profiler)
+
         params = self.app.config.get_dict()['backtest_daily']
 
         if self.app.pargs.symbols is not None:
             symbols = self.app.pargs.symbols.split(',')
             print(f"running backtest for {'-'.join(symbols)}:")
             df, positions, stats, table = \
-                backtest(symbols=symbols, params=params)
+                backtest(symbols=symbols, params=params, days=self._days(),
+                         interval=interval or '1d',
+                         provider=self._provider(), profiler=profiler,
+                         costs=self._costs(), verbose=True,
+                         log=self.app.log.debug)
             print(f"done, here are stats for {'-'.join(symbols)}:")
             print(table)
         else:
+            if interval not in [None, '1d']:
+                raise PairsError('The archived FB-AMZN data has daily bars, '
+                                 'pass --symbols for other intervals.')
             print(f"running backtest for FB-AMZN using archived data:")
-            df, positions, stats, table = backtest(example=True, params=params)
+            df, positions, stats, table = backtest(example=True, params=params,
+                                                   profiler=profiler,
+                                                   costs=self._costs(),
+                                                   verbose=True,
+                                                   log=self.app.log.debug)
             print(f"done, here are stats for FB-AMZN:")
             print(table)
+
+
+    def _analyze_intraday(self, interval, profiler=None):
+        """Perform a memory-bounded backtest on intraday bars"""
+        from ..core.backtest.intraday import backtest_intraday
+        if self.app.pargs.symbols is None:
+            raise PairsError('Intraday backtests need --symbols.')
+        symbols = self.app.pargs.symbols.split(',')
+        cf = self.app.config.get_dict()['backtest_intraday']
+        params = {k: cf[k] for k in INTRADAY_PARAMS + options.SETUP_PARAMS
+                  if k in cf}
+        print(f"running {interval} backtest for {'-'.join(symbols)}:")
+        df, positions, stats, table = backtest_intraday(
+            symbols=symbols, params=params, interval=interval,
+            days=int(cf['history_days']), memory_mb=float(cf['memory_mb']),
+            dtype=cf['dtype'], provider=self._provider(), profiler=profiler,
+            costs=self._costs(), verbose=True, log=self.app.log.debug)
+        print(f"done, here are stats for {'-'.join(symbols)}:")
+        print(table)
+
+
+    @ex(
+        help='Backtest every combination of a grid of params.',
+
+        arguments=[
+            ( [ '-s', '--symbols' ],
+             { 'help' : ('ticker symbols e.g. "FB,AMZN". If none passed, '
+                         'then archived "FB,AMZN" data will be used.'),
+                'action'  : 'store',
+                'dest' : 'symbols' } ),
+        ] + GRID_ARGUMENTS + [
+            ( [ '-w', '--workers' ],
+             { 'help' : 'number of worker processes, defaults to all CPUs',
+                'action'  : 'store',
+                'type' : int,
+                'dest' : 'workers' } ),
+            ( [ '--cache-mb' ],
+             { 'help' : ('memory budget in megabytes of the cache of '
+                         'prepared data in each worker'),
+                'action'  : 'store',
+                'type' : float,
+                'default' : 256,
+                'dest' : 'cache_mb' } ),
+            ( [ '-o', '--output' ],
+             { 'help' : 'write the full results table to this CSV file',
+                'action'  : 'store',
+                'dest' : 'output' } ),
+            ( [ '-n', '--top' ],
+             { 'help' : 'number of best combinations to display',
+                'action'  : 'store',
+                'type' : int,
+                'default' : 10,
+                'dest' : 'top' } ),
+        ],
+    )
+    def sweep(self):
+        """Backtest a grid of params on a pair"""
+        from tabulate import tabulate
+        from ..core.backtest import sweep as sw
+        from ..core.backtest.get_data import get_pair
+        from ..core.backtest.helpers import load_example
+
+        pargs = self.app.pargs
+        defaults = self.app.config.get_dict()['backtest_daily']
+        grid = self._grid()
+
+        if pargs.symbols is not None:
+            symbols = pargs.symbols.split(',')
+            print(f"retrieving data for {'-'.join(symbols)}...")
+            df = get_pair(symbols[0], symbols[1], days=self._days(),
+                          provider=self._provider())
+        else:
+            symbols = ['FB', 'AMZN']
+            df = load_example()
+
+        print(f"running sweep for {'-'.join(symbols)}...")
+        results = sw.sweep(df, grid, defaults=defaults,
+                           max_workers=pargs.workers,
+                           cache_mb=pargs.cache_mb, costs=self._costs(),
+                           symbols=symbols)
+        print(f"done, backtested {len(results):,.0f} combinations.")
+        if pargs.output:
+            results.to_csv(pargs.output, index=False)
+            print(f"wrote results to '{pargs.output}'.")
+
+        cols = [f"param_{k}" for k in options.PARAM_NAMES] \
+            + ['count_trades', 'winrate', 'sum_profit', 'sum_costs',
+               'sum_profit_net', 'loss_max']
+        print(tabulate(results[cols].head(pargs.top), headers=cols,
+                       tablefmt='pipe'))
+
+
+    @ex(
+        help=('Walk-forward optimization: pick params on rolling train '
+              'windows and backtest them on the following test windows.'),
+
+        arguments=[
+            ( [ '-s', '--symbols' ],
+             { 'help' : ('ticker symbols e.g. "FB,AMZN". If none passed, '
+                         'then archived "FB,AMZN" data will be used.'),
+                'action'  : 'store',
+                'dest' : 'symbols' } ),
+        ] + GRID_ARGUMENTS + [
+            ( [ '--train' ],
+             { 'help' : 'bars of each train window',
+                'action'  : 'store',
+                'type' : int,
+                'default' : 250,
+                'dest' : 'train' } ),
+            ( [ '--test' ],
+             { 'help' : 'bars of each test window',
+                'action'  : 'store',
+                'type' : int,
+                'default' : 60,
+                'dest' : 'test' } ),
+            ( [ '--step' ],
+             { 'help' : 'bars between the starts of folds, at least and '
+                        'by default --test',
+                'action'  : 'store',
+                'type' : int,
+                'dest' : 'step' } ),
+            ( [ '-m', '--metric' ],
+             { 'help' : 'train metric the params are picked by',
+                'action'  : 'store',
+                'choices' : options.WALK_FORWARD_METRICS,
+                'default' : 'sum_profit',
+                'dest' : 'metric' } ),
+            ( [ '-w', '--workers' ],
+             { 'help' : 'number of worker processes, defaults to all CPUs',
+                'action'  : 'store',
+                'type' : int,
+                'dest' : 'workers' } ),
+            ( [ '-o', '--output' ],
+             { 'help' : 'write the out-of-sample positions to this CSV file',
+                'action'  : 'store',
+                'dest' : 'output' } ),
+        ],
+    )
+    def walk_forward(self):
+        """Walk-forward optimization of params on a pair"""
+        from tabulate import tabulate
+        from ..core.backtest import walkforward as wf
+        from ..core.backtest.get_data import get_pair
+        from ..core.backtest.helpers import load_example
+
+        pargs = self.app.pargs
+        defaults = self.app.config.get_dict()['backtest_daily']
+        grid = self._grid()
+
+        if pargs.symbols is not None:
+            symbols = pargs.symbols.split(',')
+            print(f"retrieving data for {'-'.join(symbols)}...")
+            df = get_pair(symbols[0], symbols[1], days=self._days(),
+                          provider=self._provider())
+        else:
+            symbols = ['FB', 'AMZN']
+            df = load_example()
+
+        print(f"running walk-forward for {'-'.join(symbols)}...")
+        _, positions, stats, folds = wf.walk_forward(
+            df, grid, defaults=defaults, train=pargs.train, test=pargs.test,
+            step=pargs.step, metric=pargs.metric,
+            max_workers=pargs.workers, costs=self._costs(), symbols=symbols)
+        print(f"done, {len(folds):,.0f} folds, "
+              f"{stats['count_trades']:,.0f} out-of-sample trades, "
+              f"profit {stats['sum_profit']:,.2f}, "
+              f"net of costs {stats['sum_profit_net']:,.2f}.")
+        if pargs.output:
+            positions.to_csv(pargs.output, index=False)
+            print(f"wrote positions to '{pargs.output}'.")
+
+        cols = ['date_test', 'date_end'] \
+            + [f"param_{k}" for k in options.PARAM_NAMES] \
+            + ['score_train', 'count_trades_test', 'sum_profit_test',
+               'sum_profit_net_test']
+        print(tabulate(folds[cols], headers=cols, tablefmt='pipe'))
+
+
+    @ex(
+        help='Screen a universe of symbols for cointegrated pairs.',
+
+        arguments=[
+            ( [ '-s', '--symbols' ],
+             { 'help' : 'ticker symbols e.g. "XLK,XLP,XLE,XLF"',
+                'action'  : 'store',
+                'dest' : 'symbols' } ),
+            ( [ '-f', '--file' ],
+             { 'help' : ('CSV or Parquet panel of prices, either wide (a '
+                         '"date" column and a column per symbol) or long '
+                         '(columns "date", "symbol" and "close")'),
+                'action'  : 'store',
+                'dest' : 'file' } ),
+            ( [ '--min-corr' ],
+             { 'help' : ('only test pairs whose returns correlate by at '
+                         'least this much'),
+                'action'  : 'store',
+                'type' : float,
+                'default' : 0.5,
+                'dest' : 'min_corr' } ),
+            ( [ '--min-coverage' ],
+             { 'help' : ('drop symbols with prices on less than this share '
+                         'of the dates'),
+                'action'  : 'store',
+                'type' : float,
+                'default' : options.MIN_COVERAGE,
+                'dest' : 'min_coverage' } ),
+            ( [ '-w', '--workers' ],
+             { 'help' : 'number of worker processes, defaults to all CPUs',
+                'action'  : 'store',
+                'type' : int,
+                'dest' : 'workers' } ),
+            ( [ '-o', '--output' ],
+             { 'help' : 'write the full ranking to this CSV file',
+                'action'  : 'store',
+                'dest' : 'output' } ),
+            ( [ '-n', '--top' ],
+             { 'help' : 'number of best pairs to display',
+                'action'  : 'store',
+                'type' : int,
+                'default' : 20,
+                'dest' : 'top' } ),
+        ],
+    )
+    def screen(self):
+        """Rank the pairs of a universe by cointegration"""
+        from tabulate import tabulate
+        from ..core.analyze import screen as sc
+        from ..core.backtest.get_data import get_prices
+
+        pargs = self.app.pargs
+        if pargs.file is not None:
+            prices = sc.load_panel(pargs.file)
+        elif pargs.symbols is not None:
+            symbols = pargs.symbols.split(',')
+            print(f"retrieving data for {len(symbols):,.0f} symbols...")
+            prices = get_prices(symbols, days=self._days(),
+                                provider=self._provider())
+        else:
+            self.app.args.print_help()
+            return
+
+        n = prices.shape[1]
+        print(f"screening {n*(n - 1)//2:,.0f} pairs of {n:,.0f} symbols...")
+        ranked = sc.screen(prices, min_corr=pargs.min_corr,
+                           max_workers=pargs.workers,
+                           min_coverage=pargs.min_coverage,
+                           log=self.app.log.warning)
+        print(f"done, tested {len(ranked):,.0f} pairs with correlation of "
+              f"at least {pargs.min_corr:.2f}.")
+        if pargs.output:
+            ranked.to_csv(pargs.output, index=False)
+            print(f"wrote ranking to '{pargs.output}'.")
+        print(tabulate(ranked.head(pargs.top), headers=ranked.columns,
+                       tablefmt='pipe'))
+
+
+    @ex(
+        help='Backtest many pairs as one portfolio.',
+
+        arguments=[
+            ( [ '-p', '--pairs' ],
+             { 'help' : 'pairs of ticker symbols e.g. "FB/AMZN,XLK/QQQ"',
+                'action'  : 'store',
+                'dest' : 'pairs' } ),
+            ( [ '-f', '--file' ],
+             { 'help' : ('CSV file with columns "symbol_l" and "symbol_r", '
+                         'e.g. the output of "pairs screen"'),
+                'action'  : 'store',
+                'dest' : 'file' } ),
+            ( [ '-n', '--top' ],
+             { 'help' : 'number of pairs to take from --file',
+                'action'  : 'store',
+                'type' : int,
+                'default' : 20,
+                'dest' : 'top' } ),
+            ( [ '-a', '--allocation' ],
+             { 'help' : ('"equal" splits the capital between the pairs, '
+                         '"fixed" trades one unit of every spread'),
+                'action'  : 'store',
+                'choices' : options.ALLOCATIONS,
+                'default' : 'equal',
+                'dest' : 'allocation' } ),
+            ( [ '-c', '--capital' ],
+             { 'help' : 'starting capital',
+                'action'  : 'store',
+                'type' : float,
+                'default' : 1e6,
+                'dest' : 'capital' } ),
+            ( [ '--min-coverage' ],
+             { 'help' : ('share of the dates every symbol needs prices on, '
+                         '0 backtests over the dates of all symbols'),
+                'action'  : 'store',
+                'type' : float,
+                'default' : options.MIN_COVERAGE,
+                'dest' : 'min_coverage' } ),
+            ( [ '-o', '--output' ],
+             { 'help' : 'write the equity curve to this CSV file',
+                'action'  : 'store',
+                'dest' : 'output' } ),
+        ],
+    )
+    def portfolio(self):
+        """Backtest a portfolio of pairs"""
+        import pandas as pd
+        from tabulate import tabulate
+        from ..core.backtest import portfolio as pf
+        from ..core.backtest.get_data import get_prices
+
+        pargs = self.app.pargs
+        if pargs.pairs is not None:
+            pairs = pf.parse_pairs(pargs.pairs)
+        elif pargs.file is not None:
+            ranked = pd.read_csv(pargs.file).head(pargs.top)
+            pairs = list(zip(ranked['symbol_l'], ranked['symbol_r']))
+        else:
+            self.app.args.print_help()
+            return
+
+        params = self.app.config.get_dict()['backtest_daily']
+        symbols = list(dict.fromkeys(s for pair in pairs for s in pair))
+        print(f"retrieving data for {len(symbols):,.0f} symbols...")
+        prices = get_prices(symbols, days=self._days(),
+                            provider=self._provider())
+        print(f"running backtest for {len(pairs):,.0f} pairs...")
+        equity, positions, summary = pf.portfolio_backtest(
+            prices, pairs, params, allocation=pargs.allocation,
+            capital=pargs.capital, min_coverage=pargs.min_coverage)
+        print(f"done, {len(positions):,.0f} trades from "
+              f"{equity.index.min()} to {equity.index.max()}, equity "
+              f"{equity['equity'].iloc[0]:,.2f} -> "
+              f"{equity['equity'].iloc[-1]:,.2f}.")
+        if pargs.output:
+            equity.to_csv(pargs.output)
+            print(f"wrote equity curve to '{pargs.output}'.")
+        print(tabulate(summary, headers=summary.columns, tablefmt='pipe',
+                       showindex=False))
+
+
+    @ex(
+        help='Inspect and prune the local cache of price data.',
+
+        arguments=[
+            ( [ '--prune-days' ],
+             { 'help' : 'delete entries not used in this many days',
+                'action'  : 'store',
+                'type' : float,
+                'dest' : 'prune_days' } ),
+            ( [ '--clear' ],
+             { 'help' : 'delete every entry',
+                'action'  : 'store_true',
+                'dest' : 'clear' } ),
+        ],
+    )
+    def cache(self):
+        """Inspect and prune the price cache"""
+        from tabulate import tabulate
+        from ..core.yahoo_finance_data.cache import PriceCache
+
+        pargs = self.app.pargs
+        cache = PriceCache.from_config(self.app.config)
+        if pargs.clear:
+            print(f"deleted {cache.clear():,.0f} entries.")
+        elif pargs.prune_days is not None:
+            count = cache.prune(pargs.prune_days*24*3600)
+            print(f"deleted {count:,.0f} entries not used in "
+                  f"{pargs.prune_days:g} days.")
+        count = cache.evict()
+        if count:
+            print(f"deleted {count:,.0f} entries to fit the size budget.")
+
+        e = cache.entries()
+        print(f"cache '{cache.path}' holds {len(e):,.0f} entries, "
+              f"{e['bytes'].sum()/2**20:,.1f} MB of "
+              f"{cache.max_bytes/2**20:,.0f} MB.")
+        if len(e):
+            cols = ['symbol', 'interval', 'bytes', 'accessed', 'modified']
+            print(tabulate(e[cols], headers=cols, tablefmt='pipe',
+                           showindex=False))
+
+
+    @ex(
+        help=('Benchmark the stages of the backtest on example and '
+              'synthetic data.'),
+
+        arguments=[
+            ( [ '-i', '--inputs' ],
+             { 'help' : ('inputs, "fb_amzn" for the archived data or bar '
+                         'counts of synthetic pairs'),
+                'action'  : 'store',
+                'default' : ','.join(options.BENCH_INPUTS),
+                'dest' : 'inputs' } ),
+            ( [ '--stages' ],
+             { 'help' : 'stages to time, defaults to all',
+                'action'  : 'store',
+                'default' : ','.join(options.BENCH_STAGES),
+                'dest' : 'stages' } ),
+            ( [ '-r', '--repeat' ],
+             { 'help' : 'maximum number of timed runs of each stage',
+                'action'  : 'store',
+                'type' : int,
+                'default' : 3,
+                'dest' : 'repeat' } ),
+            ( [ '--seed' ],
+             { 'help' : 'seed of the synthetic pairs',
+                'action'  : 'store',
+                'type' : int,
+                'default' : 0,
+                'dest' : 'seed' } ),
+            ( [ '-o', '--output' ],
+             { 'help' : 'write the results to this JSON file',
+                'action'  : 'store',
+                'dest' : 'output' } ),
+            ( [ '-c', '--compare' ],
+             { 'help' : ('JSON results of an earlier run to compare with, '
+                         'exits with 1 on a regression'),
+                'action'  : 'store',
+                'dest' : 'compare' } ),
+            ( [ '--tolerance' ],
+             { 'help' : 'slowdown (a fraction) reported as a regression',
+                'action'  : 'store',
+                'type' : float,
+                'default' : 0.25,
+                'dest' : 'tolerance' } ),
+        ],
+    )
+    def bench(self):
+        """Benchmark the backtest pipeline"""
+        import pandas as pd
+        from tabulate import tabulate
+        from ..core import bench
+
+        pargs = self.app.pargs
+        params = self.app.config.get_dict()['backtest_daily']
+        report = bench.run(inputs=pargs.inputs.split(','),
+                           stages=pargs.stages.split(','), params=params,
+                           repeat=pargs.repeat, seed=pargs.seed, log=print)
+        if pargs.output:
+            with open(pargs.output, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f"wrote results to '{pargs.output}'.")
+
+        results = pd.DataFrame(report['results'])
+        cols = [x for x in ['stage', 'input', 'bars', 'seconds',
+                            'bars_per_sec', 'peak_mb', 'skipped']
+                if x in results.columns]
+        fmt = {'bars': ',.0f', 'seconds': '.6f', 'bars_per_sec': ',.0f',
+               'peak_mb': ',.2f'}
+        print(tabulate(results[cols], headers=cols, tablefmt='pipe',
+                       showindex=False,
+                       floatfmt=[fmt.get(x, 'g') for x in cols]))
+
+        if pargs.compare:
+            with open(pargs.compare) as f:
+                base = json.load(f)
+            tb = bench.compare(base, report, tolerance=pargs.tolerance)
+            print(tabulate(tb, headers=tb.columns, tablefmt='pipe',
+                           showindex=False))
+            if tb['regression'].any():
+                print(f"{tb['regression'].sum():,.0f} regressions.")
+                self.app.exit_code = 1
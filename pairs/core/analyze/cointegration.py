@@ -1,7 +1,12 @@
 """Analyze cointegration of two assets"""
+import numpy as np
+from statsmodels.tsa.adfvalues import mackinnonp
 from statsmodels.tsa.stattools import coint
 import pandas as pd 
 
+# r-squared above which `coint` treats two series as collinear
+_COLLINEAR_R2 = 1 - 100*np.sqrt(np.finfo(float).eps)
+
 
 def is_cointegrated(df):
     """Returns True if price_l and price_r are cointegrated
@@ -24,7 +29,127 @@ def is_cointegrated(df):
     sl = (df.sort_values(by=['date'])[['price_l', 'price_r']].copy()
             .pct_change().dropna(subset=['price_l']))
 
-    # calculate the pvalue
-    _, pvalue, _ = coint(sl['price_l'], sl['price_r'])
+    return coint_pvalue(sl['price_l'], sl['price_r']) < 0.01
+
+
+def coint_pvalue(x, y):
+    """Return the p-value of the Engle-Granger test of `x` on `y`
+
+    `x` and `y` are the series as passed to `is_cointegrated` after it
+    has turned the prices into returns.
+
+    """
+    _, pvalue, _ = coint(x, y)
+
+    return pvalue
+
+
+def coint_many(x, pairs, chunk=512):
+    """Engle-Granger test of many pairs of columns of `x` at once
+
+    Returns the same p-values as calling `coint_pvalue(x[:, i], x[:, j])`
+    (i.e. `statsmodels.tsa.stattools.coint` with a constant and the ADF
+    lag length chosen by AIC) for every pair `(i, j)`, but runs the
+    regressions of all pairs as stacked linear algebra:
+
+    1. the cointegrating regressions `x_i = a + b*x_j` in closed form
+       from column means and covariances,
+    2. for every candidate lag length, the ADF regressions of the
+       residuals as one batched solve of the normal equations, which
+       gives the AIC of each pair and lag,
+    3. the ADF regression with the best lag of each pair, batched over
+       the pairs that share it.
+
+    The ADF t-statistics are turned into p-values with the MacKinnon
+    tables.
+
+    Parameters
+    ----------
+    x : ndarray
+        A (T, N) matrix with one series per column and no NaNs.
+
+    pairs : array_like
+        A (P, 2) array of column indices.
+
+    chunk : int
+        Number of pairs processed at once, which bounds the memory used
+        by the stacked regressors to about `chunk*T*maxlag` floats.
+
+    Returns
+    -------
+    pvalues : ndarray
+        The p-value of each pair.
+
+    """
+    x = np.asarray(x, dtype=float)
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    stats = np.empty(len(pairs))
+    for start in range(0, len(pairs), chunk):
+        p = pairs[start:start + chunk]
+        stats[start:start + chunk] = _eg_stats(x[:, p[:, 0]], x[:, p[:, 1]])
+
+    return np.array([mackinnonp(t, regression='c', N=2) for t in stats])
+
+
+def _eg_stats(y0, y1):
+    """ADF t-statistics of the cointegrating residuals, one per column"""
+    nobs = y0.shape[0]
+
+    # cointegrating regression with a constant
+    d0 = y0 - y0.mean(axis=0)
+    d1 = y1 - y1.mean(axis=0)
+    var1 = (d1*d1).sum(axis=0)
+    cov = (d0*d1).sum(axis=0)
+    beta = cov / var1
+    resid = d0 - beta*d1
+    r2 = cov*cov / (var1*(d0*d0).sum(axis=0))
+    collinear = r2 >= _COLLINEAR_R2
+
+    # lag length as in `adfuller` without deterministic terms
+    maxlag = int(np.ceil(12*np.power(nobs/100, 1/4)))
+    maxlag = min(nobs//2 - 1, maxlag)
+    xdiff = np.diff(resid, axis=0)
+
+    # regressors for all lags on the common sample: the lagged level and
+    # the lagged differences, shape (pairs, obs, 1 + maxlag)
+    n = len(xdiff) - maxlag
+    cols = [resid[-n - 1:-1]] + [xdiff[maxlag - k:maxlag - k + n]
+                                 for k in range(1, maxlag + 1)]
+    xall = np.stack(cols, axis=-1).transpose(1, 0, 2)
+    yall = xdiff[-n:].T
+
+    # the normal equations of every lag are leading blocks of these
+    xtx = xall.transpose(0, 2, 1) @ xall
+    xty = np.einsum('pnk,pn->pk', xall, yall)
+    yty = (yall*yall).sum(axis=1)
+
+    best_aic = np.full(len(beta), np.inf)
+    best_lag = np.zeros(len(beta), dtype=np.int64)
+    for lag in range(maxlag + 1):
+        k = lag + 1
+        params = np.linalg.solve(xtx[:, :k, :k], xty[:, :k, None])[..., 0]
+        ssr = yty - (params*xty[:, :k]).sum(axis=1)
+        llf = -n/2*(np.log(2*np.pi) + np.log(ssr/n) + 1)
+        aic = -2*llf + 2*(lag + 1)
+        better = aic < best_aic
+        best_aic[better] = aic[better]
+        best_lag[better] = lag
+
+    # rerun the regression with the best lag on its own (longer) sample
+    tstat = np.empty(len(beta))
+    for lag in np.unique(best_lag):
+        m = best_lag == lag
+        n = len(xdiff) - lag
+        cols = [resid[-n - 1:-1, m]] + [xdiff[lag - k:lag - k + n, m]
+                                        for k in range(1, lag + 1)]
+        xs = np.stack(cols, axis=-1).transpose(1, 0, 2)
+        ys = xdiff[-n:, m].T
+        xtx_inv = np.linalg.inv(xs.transpose(0, 2, 1) @ xs)
+        params = xtx_inv @ np.einsum('pnk,pn->pk', xs, ys)[..., None]
+        u = ys - (xs @ params)[..., 0]
+        sigma2 = (u*u).sum(axis=1) / (n - (lag + 1))
+        tstat[m] = params[:, 0, 0] / np.sqrt(sigma2*xtx_inv[:, 0, 0])
+
+    tstat[collinear] = -np.inf
 
-    return pvalue < 0.01
+    return tstat
@@ -1,10 +1,14 @@
 """Distribution model for spread"""
-from numpy.random import multivariate_normal
+from statistics import NormalDist
 import numpy as np
 import pandas as pd
+from ..exc import PairsError
 
 
-def model(sl, size_l, size_r, N=10000,):
+PERCENTILES = [0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99]
+
+
+def model(sl, size_l, size_r, N=10000, method='analytic', seed=0):
     """Fit a multivariate normal model to prices and return description
 
     Returns summary statistics for the pair given by the dataframe `sl`
@@ -24,9 +28,18 @@ def model(sl, size_l, size_r, N=10000,):
 
     A multivariate normal model is fit to the equity values of the price
     series (i.e. the quantity of shares times the price for either
-    series) using `numpy.random.multivariate_normal`. Random samples are
-    generated from this model and the descriptive stats of the pair are
-    calculated. 
+    series). The spread is a linear combination of the two, so it is
+    normal with mean `mean_l - mean_r` and variance `var_l + var_r -
+    2*cov_lr`.
+
+    With `method="analytic"` the statistics are calculated from this
+    closed form. The percentiles are exact, while `min` and `max` are
+    approximations of the expected extremes of `N` draws (Blom's
+    formula) and `count` is `N`.
+
+    With `method="mc"` random samples are generated from the model with
+    `numpy.random.Generator.multivariate_normal` and the descriptive
+    stats of the samples are returned.
 
     Parameters
     ----------
@@ -42,22 +55,42 @@ def model(sl, size_l, size_r, N=10000,):
         The number of random variates to draw from in order to model the 
         spread. 
 
+    method : str
+        Either "analytic" or "mc".
+
+    seed : int
+        Seed for the random number generator used by `method="mc"`.
+
     Returns
     -------
     desc : dict
         A dict with descriptive statistics.
 
     """
-    sl = sl.copy()
-    sl['equity_l'] = size_l*sl['price_l']
-    sl['equity_r'] = size_r*sl['price_r']
-
-    cols = ['equity_l', 'equity_r']
-    x = sl[cols]
-    ds = multivariate_normal(x.mean().values, cov=np.cov(x.T.values), size=int(N))
-    ds = pd.DataFrame(ds, columns=cols)
-    ds['spread'] = (ds['equity_l'] - ds['equity_r'])
-    percentiles = [0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99]
-    d = ds['spread'].describe(percentiles=percentiles)
-
-    return d.to_dict()
+    x = np.vstack([size_l*sl['price_l'].to_numpy(dtype=float),
+                   size_r*sl['price_r'].to_numpy(dtype=float)])
+    mean = x.mean(axis=1)
+    cov = np.cov(x)
+
+    if method == 'mc':
+        rng = np.random.default_rng(seed)
+        ds = rng.multivariate_normal(mean, cov=cov, size=int(N))
+        ds = pd.DataFrame(ds, columns=['equity_l', 'equity_r'])
+        ds['spread'] = (ds['equity_l'] - ds['equity_r'])
+        d = ds['spread'].describe(percentiles=PERCENTILES)
+        return d.to_dict()
+    elif method != 'analytic':
+        raise PairsError(f"Unknown model method '{method}'.")
+
+    mu = mean[0] - mean[1]
+    std = np.sqrt(max(cov[0, 0] + cov[1, 1] - 2*cov[0, 1], 0))
+    dist = NormalDist(mu, std) if std > 0 else None
+    q = lambda p: dist.inv_cdf(p) if dist else mu
+
+    d = {'count': float(N), 'mean': mu, 'std': std}
+    d['min'] = q((1 - 0.375) / (N + 0.25))
+    for p in PERCENTILES:
+        d[f"{100*p:g}%"] = q(p)
+    d['max'] = q((N - 0.375) / (N + 0.25))
+
+    return d
@@ -0,0 +1,179 @@
+"""Screen a universe of symbols for cointegrated pairs"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from ..exc import PairsError
+from ..options import MIN_COVERAGE
+from .cointegration import coint_many
+
+# returns matrix shared by all tasks of a worker process, see `_init_worker`
+_RETURNS = None
+
+
+def load_panel(fp):
+    """Load a date x symbol price panel from a CSV or Parquet file
+
+    The file is either wide, with a 'date' column and one column of
+    prices per symbol, or long, with columns 'date', 'symbol' and
+    'close'. Returns the prices sorted by date, see `align`.
+
+    """
+    if fp.endswith('.parquet') or fp.endswith('.pq'):
+        df = pd.read_parquet(fp)
+    else:
+        df = pd.read_csv(fp)
+    df.columns = [str(x) for x in df.columns]
+    if 'date' not in df.columns:
+        raise PairsError(f"Panel '{fp}' must have a 'date' column.")
+    df['date'] = pd.to_datetime(df['date'])
+    if {'symbol', 'close'} <= set(df.columns):
+        df = df.pivot(index='date', columns='symbol', values='close')
+    else:
+        df = df.set_index('date')
+
+    return df.sort_index().astype(float)
+
+
+def align(prices, min_coverage=MIN_COVERAGE, log=lambda x: x):
+    """Sort by date and keep the dates on which every symbol has a price
+
+    Symbols with prices on less than `min_coverage` of the dates (those
+    on which any symbol has a price) are dropped first, so that a symbol
+    with a short history, e.g. a recent listing, does not cut the
+    history of all others. `log` is called with a warning naming them.
+
+    """
+    prices = prices.sort_index()
+    prices = prices.loc[:, prices.notna().any()]
+    prices = prices.loc[prices.notna().any(axis=1)]
+    coverage = prices.notna().mean()
+    short = coverage.index[coverage < min_coverage].tolist()
+    if short:
+        log(f"dropping {len(short):,.0f} symbols with prices on less than "
+            f"{min_coverage:.0%} of the dates: "
+            f"{', '.join(str(x) for x in short)}")
+        prices = prices.drop(columns=short)
+
+    return prices.dropna().astype(float)
+
+
+def returns_matrix(prices):
+    """Return the matrix of returns of a date x symbol price panel
+
+    Returns are calculated like `is_cointegrated` does for a pair.
+
+    """
+    p = prices.to_numpy(dtype=float)
+
+    return p[1:] / p[:-1] - 1
+
+
+def correlation_prefilter(returns, min_corr):
+    """Return the index pairs whose returns correlate by at least `min_corr`
+
+    The correlation matrix of all symbols is computed with a single
+    matrix multiplication of the standardized returns.
+
+    Returns
+    -------
+    pairs : ndarray
+        An array of shape (n, 2) with the column indices (i < j) of the
+        candidate pairs.
+
+    corr : ndarray
+        The correlation of each candidate pair.
+
+    """
+    z = returns - returns.mean(axis=0)
+    std = z.std(axis=0, ddof=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = z / std
+    c = (z.T @ z) / (len(z) - 1)
+
+    i, j = np.triu_indices(c.shape[0], k=1)
+    keep = c[i, j] >= min_corr
+    pairs = np.column_stack([i[keep], j[keep]])
+
+    return pairs, c[i[keep], j[keep]]
+
+
+def _init_worker(returns):
+    """Store the returns matrix once per worker process"""
+    global _RETURNS
+    _RETURNS = returns
+
+
+def _test_chunk(pairs):
+    """Cointegration p-values of a chunk of index pairs"""
+    return coint_many(_RETURNS, pairs).tolist()
+
+
+def screen(prices, min_corr=0.5, pvalue=0.01, max_workers=None,
+           min_coverage=MIN_COVERAGE, log=lambda x: x):
+    """Rank all pairs of a universe of symbols by cointegration
+
+    Every pair of the N symbols in `prices` is a candidate, i.e.
+    N*(N-1)/2 pairs. Pairs whose returns correlate by less than
+    `min_corr` are dropped with a cheap prefilter, the remaining pairs
+    are tested with the same Engle-Granger test as `is_cointegrated`.
+    The tests are run in batches by `coint_many`, fanned out over a
+    `ProcessPoolExecutor`.
+
+    Parameters
+    ----------
+    prices : DataFrame
+        Prices indexed by date, one column per symbol, see `align`.
+
+    min_corr : float
+        Minimum correlation of returns for a pair to be tested.
+
+    pvalue : float
+        Pairs with a p-value below this are flagged as cointegrated.
+
+    max_workers : int
+        Number of worker processes, defaults to the number of CPUs.
+        With 1, the tests are run in this process.
+
+    min_coverage : float
+        Share of the dates a symbol needs prices on, symbols with less
+        are dropped, see `align`.
+
+    log : callable
+        Called with warnings about dropped symbols.
+
+    Returns
+    -------
+    ranked : DataFrame
+        One row per tested pair with columns 'symbol_l', 'symbol_r',
+        'corr', 'pvalue' and 'is_cointegrated', sorted by p-value.
+
+    """
+    prices = align(prices, min_coverage, log)
+    if prices.shape[1] < 2 or len(prices) < 3:
+        raise PairsError('Need at least two symbols with shared history.')
+    returns = returns_matrix(prices)
+    pairs, corr = correlation_prefilter(returns, min_corr)
+
+    workers = min(max_workers or os.cpu_count() or 1, max(len(pairs), 1))
+    if workers <= 1:
+        _init_worker(returns)
+        pvalues = _test_chunk(pairs)
+    else:
+        chunks = np.array_split(pairs, 4*workers)
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_init_worker,
+                                 initargs=(returns,)) as ex:
+            pvalues = [x for r in ex.map(_test_chunk, chunks) for x in r]
+
+    symbols = np.asarray(prices.columns)
+    ranked = pd.DataFrame({
+        'symbol_l': symbols[pairs[:, 0]] if len(pairs) else [],
+        'symbol_r': symbols[pairs[:, 1]] if len(pairs) else [],
+        'corr': corr,
+        'pvalue': np.asarray(pvalues, dtype=float),
+    })
+    ranked['is_cointegrated'] = ranked['pvalue'] < pvalue
+
+    return (ranked.sort_values(by=['pvalue', 'corr'], ascending=[True, False])
+                  .reset_index(drop=True))
@@ -1,15 +1,68 @@
 """The primary backtesting module"""
+import numpy as np
 import pandas as pd
 from ..analyze.model import model
+from ..exc import PairsError
 from . import helpers
 from .get_data import get_pair
 from . import describe
 from .calculate_inputs import setup
+from . import kernel
+from .ledger import TradeLedger, positions_frame
+from ..profiling import NULL_PROFILER
 
 
 def backtest(df=pd.DataFrame(), symbols=(), verbose=False, params={},
-             example=True):
-    """Backtest pairs trade given by df"""
+             example=True, engine='vectorized', model_method='analytic',
+             setup_engine='pandas', setup_cache=None, price_cache=None,
+             provider=None, capture_snapshots=False, profiler=None,
+             costs=None, equity_dtype=None, days=365*2, interval='1d',
+             log=print):
+    """Backtest pairs trade given by df
+
+    `engine` selects the implementation of the position state machine.
+    "vectorized" (the default) precomputes entry candidates and searches
+    for exits over NumPy arrays, "reference" walks every bar of the
+    dataframe. Both return identical positions. "compiled" runs
+    `kernel.run_state_machine`, which always sets the profit target from
+    the closed-form std of the spread.
+
+    `model_method` is passed to `model` as `method` by the other
+    engines. With the default, "analytic", all engines agree.
+
+    `setup_engine` is passed to `setup` as `engine`. If a
+    `memo.SetupCache` is passed as `setup_cache`, a `df` that was set up
+    with the same prices and setup params before is taken from it.
+
+    `symbols` are retrieved from `provider`, a data provider (see
+    `pairs.core.providers`), which defaults to Yahoo Finance through the
+    optional `PriceCache` `price_cache`, as bars of `interval` (e.g.
+    "1d" or "1wk") of the last `days` days.
+
+    Trades are recorded in a `ledger.TradeLedger`. The rows of the entry
+    and exit bars are only copied into the positions (as the columns
+    'stats_entry' and 'stats_exit') if `capture_snapshots` is set.
+
+    With a `costs.CostModel` as `costs`, the trading costs of the
+    positions (at the rates of `symbols`) are added as the columns
+    `costs.COST_COLUMNS`, and the stats report the profit net of them.
+
+    The stats include the drawdown, Sharpe and Sortino ratios, time in
+    market and exposure of the mark-to-market equity curve, see
+    `equity.EquitySummary`. With `equity_dtype`, e.g. "float32" to save
+    memory when many curves are kept, the curve is also added to the
+    stats as an array under 'equity'.
+
+    With a `profiling.Profiler` as `profiler`, the stages 'fetch',
+    'setup', 'loop' (with 'model' calls), 'positions', 'stats' (with
+    'cointegration') and 'table' are measured, and their totals are
+    added to the stats under 'profile'.
+
+    If `verbose` is set, progress messages are passed to `log`, e.g. the
+    `debug` method of the app's logger.
+
+    """
+    prof = NULL_PROFILER if profiler is None else profiler
 
     # set dtypes in params 
     params['factor_loss_size'] = float(params['factor_loss_size'])
@@ -18,34 +71,78 @@ def backtest(df=pd.DataFrame(), symbols=(), verbose=False, params={},
     params['window_corr'] = int(params['window_corr'])
     params['window_std'] = int(params['window_std'])
 
-    # TODO - might want to build a real logger, this is just a quick hack 
-    if verbose:
-        log = lambda msg: print(f"{msg}")
-    else:
+    if not verbose:
         log = lambda x: x
 
-    if len(df):
+    if len(df) and setup_cache is not None:
+        log('setting up dataframe (cached)..')
+        with prof.stage('setup'):
+            df = setup_cache.setup(df, params, engine=setup_engine)
+        log('done')
+    elif len(df):
         df = df.copy()
         log('setting up dataframe..')
-        df = setup(df, params)
+        with prof.stage('setup'):
+            df = setup(df, params, engine=setup_engine)
         log('done')
     elif symbols:
         log('retrieving data...')
-        df = get_pair(symbols[0], symbols[1])
+        with prof.stage('fetch'):
+            df = get_pair(symbols[0], symbols[1], days=days,
+                          cache=price_cache, provider=provider,
+                          interval=interval)
         log(f"done, got {len(df):,.0f} records ranging from "
             f"{df['date'].min()} to {df['date'].max()}")
         log('setting up dataframe..')
-        df = setup(df, params)
+        with prof.stage('setup'):
+            df = setup(df, params, engine=setup_engine)
         log('done')
     elif example:
         log('setting up dataframe, using example data...')
-        df = setup(helpers.load_example(), params)
+        with prof.stage('fetch'):
+            df = helpers.load_example()
+        with prof.stage('setup'):
+            df = setup(df, params, engine=setup_engine)
         log('done')
     else:
         raise Exception('Must pass either a dataframe or tuple of symbols.')
 
-    # start backtest loop
-    positions = list()
+    with prof.stage('loop'):
+        if engine == 'vectorized':
+            trades = _run_vectorized(df, params, log, model_method, prof)
+        elif engine == 'compiled':
+            trades = _run_compiled(df, params, log)
+        elif engine == 'reference':
+            trades = _run_reference(df, params, log, model_method, prof)
+        else:
+            raise PairsError(f"Unknown backtest engine '{engine}'.")
+
+    with prof.stage('positions'):
+        positions = positions_frame(df, trades, capture_snapshots)
+        if costs is not None:
+            positions = costs.apply(positions, symbols)
+    with prof.stage('stats'):
+        stats = describe.create_stats(df, positions, params, profiler=prof,
+                                      equity_dtype=equity_dtype)
+    with prof.stage('table'):
+        table = describe.create_stats_table(df, positions, stats)
+    if prof.enabled:
+        stats['profile'] = prof.totals()
+
+    return df, positions, stats, table
+
+
+def _run_reference(df, params, log, model_method='analytic',
+                   profiler=NULL_PROFILER):
+    """Walk every bar of `df` and return a ledger of closed positions
+
+    This is the original row-by-row implementation, kept so that the
+    output of the faster engines can be checked against it. Exits
+    compare the spread with the precomputed exit bands, so every bar
+    only reads its own row.
+
+    """
+    ledger = TradeLedger()
     position = dict()
 
     for i in df.dropna(subset=['spread']).index:
@@ -55,21 +152,22 @@ def backtest(df=pd.DataFrame(), symbols=(), verbose=False, params={},
                        f"found at '{df.loc[i, 'date']}'")
                 log(msg)
                 # initiate a position 
+                position['idx_entry'] = i
                 position['date_entry'] = df.loc[i, 'date']
-                position['stats_entry'] = df.loc[i].to_dict()
                 position['side'] = 'sell' if df.loc[i, 'signal_sell'] else 'buy'
                 position['price_entry_l'] = df.loc[i, 'price_l']
                 position['price_entry_r'] = df.loc[i, 'price_r']
                 position['size_l'] = df.loc[i, 'size_l']
                 position['size_r'] = df.loc[i, 'size_r']
-                position['std_l'] = df.loc[i, 'std_l']
-                position['std_r'] = df.loc[i, 'std_r']
                 position['min_loss'] = 0
+                position['idx_min_loss'] = i
                 position['date_min_loss'] = df.loc[i, 'date']
 
                 # model the spread using model module 
-                mod = model(df.loc[i-params['window_std']:i],
-                            position['size_l'], position['size_r'])
+                with profiler.stage('model'):
+                    mod = model(df.loc[i-params['window_std']:i],
+                                position['size_l'], position['size_r'],
+                                method=model_method)
                 # calculate profit target and stop loss in dollar amounts
                 position['target_profit'] = \
                     params['factor_profit_std']*mod['std']
@@ -86,22 +184,19 @@ def backtest(df=pd.DataFrame(), symbols=(), verbose=False, params={},
             if position['side'] == 'sell':
                 pl = position['size_l']*(position['price_entry_l'] - df.loc[i, 'price_l']) \
                     + position['size_r']*(df.loc[i, 'price_r'] - position['price_entry_r'])
-                # exit if the spread is below the lower range
-                exit_on_band = df.loc[i, 'spread'] \
-                    < (df.shift(1).loc[i, 'spread_mean'] \
-                       - params['factor_std']*df.shift(1).loc[i, 'spread_std'])
+                # exit if the spread is below the lower exit band
+                exit_on_band = df.loc[i, 'spread'] < df.loc[i, 'exit_band_lower']
             elif position['side'] == 'buy':
                 pl = position['size_l']*(df.loc[i, 'price_l'] - position['price_entry_l']) \
                     + position['size_r']*(position['price_entry_r'] - df.loc[i, 'price_r'])
-                # exit if the spread is above the upper range
-                exit_on_band = df.loc[i, 'spread'] \
-                    > (df.shift(1).loc[i, 'spread_mean'] \
-                       + params['factor_std']*df.shift(1).loc[i, 'spread_std'])
+                # exit if the spread is above the upper exit band
+                exit_on_band = df.loc[i, 'spread'] > df.loc[i, 'exit_band_upper']
 
             # update max loss 
             # TODO - prob remove the max loss data later, remove from setup too 
             if pl < position['min_loss']:
                 position['min_loss'] = pl
+                position['idx_min_loss'] = i
                 position['date_min_loss'] = df.loc[i, 'date']
 
             # exit if profit threshold is reached, stop thresh. reached, or band reached
@@ -115,22 +210,116 @@ def backtest(df=pd.DataFrame(), symbols=(), verbose=False, params={},
                 msg = f"max loss: {position['min_loss']:.2f} @ {position['date_min_loss']}"
                 log(msg)
                 # exit position
-                position['date_exit'] = df.loc[i, 'date']
-                position['stats_exit'] = df.loc[i].to_dict()
-                position['price_exit_l'] = df.loc[i, 'price_l']
-                position['price_exit_r'] = df.loc[i, 'price_r']
-                position['profit'] = pl
                 if exit_take_profit:
-                    position['exit_reason'] = 'take profit'
+                    reason = kernel.EXIT_TAKE_PROFIT
                 elif exit_stop_loss:
-                    position['exit_reason'] = 'stop loss'
+                    reason = kernel.EXIT_STOP_LOSS
                 elif exit_on_band:
-                    position['exit_reason'] = 'band exit'
-                positions.append(position)
+                    reason = kernel.EXIT_BAND
+                ledger.append(
+                    idx_entry=position['idx_entry'], idx_exit=i,
+                    idx_min_loss=position['idx_min_loss'],
+                    side=(kernel.SIDE_SELL if position['side'] == 'sell'
+                          else kernel.SIDE_BUY),
+                    exit_reason=reason,
+                    price_entry_l=position['price_entry_l'],
+                    price_entry_r=position['price_entry_r'],
+                    size_l=position['size_l'], size_r=position['size_r'],
+                    target_profit=position['target_profit'],
+                    target_loss=position['target_loss'],
+                    min_loss=position['min_loss'],
+                    price_exit_l=df.loc[i, 'price_l'],
+                    price_exit_r=df.loc[i, 'price_r'], profit=pl)
                 position = dict()
 
-    positions = pd.DataFrame(positions)
-    stats = describe.create_stats(df, positions, params)
-    table = describe.create_stats_table(df, positions, stats)
+    return ledger
 
-    return df, positions, stats, table
+
+def _run_vectorized(df, params, log, model_method='analytic',
+                    profiler=NULL_PROFILER):
+    """Run the position state machine over NumPy arrays
+
+    Only rows with a valid spread take part in the backtest, so every
+    column is compressed to those rows once up front. Entry candidates
+    are the rows flagged by `signal_buy` or `signal_sell`. Once a
+    position is open the exit is found with `kernel.find_exit`.
+
+    Exiting a sell on the band means the spread dropped below the lagged
+    lower exit band (and vice versa for a buy), these flags are computed
+    once for all rows from the precomputed exit bands.
+
+    Returns the same ledger of trades as `_run_reference`.
+
+    """
+    valid = df['spread'].notna().to_numpy()
+    rows = np.flatnonzero(valid)
+    price_l = df['price_l'].to_numpy()[valid]
+    price_r = df['price_r'].to_numpy()[valid]
+    signal_sell = df['signal_sell'].to_numpy(dtype=bool)[valid]
+    signal_buy = df['signal_buy'].to_numpy(dtype=bool)[valid]
+    candidates = np.flatnonzero(signal_sell | signal_buy)
+    spread = df['spread'].to_numpy()[valid]
+    exit_sell = spread < df['exit_band_lower'].to_numpy()[valid]
+    exit_buy = spread > df['exit_band_upper'].to_numpy()[valid]
+
+    ledger = TradeLedger()
+    k = 0
+    while True:
+        # next entry candidate at or after bar k
+        c = np.searchsorted(candidates, k)
+        if c == len(candidates):
+            break
+        k = candidates[c]
+        i = rows[k]
+
+        side = kernel.SIDE_SELL if signal_sell[k] else kernel.SIDE_BUY
+        log(f"{'sell' if signal_sell[k] else 'buy'} signal found at "
+            f"'{df.loc[i, 'date']}'")
+        size_l = df.loc[i, 'size_l']
+        size_r = df.loc[i, 'size_r']
+
+        # model the spread using model module
+        with profiler.stage('model'):
+            mod = model(df.loc[i-params['window_std']:i], size_l, size_r,
+                        method=model_method)
+        # calculate profit target and stop loss in dollar amounts
+        target_profit = params['factor_profit_std']*mod['std']
+        target_loss = -params['factor_loss_size']*target_profit
+
+        # a sell exits on the lower exit band and a buy on the upper one
+        exit_band = exit_sell if side == kernel.SIDE_SELL else exit_buy
+        exit_k, pl, reason, min_loss, k_min_loss = kernel.find_exit(
+            price_l, price_r, exit_band, k, side, size_l, size_r,
+            price_l[k], price_r[k], target_profit, target_loss)
+        if exit_k is None:
+            # position still open at the end of the data
+            break
+
+        log(f"position initiated on '{df.loc[i, 'date']}' has profit "
+            f"'{pl}', exiting position on bar "
+            f"'{df.loc[rows[exit_k], 'date']}'.")
+        ledger.append(
+            idx_entry=i, idx_exit=rows[exit_k],
+            idx_min_loss=rows[k_min_loss], side=side, exit_reason=reason,
+            price_entry_l=price_l[k], price_entry_r=price_r[k],
+            size_l=size_l, size_r=size_r, target_profit=target_profit,
+            target_loss=target_loss, min_loss=min_loss,
+            price_exit_l=price_l[exit_k], price_exit_r=price_r[exit_k],
+            profit=pl)
+        k = exit_k + 1
+
+    return ledger
+
+
+def _run_compiled(df, params, log):
+    """Run `kernel.run_state_machine` and return its trade records"""
+    cols = ['price_l', 'price_r', 'size_l', 'size_r', 'spread', 'band_upper',
+            'band_lower']
+    trades = kernel.run_state_machine(
+        *[df[x].to_numpy() for x in cols], params['window_std'],
+        params['factor_profit_std'], params['factor_loss_size'],
+        exit_band_upper=df['exit_band_upper'].to_numpy(),
+        exit_band_lower=df['exit_band_lower'].to_numpy())
+    log(f"found {len(trades):,.0f} trades")
+
+    return trades
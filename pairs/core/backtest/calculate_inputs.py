@@ -1,8 +1,17 @@
 """Create signals and other data required for backtesting"""
+import numpy as np
 import pandas as pd
+from ..exc import PairsError
+from . import hedge
+from .rolling import (blockwise, centered, lagged_bands, rolling_mean_std,
+                      rolling_setup, window_sum)
 
+# columns of `setup_panel` with one column per symbol, the others have one
+# column per pair
+SYMBOL_COLUMNS = ['return', 'price_change', 'std', 'std_pcg']
 
-def setup(df, params):
+
+def setup(df, params, engine='pandas'):
     """Calculate data series required for the backtest. 
 
     Takes as input a dataframe with columns `['date', 'price_l',
@@ -11,7 +20,7 @@ def setup(df, params):
     'std_pcg_l', 'return_r', 'price_change_r', 'std_r', 'std_pcg_r',
     'corr_rolling', 'size_l', 'size_r', 'spread', 'spread_std',
     'spread_mean', 'band_upper', 'signal_sell', 'band_lower',
-    'signal_buy']`. 
+    'signal_buy', 'exit_band_upper', 'exit_band_lower']`. 
 
     The share size of each side of the spread is calculated in a
     volatility weighted manner. The share quantity for the "left" asset
@@ -24,17 +33,30 @@ def setup(df, params):
     deviations "std_x" is an n-period rolling standard deviation, where
     "n" is specified in `params`. 
 
+    Instead of the volatility ratio, the param `hedge` can select a
+    rolling regression ("rolling_ols") or a Kalman filter ("kalman") of
+    price_l on price_r, see `hedge`. 
+
     The share quantities are calculated for every row, and this is used
     to calculate the value of the "spread" at every row. 
 
     A row is deemed to be a buy (sell) signal if the value of the spread
     is higher (lower) than the mean by a standard deviation factor. This
-    multiplier is specified in `params`. 
+    multiplier is specified in `params`. An open position is closed
+    when the spread crosses the opposite exit band, which lies
+    `factor_exit_std` standard deviations from the mean of the previous
+    bar (by default `factor_std`, so the exit bands are the entry
+    bands). 
 
     The rolling correlation is calculated here but (as of this writing)
     is not used anywhere in the codebase. A later enhancement may
     include analysis of the correlation. 
 
+    With `engine="pandas"` the columns are calculated with pandas
+    `rolling()`. With `engine="incremental"` they are calculated in a
+    single pass by `rolling.rolling_setup`, which agrees with pandas up
+    to floating point rounding. 
+
     Parameters
     ----------
     df : DataFrame 
@@ -47,7 +69,11 @@ def setup(df, params):
         standard deviation and correlation calculations, measured in
         terms of the number of rows in `df`. factor_std is number of
         standard deviations above or below the mean to constitute a buy
-        or sell signal. 
+        or sell signal. Optionally factor_exit_std sets the exit bands
+        and the params `options.HEDGE_PARAMS` select the hedge ratio. 
+
+    engine : str
+        Either "pandas" or "incremental".
 
     Returns
     -------
@@ -57,15 +83,22 @@ def setup(df, params):
         'return_r', 'price_change_r', 'std_r', 'std_pcg_r',
         'corr_rolling', 'size_l', 'size_r', 'spread', 'spread_std',
         'spread_mean', 'band_upper', 'signal_sell', 'band_lower',
-        'signal_buy']`.
+        'signal_buy', 'exit_band_upper', 'exit_band_lower']`.
 
     """
     for col in ['date', 'price_l', 'price_r']:
         msg = f"Must have column '{col}' in df"
         assert col in df.columns.tolist(), msg
 
-    # calculate returns, standard deviations 
     df = df.sort_values(by=['date']).reset_index(drop=True)
+    if engine not in ['pandas', 'incremental']:
+        raise PairsError(f"Unknown setup engine '{engine}'.")
+    sizes = hedge.hedge_ratio(df['price_l'].to_numpy(),
+                              df['price_r'].to_numpy(), params)
+    if engine == 'incremental':
+        return _setup_incremental(df, params, sizes)
+
+    # calculate returns, standard deviations 
     for col in ['price_l', 'price_r']:
         col_ret = col.replace('price', 'return')
         col_pcg = col.replace('price', 'price_change')
@@ -84,7 +117,11 @@ def setup(df, params):
 
     # calculate share sizes 
     df['size_l'] = 1
-    df['size_r'] = (df['price_l']*df['std_l']) / (df['price_r']*df['std_r'])
+    if sizes is None:
+        df['size_r'] = hedge.vol_ratio(df['price_l'], df['price_r'],
+                                       df['std_l'], df['std_r'])
+    else:
+        df['size_r'] = sizes
 
     # calculate spread 
     df['spread'] = df['price_l'] - df['size_r'] * df['price_r']
@@ -98,5 +135,148 @@ def setup(df, params):
     df['band_lower'] = (df['spread_mean'].shift(1) \
                         - params['factor_std']*df['spread_std'].shift(1))
     df['signal_buy'] = df['spread'] < df['band_lower']
+    _add_exit_bands(df, params)
 
     return df.sort_values(by=['date']).reset_index(drop=True)
+
+
+def exit_factor(params):
+    """The std factor of the exit bands, `factor_std` unless set"""
+    return float(params.get('factor_exit_std', params['factor_std']))
+
+
+def _add_exit_bands(df, params):
+    """Add the exit bands around the lagged spread mean to `df`"""
+    df['exit_band_upper'], df['exit_band_lower'] = lagged_bands(
+        df['spread_mean'].to_numpy(), df['spread_std'].to_numpy(),
+        exit_factor(params))
+
+
+def _setup_incremental(df, params, sizes=None):
+    """Add the `setup` columns to sorted `df` using `rolling_setup`"""
+    cols = rolling_setup(df['price_l'].to_numpy(), df['price_r'].to_numpy(),
+                         params['window_std'], params['window_corr'],
+                         params['factor_std'], size_r=sizes)
+    for col in ['return_l', 'price_change_l', 'std_l', 'std_pcg_l',
+                'return_r', 'price_change_r', 'std_r', 'std_pcg_r',
+                'corr_rolling']:
+        df[col] = cols[col]
+    df['size_l'] = 1
+    for col in ['size_r', 'spread', 'spread_std', 'spread_mean',
+                'band_upper']:
+        df[col] = cols[col]
+    df['signal_sell'] = df['spread'] > df['band_upper']
+    df['band_lower'] = cols['band_lower']
+    df['signal_buy'] = df['spread'] < df['band_lower']
+    _add_exit_bands(df, params)
+
+    return df
+
+
+def _ffill(a):
+    """Forward fill the NaNs of the columns of `a`"""
+    idx = np.where(np.isnan(a), 0, np.arange(len(a))[:, None])
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    return np.take_along_axis(a, idx, axis=0)
+
+
+def _corr(x, y, window):
+    valid = ~(np.isnan(x) | np.isnan(y))
+    full = window_sum(valid.astype(np.float64), window) >= window
+    x, _ = centered(x, valid)
+    y, _ = centered(y, valid)
+    sx = window_sum(x, window)
+    sy = window_sum(y, window)
+    cxy = window_sum(x*y, window) - sx*sy/window
+    vx = window_sum(x*x, window) - sx*sx/window
+    vy = window_sum(y*y, window) - sy*sy/window
+    with np.errstate(invalid='ignore', divide='ignore'):
+        corr = cxy / np.sqrt(vx*vy)
+    corr[~full | ~(vx > 0) | ~(vy > 0)] = np.nan
+
+    return corr
+
+
+def _rolling_corr(x, y, window):
+    """Rolling correlation of the columns of `x` and `y`"""
+    return blockwise(_corr, window, x, y)
+
+
+def setup_panel(prices, pairs, params):
+    """Calculate the `setup` columns of many pairs over one price panel
+
+    Returns, price changes and their rolling stds are calculated once
+    per symbol and shared by every pair that holds the symbol. The
+    columns of the pairs are then taken from them with 2-D NumPy
+    operations on all pairs at once; rolling statistics are differences
+    of cumulative sums, restarted every `rolling.RESYNC` rows (see
+    `rolling.blockwise`). The values agree with `setup` up to floating
+    point rounding, however long the series.
+
+    Parameters
+    ----------
+    prices : DataFrame or array
+        Prices of shape (dates, symbols), sorted by date.
+
+    pairs : array
+        Column indices of the left and right symbol of every pair, of
+        shape (pairs, 2).
+
+    params : dict
+        The params of `setup`.
+
+    Returns
+    -------
+    cols : dict
+        2-D float arrays keyed by the column names of `setup`. The
+        `SYMBOL_COLUMNS` ('return', 'price_change', 'std', 'std_pcg')
+        have one column per symbol, all others ('corr_rolling',
+        'size_r', 'spread', 'spread_std', 'spread_mean', 'band_upper',
+        'band_lower', 'exit_band_upper', 'exit_band_lower' and the bool
+        'signal_sell' and 'signal_buy') one column per pair.
+
+    """
+    p = np.asarray(prices, dtype=np.float64)
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    if p.ndim != 2:
+        raise PairsError('Prices must be a dates x symbols matrix.')
+    if len(pairs) and (pairs.min() < 0 or pairs.max() >= p.shape[1]):
+        raise PairsError('Pair indices must refer to columns of prices.')
+    window = int(params['window_std'])
+    l, r = pairs[:, 0], pairs[:, 1]
+    cols = dict()
+
+    # per symbol, returns are taken on forward filled prices
+    last = _ffill(p)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cols['return'] = np.full_like(p, np.nan)
+        cols['return'][1:] = last[1:] / last[:-1] - 1
+    cols['price_change'] = np.full_like(p, np.nan)
+    cols['price_change'][1:] = p[1:] - p[:-1]
+    cols['std'] = rolling_mean_std(cols['return'], window)[1]
+    cols['std_pcg'] = rolling_mean_std(cols['price_change'], window)[1]
+
+    # per pair
+    cols['corr_rolling'] = _rolling_corr(cols['return'][:, l],
+                                         cols['return'][:, r],
+                                         int(params['window_corr']))
+    size_r = hedge.hedge_ratio(p[:, l], p[:, r], params)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if size_r is None:
+            size_r = hedge.vol_ratio(p[:, l], p[:, r], cols['std'][:, l],
+                                     cols['std'][:, r])
+        cols['size_r'] = size_r
+        cols['spread'] = p[:, l] - size_r*p[:, r]
+    cols['spread_mean'], cols['spread_std'] = \
+        rolling_mean_std(cols['spread'], window)
+
+    # bands around the previous bar's mean
+    cols['band_upper'], cols['band_lower'] = lagged_bands(
+        cols['spread_mean'], cols['spread_std'], float(params['factor_std']))
+    cols['exit_band_upper'], cols['exit_band_lower'] = lagged_bands(
+        cols['spread_mean'], cols['spread_std'], exit_factor(params))
+    with np.errstate(invalid='ignore'):
+        cols['signal_sell'] = cols['spread'] > cols['band_upper']
+        cols['signal_buy'] = cols['spread'] < cols['band_lower']
+
+    return cols
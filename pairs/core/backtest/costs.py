@@ -0,0 +1,134 @@
+"""Trading costs of backtest positions
+
+The trade loops work on raw price differences. Costs are taken off
+afterwards, with array operations over all positions at once, so they
+do not slow down the loops (or sweeps over many params). Three costs
+are modeled, with rates per symbol:
+
+- 'commission', dollars per share traded, paid on entry and exit
+- 'slippage_bps', basis points of the value traded on entry and exit
+- 'borrow_bps', annual fee in basis points of the value of the short
+  side at entry, accrued for every day (or fraction of a day) held
+
+The rates of the 'costs' config section apply to every symbol, and
+sections 'costs.<symbol>' override them for one symbol, e.g. a higher
+borrow fee of a hard to borrow stock:
+
+    costs:
+      commission: 0.005
+      slippage_bps: 2
+      borrow_bps: 30
+
+    costs.GME:
+      borrow_bps: 2500
+
+"""
+import numpy as np
+from ..exc import PairsError
+from .ledger import signed_shares
+
+# rates of a `CostModel`, see the module docstring
+COST_PARAMS = ['commission', 'slippage_bps', 'borrow_bps']
+
+# columns added to positions by `CostModel.apply`
+COST_COLUMNS = ['cost_commission', 'cost_slippage', 'cost_borrow', 'cost',
+                'profit_net']
+
+SECONDS_PER_YEAR = 365*24*3600
+
+
+class CostModel:
+    """Commission, slippage and borrow fee rates, per symbol
+
+    Parameters
+    ----------
+    commission, slippage_bps, borrow_bps : float
+        Default rates of every symbol, see the module docstring.
+
+    symbols : dict
+        Maps symbols to dicts of the rates that differ from the
+        defaults.
+
+    """
+
+    def __init__(self, commission=0.0, slippage_bps=0.0, borrow_bps=0.0,
+                 symbols=None):
+        self.defaults = self._check({'commission': commission,
+                                     'slippage_bps': slippage_bps,
+                                     'borrow_bps': borrow_bps})
+        self.symbols = {k: self._check(dict(self.defaults, **v))
+                        for k, v in (symbols or {}).items()}
+
+    @staticmethod
+    def _check(rates):
+        unknown = [k for k in rates if k not in COST_PARAMS]
+        if unknown:
+            raise PairsError(f"Unknown cost rates {unknown}, must be in "
+                             f"{COST_PARAMS}.")
+        rates = {k: float(v) for k, v in rates.items()}
+        if any(v < 0 for v in rates.values()):
+            raise PairsError('Cost rates must not be negative.')
+        return rates
+
+    @classmethod
+    def from_config(cls, config):
+        """Create a model from the 'costs' sections of the app `config`"""
+        sections = config.get_sections()
+        if 'costs' not in sections:
+            return cls()
+        rates = {k: config.get('costs', k) for k in config.keys('costs')}
+        symbols = {x[len('costs.'):]: {k: config.get(x, k)
+                                       for k in config.keys(x)}
+                   for x in sections if x.startswith('costs.')}
+        return cls(symbols=symbols, **rates)
+
+    def rates(self, symbol=None):
+        """Return the rates of `symbol`, the defaults if it has none"""
+        return self.symbols.get(symbol, self.defaults)
+
+    def apply(self, positions, symbols=(None, None)):
+        """Add the costs of every position to `positions`
+
+        Parameters
+        ----------
+        positions : DataFrame
+            Positions as returned by `backtest`, one unit of the spread
+            each, i.e. `size_l` shares of the left asset and `size_r`
+            of the right one.
+
+        symbols : tuple
+            The left and right symbol, whose rates are used. Symbols
+            that are None or have no rates of their own get the
+            defaults.
+
+        Returns
+        -------
+        positions : DataFrame
+            A copy with the `COST_COLUMNS`: the costs by kind, their
+            sum 'cost' and 'profit_net', which is 'profit' less 'cost'.
+
+        """
+        positions = positions.copy()
+        symbol_l, symbol_r = (tuple(symbols) + (None, None))[:2]
+        rl, rr = self.rates(symbol_l), self.rates(symbol_r)
+        qty_l, qty_r = signed_shares(positions)
+        pe_l = positions['price_entry_l'].to_numpy(float)
+        pe_r = positions['price_entry_r'].to_numpy(float)
+        px_l = positions['price_exit_l'].to_numpy(float)
+        px_r = positions['price_exit_r'].to_numpy(float)
+        held = (positions['date_exit'] - positions['date_entry']) \
+            .dt.total_seconds().to_numpy(float) / SECONDS_PER_YEAR
+
+        positions['cost_commission'] = 2*(rl['commission']*np.abs(qty_l)
+                                          + rr['commission']*np.abs(qty_r))
+        positions['cost_slippage'] = \
+            rl['slippage_bps']/1e4*np.abs(qty_l)*(pe_l + px_l) \
+            + rr['slippage_bps']/1e4*np.abs(qty_r)*(pe_r + px_r)
+        short = rl['borrow_bps']/1e4*np.maximum(-qty_l, 0)*pe_l \
+            + rr['borrow_bps']/1e4*np.maximum(-qty_r, 0)*pe_r
+        positions['cost_borrow'] = short*held
+        positions['cost'] = positions['cost_commission'] \
+            + positions['cost_slippage'] + positions['cost_borrow']
+        positions['profit_net'] = positions['profit'] - positions['cost']
+
+        return positions
@@ -1,11 +1,30 @@
 """Funcs to analyze outcome of backtest"""
+import numpy as np
 import pandas as pd
 from tabulate import tabulate
+from ..exc import PairsError
 from ..analyze.cointegration import is_cointegrated
+from ..profiling import NULL_PROFILER
+from .equity import EquitySummary, bars_per_year, positions_curve
 
 
-def create_stats(df, positions, params):
-    """Summarize outome of backtest"""
+def create_stats(df, positions, params, profiler=NULL_PROFILER,
+                 equity_dtype=None, equity_stats=None):
+    """Summarize outome of backtest
+
+    The cointegration test is measured as the stage 'cointegration' of
+    `profiler`, see `profiling.Profiler`.
+
+    The positions are marked to market on every bar of `df` to add the
+    metrics of their equity curve, see `equity.EquitySummary.stats`.
+    With `equity_dtype`, e.g. "float32", the curve itself is added as
+    an array of that dtype under 'equity'. Metrics of a curve computed
+    elsewhere (e.g. in chunks) can be passed as `equity_stats` instead.
+
+    """
+    if not len(positions):
+        # e.g. a sweep over params that never trigger a signal
+        positions = pd.DataFrame(columns=['profit', 'exit_reason'], dtype=float)
     stats = dict()
     stats['count_trades'] = len(positions)
     m = positions['profit'] < 0
@@ -14,14 +33,30 @@ def create_stats(df, positions, params):
     stats['count_winning_trades'] = len(positions[m])
     assert stats['count_winning_trades'] + stats['count_losing_trades'] \
         == stats['count_trades']
-    stats['winrate'] = stats['count_winning_trades'] / stats['count_trades']
+    stats['winrate'] = (stats['count_winning_trades'] / stats['count_trades']
+                        if stats['count_trades'] else np.nan)
     stats['profit_max'] = positions['profit'].max()
     stats['loss_max'] = positions['profit'].min()
     stats['sum_profit'] = positions['profit'].sum()
+    # trading costs, if the positions carry them, see `costs.CostModel`
+    stats['sum_costs'] = (positions['cost'].sum() if 'cost' in positions
+                          else 0.0)
+    stats['sum_profit_net'] = stats['sum_profit'] - stats['sum_costs']
+    if equity_stats is None:
+        curve = positions_curve(df['date'], df['price_l'].to_numpy(),
+                                df['price_r'].to_numpy(), positions)
+        seconds = (df['date'].iat[-1] - df['date'].iat[0]).total_seconds() \
+            if len(df) else np.nan
+        equity_stats = EquitySummary().add(curve).stats(
+            bars_per_year(len(df), seconds))
+        if equity_dtype is not None:
+            stats['equity'] = curve['equity'].astype(equity_dtype)
+    stats.update(equity_stats)
     stats['exit_reasons'] = (positions['exit_reason'].value_counts() \
                              / len(positions)).to_dict()
     stats['general_params'] = params
-    stats['is_cointegrated'] = is_cointegrated(df)
+    with profiler.stage('cointegration'):
+        stats['is_cointegrated'] = is_cointegrated(df)
 
     stats['profit_mean'] = \
         positions.loc[positions['profit'] >= 0, 'profit'].mean() 
@@ -47,61 +82,136 @@ def create_stats(df, positions, params):
     return stats
 
 
+# display formatters of metrics
+_fi = lambda x: f"{x:,.0f}"
+_ff = lambda x: f"{x:,.2f}"
+_fp = lambda x: f"{100*x:.2f}%"
+_fd = lambda x: f"${x:,.2f}"
+_fdt = lambda x: f"{x.isoformat()}"
+
+# metrics of stats tables in order, along with text formatters. The key
+# of the correlation over the last bars depends on window_corr and is
+# matched by its prefix 'corr_last_'.
+METRICS_FORMATTERS = [
+    ('date_min', _fdt), ('date_max', _fdt),
+    ('param_factor_loss_size', _ff),
+    ('param_factor_profit_std', _ff),
+    ('param_factor_std', _ff),
+    ('param_window_corr', _fi),
+    ('param_window_std', _fi),
+    ('count_data_points', _fi),
+    ('barsize', str),
+    ('corr_last_bars', _ff),
+    ('corr_all', _ff),
+    ('is_cointegrated', str),
+    ('count_trades', _fi), ('winrate', _fp),
+    ('profit_max', _fd), ('loss_max', _fd),
+    ('sum_profit', _fd), ('sum_costs', _fd), ('sum_profit_net', _fd),
+    ('max_drawdown', _fd), ('sharpe', _ff), ('sortino', _ff),
+    ('time_in_market', _fp), ('exposure_mean', _fd), ('exposure_max', _fd),
+    ('profit_mean', _fd), ('loss_mean', _fd),
+    ('size_shares_left', _ff), ('size_shares_right', _ff),
+    ('std_left', _fd), ('std_right', _fd),
+]
+
+_FORMATTERS = dict(METRICS_FORMATTERS)
+
+TABLE_FORMATS = ['markdown', 'csv', 'json']
+
+
+def stats_record(stats, df=None):
+    """Return the metrics of a stats table as one dict, in table order
+
+    Params are unpacked into 'param_<name>' keys. The summary of the
+    data ('date_min', 'date_max' and 'count_data_points') is taken from
+    `stats` or, if missing there, from the prices `df`. Metrics that are
+    neither in `stats` nor in `df` are left out.
+
+    """
+    values = {f"param_{k}": v for k, v in stats['general_params'].items()}
+    values.update(stats)
+    if df is not None:
+        values.setdefault('date_min', df['date'].min())
+        values.setdefault('date_max', df['date'].max())
+        values.setdefault('count_data_points', len(df))
+    corr = f"corr_last_{stats['general_params']['window_corr']:.0f}_bars"
+
+    record = dict()
+    for metric, _ in METRICS_FORMATTERS:
+        key = corr if metric == 'corr_last_bars' else metric
+        if key in values:
+            record[key] = values[key]
+
+    return record
+
+
+def _format(metric, value):
+    """Format `value` of `metric` for display"""
+    if metric.startswith('corr_last_'):
+        metric = 'corr_last_bars'
+    return _FORMATTERS[metric](value)
+
+
 def create_stats_table(df, positions, stats):
     """Create a display table of backtest history"""
-
-    # list of metrics to include in order, along with text formatters 
-    f = lambda x: x
-    fi = lambda x: f"{x:,.0f}"
-    ff = lambda x: f"{x:,.2f}"
-    fp = lambda x: f"{100*x:.2f}%"
-    fd = lambda x: f"${x:,.2f}"
-    fdt = lambda x: f"{x.isoformat()}"
-    metrics_formatters = [
-        ('date_min', fdt), ('date_max', fdt), 
-        ('param_factor_loss_size', ff), 
-        ('param_factor_profit_std', ff), 
-        ('param_factor_std', ff), 
-        ('param_window_corr', fi), 
-        ('param_window_std', fi), 
-        ('count_data_points', fi),
-        ('barsize', f),
-        (f"corr_last_{stats['general_params']['window_corr']:.0f}_bars", ff),
-        ('corr_all', ff),
-        ('is_cointegrated', f),
-        ('count_trades', fi), ('winrate', fp),
-        #('count_losing_trades', fi), ('count_winning_trades', fi),
-        ('profit_max', fd), ('loss_max', fd),
-        ('sum_profit', fd), 
-        ('profit_mean', fd), ('loss_mean', fd),
-        ('size_shares_left', ff), ('size_shares_right', ff),
-        ('std_left', fd), ('std_right', fd),
-    ]
-
-    tb = (pd.DataFrame.from_dict(stats, orient='index', columns=['value'])
-            .reset_index().rename(columns={'index':'metric'})
-            .reset_index(drop=True))
-
-    # unpack params keys 
-    for k,v in stats['general_params'].items():
-        tb = tb.append({'metric':f"param_{k}", 'value':stats['general_params'][k]}, ignore_index=True)
-
-    d = [
-        {'metric':'date_min', 'value':df['date'].min()}, 
-        {'metric':'date_max', 'value':df['date'].max()},
-        {'metric':'count_data_points', 'value':len(df)},
-    ]
-    tb = tb.append(d, ignore_index=True)
-
-    # set order  
-    idx = [x[0] for x in metrics_formatters]
-    tb = tb.set_index('metric').reindex(idx).reset_index()
-
-    # apply formatters 
-    for i in tb.index:
-        f = dict(metrics_formatters)[tb.loc[i, 'metric']]
-        tb.loc[i, 'value'] = f(tb.loc[i, 'value'])
-
-    t = tabulate(tb, headers=tb.columns, tablefmt='pipe')
-
-    return t
+    record = stats_record(stats, df)
+    rows = [(k, _format(k, v)) for k, v in record.items()]
+
+    return tabulate(rows, headers=['metric', 'value'], tablefmt='pipe',
+                    showindex=True)
+
+
+def compare_stats(stats, labels=None, fmt='markdown'):
+    """Render many stats dicts as one comparison table
+
+    Every stats dict (e.g. of the backtests of a sweep) becomes a row
+    with one column per metric, see `stats_record`. The correlation over
+    the last bars is named 'corr_last_bars' for any window_corr. The
+    table is built from a list of records, so rendering takes time
+    linear in the number of stats.
+
+    Parameters
+    ----------
+    stats : list
+        Dicts as returned by `create_stats`.
+
+    labels : list
+        Names of the rows, put in a first column 'label'.
+
+    fmt : str
+        "markdown" renders a pipe table of display formatted values,
+        "csv" and "json" (a list of objects) hold the raw values, with
+        dates in ISO format.
+
+    Returns
+    -------
+    table : str
+
+    """
+    if fmt not in TABLE_FORMATS:
+        raise PairsError(f"Unknown table format '{fmt}'.")
+    if labels is not None and len(labels) != len(stats):
+        raise PairsError('Need one label per stats dict.')
+    records = list()
+    for x in stats:
+        record = dict()
+        for k, v in stats_record(x).items():
+            if k.startswith('corr_last_'):
+                k = 'corr_last_bars'
+            record[k] = _format(k, v) if fmt == 'markdown' else v
+        records.append(record)
+    columns = [k for k, _ in METRICS_FORMATTERS
+               if any(k in x for x in records)]
+    tb = pd.DataFrame.from_records(records, columns=columns)
+    if labels is not None:
+        tb.insert(0, 'label', list(labels))
+
+    if fmt == 'markdown':
+        return tabulate(tb.fillna(''), headers=tb.columns, tablefmt='pipe',
+                        showindex=False, disable_numparse=True)
+    elif fmt == 'csv':
+        return tb.to_csv(index=False, date_format='iso')
+    if 'barsize' in tb:
+        tb['barsize'] = tb['barsize'].astype(str)
+    return tb.to_json(orient='records', date_format='iso',
+                      double_precision=15)
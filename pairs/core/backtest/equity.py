@@ -0,0 +1,216 @@
+"""Mark-to-market equity curve of backtest positions
+
+The trade loops only record closed positions. The equity of every bar
+follows from them without walking the bars again: the shares held on
+each bar are the cumulative sum of the shares bought at entries and
+sold at exits (`np.bincount` over the entry and exit indices), and the
+profit of a bar is the shares held into it times the change of the
+prices. The cumulative sum of the profits is the equity, which ends
+every position at its realized profit, less its costs if the positions
+carry them (see `costs.CostModel`).
+
+Curves can be computed in chunks of bars, with the state at the end of
+one chunk passed on to the next, and summarized chunk by chunk with an
+`EquitySummary`, so that intraday backtests of millions of bars stay
+within their memory budget.
+
+"""
+import numpy as np
+import pandas as pd
+from .ledger import signed_shares
+
+# arrays of a curve, see `mark_to_market`
+CURVE_COLUMNS = ['pnl', 'equity', 'drawdown', 'exposure', 'count_open']
+
+# state of a curve before its first bar
+INITIAL_STATE = {'price_l': np.nan, 'price_r': np.nan, 'shares_l': 0.0,
+                 'shares_r': 0.0, 'count_open': 0, 'equity': 0.0,
+                 'peak': 0.0}
+
+SECONDS_PER_YEAR = 365.25*24*3600
+
+
+def _ffill(a, first):
+    """Forward fill the NaNs of `a`, starting from the value `first`"""
+    a = np.concatenate([[first], np.asarray(a, dtype=np.float64)])
+    idx = np.where(np.isnan(a), 0, np.arange(len(a)))
+    np.maximum.accumulate(idx, out=idx)
+    return a[idx]
+
+
+def mark_to_market(price_l, price_r, idx_entry, idx_exit, shares_l,
+                   shares_r, cost=None, state=None):
+    """Equity curve of positions over the bars of two price arrays
+
+    Parameters
+    ----------
+    price_l, price_r : array
+        Prices of the bars. NaN prices are carried forward.
+
+    idx_entry, idx_exit : array
+        Bars of the entries and exits of the positions. Positions open
+        before the first bar are part of `state`, bars past the last one
+        are ignored, so a curve can be computed chunk by chunk with the
+        indices of the chunk.
+
+    shares_l, shares_r : array
+        Shares held of each asset by every position, negative if short,
+        see `ledger.signed_shares`.
+
+    cost : array
+        Costs of every position, taken off on its exit bar.
+
+    state : dict
+        The state returned for the preceding chunk, defaults to
+        `INITIAL_STATE`.
+
+    Returns
+    -------
+    curve : dict
+        Float64 arrays with one value per bar: 'pnl' (the profit of the
+        bar), 'equity', 'drawdown' (equity less its running maximum,
+        which starts at 0), 'exposure' (the gross value of the shares
+        held at the close) and 'count_open' (positions open at the
+        close).
+
+    state : dict
+        The state at the last bar, for the next chunk.
+
+    """
+    st = dict(INITIAL_STATE if state is None else state)
+    n = len(price_l)
+    pl = _ffill(price_l, st['price_l'])
+    pr = _ffill(price_r, st['price_r'])
+    idx_entry = np.asarray(idx_entry, dtype=np.int64)
+    idx_exit = np.asarray(idx_exit, dtype=np.int64)
+    entry = (idx_entry >= 0) & (idx_entry < n)
+    exit_ = (idx_exit >= 0) & (idx_exit < n)
+
+    def events(weights):
+        w = np.broadcast_to(np.asarray(weights, dtype=np.float64),
+                            idx_entry.shape)
+        return np.cumsum(np.bincount(idx_entry[entry], w[entry], n)
+                         - np.bincount(idx_exit[exit_], w[exit_], n))
+
+    # shares held at the close of every bar, the first value is the
+    # close before the chunk
+    held_l = np.concatenate([[st['shares_l']], st['shares_l']
+                             + events(shares_l)])
+    held_r = np.concatenate([[st['shares_r']], st['shares_r']
+                             + events(shares_r)])
+    with np.errstate(invalid='ignore'):
+        pnl = np.nan_to_num(held_l[:-1]*np.diff(pl)) \
+            + np.nan_to_num(held_r[:-1]*np.diff(pr))
+    if cost is not None:
+        cost = np.asarray(cost, dtype=np.float64)
+        pnl -= np.bincount(idx_exit[exit_], cost[exit_], n)
+    equity = st['equity'] + np.cumsum(pnl)
+    peak = np.maximum.accumulate(np.concatenate([[st['peak']], equity]))[1:]
+    count_open = st['count_open'] + events(1.0).astype(np.int64)
+    exposure = np.nan_to_num(np.abs(held_l[1:])*pl[1:]) \
+        + np.nan_to_num(np.abs(held_r[1:])*pr[1:])
+
+    curve = {'pnl': pnl, 'equity': equity, 'drawdown': equity - peak,
+             'exposure': exposure, 'count_open': count_open}
+    if n:
+        st = {'price_l': pl[-1], 'price_r': pr[-1], 'shares_l': held_l[-1],
+              'shares_r': held_r[-1], 'count_open': int(count_open[-1]),
+              'equity': equity[-1], 'peak': peak[-1]}
+
+    return curve, st
+
+
+def positions_curve(dates, price_l, price_r, positions):
+    """`mark_to_market` of positions with entry and exit dates
+
+    The dates of the positions are looked up in the sorted `dates` of
+    the prices. Returns the curve only.
+
+    """
+    if not len(positions):
+        empty = np.empty(0, dtype=np.int64)
+        return mark_to_market(price_l, price_r, empty, empty, empty,
+                              empty)[0]
+    dates = pd.DatetimeIndex(dates)
+    idx_entry = dates.searchsorted(pd.DatetimeIndex(positions['date_entry']))
+    idx_exit = dates.searchsorted(pd.DatetimeIndex(positions['date_exit']))
+    shares_l, shares_r = signed_shares(positions)
+    cost = positions['cost'] if 'cost' in positions else None
+    curve, _ = mark_to_market(price_l, price_r, idx_entry, idx_exit,
+                              shares_l, shares_r, cost)
+
+    return curve
+
+
+def bars_per_year(count, seconds):
+    """Bars per year of `count` bars spanning `seconds` seconds"""
+    if count < 2 or not seconds > 0:
+        return np.nan
+    return (count - 1) / (seconds / SECONDS_PER_YEAR)
+
+
+class EquitySummary:
+    """Risk and exposure metrics of an equity curve, added chunk by chunk
+
+    The metrics only need running sums and extremes of the arrays of a
+    curve, so a curve computed in chunks (see `mark_to_market`) need not
+    be kept in memory.
+
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.sum_pnl = 0.0
+        self.sum_pnl_sq = 0.0
+        self.sum_loss_sq = 0.0
+        self.count_in_market = 0
+        self.sum_exposure = 0.0
+        self.exposure_max = 0.0
+        self.max_drawdown = 0.0
+
+    def add(self, curve):
+        """Add the arrays of a curve, or of the next chunk of one"""
+        pnl = curve['pnl']
+        if not len(pnl):
+            return self
+        self.count += len(pnl)
+        self.sum_pnl += pnl.sum()
+        self.sum_pnl_sq += np.dot(pnl, pnl)
+        loss = np.minimum(pnl, 0)
+        self.sum_loss_sq += np.dot(loss, loss)
+        self.count_in_market += int(np.count_nonzero(curve['count_open']))
+        self.sum_exposure += curve['exposure'].sum()
+        self.exposure_max = max(self.exposure_max, curve['exposure'].max())
+        self.max_drawdown = min(self.max_drawdown, curve['drawdown'].min())
+        return self
+
+    def stats(self, bars_per_year):
+        """Return the metrics as a dict
+
+        'sharpe' and 'sortino' are the mean profit per bar over its
+        standard deviation and over its downside deviation (the root
+        mean square of the losses), scaled by the square root of
+        `bars_per_year`. The curve is in dollars of the traded units,
+        without a capital base, so they are ratios of profits rather
+        than returns. 'time_in_market' is the share of bars with an
+        open position at the close, 'exposure_mean' and 'exposure_max'
+        the mean and largest gross value held, and 'max_drawdown' the
+        largest drop of the equity from a high, a negative number.
+
+        """
+        n = self.count
+        mean = self.sum_pnl / n if n else np.nan
+        var = (self.sum_pnl_sq - n*mean*mean) / (n - 1) if n > 1 else np.nan
+        down = np.sqrt(self.sum_loss_sq / n) if n else np.nan
+        scale = np.sqrt(bars_per_year)
+        sharpe = mean / np.sqrt(var)*scale if var > 0 else np.nan
+        sortino = mean / down*scale if down > 0 else np.nan
+
+        return {
+            'max_drawdown': self.max_drawdown,
+            'sharpe': sharpe,
+            'sortino': sortino,
+            'time_in_market': self.count_in_market / n if n else np.nan,
+            'exposure_mean': self.sum_exposure / n if n else np.nan,
+            'exposure_max': self.exposure_max,
+        }
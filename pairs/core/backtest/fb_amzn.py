@@ -1,509 +0,0 @@
-"""Data for FB-AMZN Spread"""
-
-data = """
-date,price_l,price_r
-2019-03-14,170.1699981689453,1686.219970703125
-2019-03-15,165.97999572753906,1712.3599853515625
-2019-03-18,160.47000122070312,1742.1500244140625
-2019-03-19,161.57000732421875,1761.8499755859375
-2019-03-20,165.44000244140625,1797.27001953125
-2019-03-21,166.0800018310547,1819.260009765625
-2019-03-22,164.33999633789062,1764.77001953125
-2019-03-25,166.2899932861328,1774.260009765625
-2019-03-26,167.67999267578125,1783.760009765625
-2019-03-27,165.8699951171875,1765.699951171875
-2019-03-28,165.5500030517578,1773.4200439453125
-2019-03-29,166.69000244140625,1780.75
-2019-04-01,168.6999969482422,1814.18994140625
-2019-04-02,174.1999969482422,1813.97998046875
-2019-04-03,173.5399932861328,1820.699951171875
-2019-04-04,176.02000427246094,1818.8599853515625
-2019-04-05,175.72000122070312,1837.280029296875
-2019-04-08,174.92999267578125,1849.8599853515625
-2019-04-09,177.5800018310547,1835.8399658203125
-2019-04-10,177.82000732421875,1847.3299560546875
-2019-04-11,177.50999450683594,1844.0699462890625
-2019-04-12,179.10000610351562,1843.06005859375
-2019-04-15,179.64999389648438,1844.8699951171875
-2019-04-16,178.8699951171875,1863.0400390625
-2019-04-17,178.77999877929688,1864.8199462890625
-2019-04-18,178.27999877929688,1861.68994140625
-2019-04-22,181.44000244140625,1887.31005859375
-2019-04-23,183.77999877929688,1923.77001953125
-2019-04-24,182.5800018310547,1901.75
-2019-04-25,193.25999450683594,1902.25
-2019-04-26,191.49000549316406,1950.6300048828125
-2019-04-29,194.77999877929688,1938.4300537109375
-2019-04-30,193.39999389648438,1926.52001953125
-2019-05-01,193.02999877929688,1911.52001953125
-2019-05-02,192.52999877929688,1900.8199462890625
-2019-05-03,195.47000122070312,1962.4599609375
-2019-05-06,193.8800048828125,1950.550048828125
-2019-05-07,189.77000427246094,1921.0
-2019-05-08,189.5399932861328,1917.77001953125
-2019-05-09,188.64999389648438,1899.8699951171875
-2019-05-10,188.33999633789062,1889.97998046875
-2019-05-13,181.5399932861328,1822.6800537109375
-2019-05-14,180.72999572753906,1840.1199951171875
-2019-05-15,186.27000427246094,1871.1500244140625
-2019-05-16,186.99000549316406,1907.5699462890625
-2019-05-17,185.3000030517578,1869.0
-2019-05-20,182.72000122070312,1858.969970703125
-2019-05-21,184.82000732421875,1857.52001953125
-2019-05-22,185.32000732421875,1859.6800537109375
-2019-05-23,180.8699951171875,1815.47998046875
-2019-05-24,181.05999755859375,1823.280029296875
-2019-05-28,184.30999755859375,1836.4300537109375
-2019-05-29,182.19000244140625,1819.18994140625
-2019-05-30,183.00999450683594,1816.3199462890625
-2019-05-31,177.47000122070312,1775.0699462890625
-2019-06-03,164.14999389648438,1692.68994140625
-2019-06-04,167.5,1729.56005859375
-2019-06-05,168.1699981689453,1738.5
-2019-06-06,168.3300018310547,1754.3599853515625
-2019-06-07,173.35000610351562,1804.030029296875
-2019-06-10,174.82000732421875,1860.6300048828125
-2019-06-11,178.10000610351562,1863.699951171875
-2019-06-12,175.0399932861328,1855.3199462890625
-2019-06-13,177.47000122070312,1870.300048828125
-2019-06-14,181.3300018310547,1869.6700439453125
-2019-06-17,189.00999450683594,1886.030029296875
-2019-06-18,188.47000122070312,1901.3699951171875
-2019-06-19,187.47999572753906,1908.7900390625
-2019-06-20,189.52999877929688,1918.18994140625
-2019-06-21,191.13999938964844,1911.300048828125
-2019-06-24,192.60000610351562,1913.9000244140625
-2019-06-25,188.83999633789062,1878.27001953125
-2019-06-26,187.66000366210938,1897.8299560546875
-2019-06-27,189.5,1904.280029296875
-2019-06-28,193.0,1893.6300048828125
-2019-07-01,193.0,1922.18994140625
-2019-07-02,195.0,1934.31005859375
-2019-07-03,197.1999969482422,1939.0
-2019-07-05,196.39999389648438,1942.9100341796875
-2019-07-08,195.75999450683594,1952.3199462890625
-2019-07-09,199.2100067138672,1988.300048828125
-2019-07-10,202.72999572753906,2017.4100341796875
-2019-07-11,201.22999572753906,2001.0699462890625
-2019-07-12,204.8699951171875,2011.0
-2019-07-15,203.91000366210938,2020.989990234375
-2019-07-16,203.83999633789062,2009.9000244140625
-2019-07-17,201.8000030517578,1992.030029296875
-2019-07-18,200.77999877929688,1977.9000244140625
-2019-07-19,198.36000061035156,1964.52001953125
-2019-07-22,202.32000732421875,1985.6300048828125
-2019-07-23,202.36000061035156,1994.489990234375
-2019-07-24,204.66000366210938,2000.81005859375
-2019-07-25,200.7100067138672,1973.8199462890625
-2019-07-26,199.75,1943.050048828125
-2019-07-29,195.94000244140625,1912.449951171875
-2019-07-30,197.0399932861328,1898.530029296875
-2019-07-31,194.22999572753906,1866.780029296875
-2019-08-01,192.72999572753906,1855.3199462890625
-2019-08-02,189.02000427246094,1823.239990234375
-2019-08-05,181.72999572753906,1765.1300048828125
-2019-08-06,184.50999450683594,1787.8299560546875
-2019-08-07,185.14999389648438,1793.4000244140625
-2019-08-08,190.16000366210938,1832.8900146484375
-2019-08-09,187.85000610351562,1807.5799560546875
-2019-08-12,185.3699951171875,1784.9200439453125
-2019-08-13,188.4499969482422,1824.3399658203125
-2019-08-14,179.7100067138672,1762.9599609375
-2019-08-15,182.58999633789062,1776.1199951171875
-2019-08-16,183.6999969482422,1792.5699462890625
-2019-08-19,186.1699981689453,1816.1199951171875
-2019-08-20,183.80999755859375,1801.3800048828125
-2019-08-21,183.5500030517578,1823.5400390625
-2019-08-22,182.0399932861328,1804.6600341796875
-2019-08-23,177.75,1749.6199951171875
-2019-08-26,180.36000061035156,1768.8699951171875
-2019-08-27,181.3000030517578,1761.8299560546875
-2019-08-28,181.75999450683594,1764.25
-2019-08-29,185.57000732421875,1786.4000244140625
-2019-08-30,185.6699981689453,1776.2900390625
-2019-09-03,182.38999938964844,1789.8399658203125
-2019-09-04,187.13999938964844,1800.6199951171875
-2019-09-05,190.89999389648438,1840.719970703125
-2019-09-06,187.49000549316406,1833.510009765625
-2019-09-09,188.75999450683594,1831.3499755859375
-2019-09-10,186.1699981689453,1820.550048828125
-2019-09-11,188.49000549316406,1822.989990234375
-2019-09-12,187.47000122070312,1843.550048828125
-2019-09-13,187.19000244140625,1839.3399658203125
-2019-09-16,186.22000122070312,1807.8399658203125
-2019-09-17,188.0800018310547,1822.550048828125
-2019-09-18,188.13999938964844,1817.4599609375
-2019-09-19,190.13999938964844,1821.5
-2019-09-20,189.92999267578125,1794.1600341796875
-2019-09-23,186.82000732421875,1785.300048828125
-2019-09-24,181.27999877929688,1741.6099853515625
-2019-09-25,182.8000030517578,1768.3299560546875
-2019-09-26,180.11000061035156,1739.8399658203125
-2019-09-27,177.10000610351562,1725.449951171875
-2019-09-30,178.0800018310547,1735.9100341796875
-2019-10-01,175.80999755859375,1735.6500244140625
-2019-10-02,174.60000610351562,1713.22998046875
-2019-10-03,179.3800048828125,1724.4200439453125
-2019-10-04,180.4499969482422,1739.6500244140625
-2019-10-07,179.67999267578125,1732.6600341796875
-2019-10-08,177.75,1705.510009765625
-2019-10-09,179.85000610351562,1721.989990234375
-2019-10-10,180.02999877929688,1720.260009765625
-2019-10-11,184.19000244140625,1731.9200439453125
-2019-10-14,183.27999877929688,1736.4300537109375
-2019-10-15,188.88999938964844,1767.3800048828125
-2019-10-16,189.5500030517578,1777.4300537109375
-2019-10-17,190.38999938964844,1787.47998046875
-2019-10-18,185.85000610351562,1757.510009765625
-2019-10-21,189.75999450683594,1785.6600341796875
-2019-10-22,182.33999633789062,1765.72998046875
-2019-10-23,186.14999389648438,1762.1700439453125
-2019-10-24,186.3800048828125,1780.780029296875
-2019-10-25,187.88999938964844,1761.3299560546875
-2019-10-28,189.39999389648438,1777.0799560546875
-2019-10-29,189.30999755859375,1762.7099609375
-2019-10-30,188.25,1779.989990234375
-2019-10-31,191.64999389648438,1776.6600341796875
-2019-11-01,193.6199951171875,1791.43994140625
-2019-11-04,194.72000122070312,1804.6600341796875
-2019-11-05,194.32000732421875,1801.7099609375
-2019-11-06,191.5500030517578,1795.77001953125
-2019-11-07,190.4199981689453,1788.199951171875
-2019-11-08,190.83999633789062,1785.8800048828125
-2019-11-11,189.61000061035156,1771.6500244140625
-2019-11-12,194.47000122070312,1778.0
-2019-11-13,193.19000244140625,1753.1099853515625
-2019-11-14,193.14999389648438,1754.5999755859375
-2019-11-15,195.10000610351562,1739.489990234375
-2019-11-18,197.39999389648438,1752.530029296875
-2019-11-19,199.32000732421875,1752.7900390625
-2019-11-20,197.50999450683594,1745.530029296875
-2019-11-21,197.92999267578125,1734.7099609375
-2019-11-22,198.82000732421875,1745.719970703125
-2019-11-25,199.7899932861328,1773.8399658203125
-2019-11-26,198.97000122070312,1796.93994140625
-2019-11-27,202.0,1818.510009765625
-2019-11-29,201.63999938964844,1800.800048828125
-2019-12-02,199.6999969482422,1781.5999755859375
-2019-12-03,198.82000732421875,1769.9599609375
-2019-12-04,198.7100067138672,1760.68994140625
-2019-12-05,199.36000061035156,1740.47998046875
-2019-12-06,201.0500030517578,1751.5999755859375
-2019-12-09,201.33999633789062,1749.510009765625
-2019-12-10,200.8699951171875,1739.2099609375
-2019-12-11,202.25999450683594,1748.719970703125
-2019-12-12,196.75,1760.3299560546875
-2019-12-13,194.11000061035156,1760.93994140625
-2019-12-16,197.9199981689453,1769.2099609375
-2019-12-17,198.38999938964844,1790.6600341796875
-2019-12-18,202.5,1784.030029296875
-2019-12-19,206.05999755859375,1792.280029296875
-2019-12-20,206.3000030517578,1786.5
-2019-12-23,206.17999267578125,1793.0
-2019-12-24,205.1199951171875,1789.2099609375
-2019-12-26,207.7899932861328,1868.77001953125
-2019-12-27,208.10000610351562,1869.800048828125
-2019-12-30,204.41000366210938,1846.8900146484375
-2019-12-31,205.25,1847.8399658203125
-2020-01-02,209.77999877929688,1898.010009765625
-2020-01-03,208.6699981689453,1874.969970703125
-2020-01-06,212.60000610351562,1902.8800048828125
-2020-01-07,213.05999755859375,1906.8599853515625
-2020-01-08,215.22000122070312,1891.969970703125
-2020-01-09,218.3000030517578,1901.050048828125
-2020-01-10,218.05999755859375,1883.1600341796875
-2020-01-13,221.91000366210938,1891.300048828125
-2020-01-14,219.05999755859375,1869.43994140625
-2020-01-15,221.14999389648438,1862.02001953125
-2020-01-16,221.77000427246094,1877.93994140625
-2020-01-17,222.13999938964844,1864.719970703125
-2020-01-21,221.44000244140625,1892.0
-2020-01-22,221.32000732421875,1887.4599609375
-2020-01-23,219.75999450683594,1884.5799560546875
-2020-01-24,217.94000244140625,1861.6400146484375
-2020-01-27,214.8699951171875,1828.3399658203125
-2020-01-28,217.7899932861328,1853.25
-2020-01-29,223.22999572753906,1858.0
-2020-01-30,209.52999877929688,1870.6800537109375
-2020-01-31,201.91000366210938,2008.719970703125
-2020-02-03,204.19000244140625,2004.199951171875
-2020-02-04,209.8300018310547,2049.669921875
-2020-02-05,210.11000061035156,2039.8699951171875
-2020-02-06,210.85000610351562,2050.22998046875
-2020-02-07,212.3300018310547,2079.280029296875
-2020-02-10,213.05999755859375,2133.909912109375
-2020-02-11,207.19000244140625,2150.800048828125
-2020-02-12,210.75999450683594,2160.0
-2020-02-13,213.13999938964844,2149.8701171875
-2020-02-14,214.17999267578125,2134.8701171875
-2020-02-18,217.8000030517578,2155.669921875
-2020-02-19,217.49000549316406,2170.219970703125
-2020-02-20,214.5800018310547,2153.10009765625
-2020-02-21,210.17999267578125,2095.969970703125
-2020-02-24,200.72000122070312,2009.2900390625
-2020-02-25,196.77000427246094,1972.739990234375
-2020-02-26,197.1999969482422,1979.5899658203125
-2020-02-27,189.75,1884.300048828125
-2020-02-28,192.47000122070312,1883.75
-2020-03-02,196.44000244140625,1953.949951171875
-2020-03-03,185.88999938964844,1908.989990234375
-2020-03-04,191.75999450683594,1975.8299560546875
-2020-03-05,185.1699981689453,1924.030029296875
-2020-03-06,181.08999633789062,1901.0899658203125
-2020-03-09,169.5,1800.6099853515625
-2020-03-10,178.19000244140625,1891.8199462890625
-2020-03-11,170.24000549316406,1820.8599853515625
-2020-03-12,154.47000122070312,1676.6099853515625
-2020-03-13,170.27999877929688,1785.0
-2020-03-16,146.00999450683594,1689.1500244140625
-2020-03-17,149.4199981689453,1807.8399658203125
-2020-03-18,146.9600067138672,1830.0
-2020-03-19,153.1300048828125,1880.9300537109375
-2020-03-20,149.72999572753906,1846.0899658203125
-2020-03-23,148.10000610351562,1902.8299560546875
-2020-03-24,160.97999572753906,1940.0999755859375
-2020-03-25,156.2100067138672,1885.8399658203125
-2020-03-26,163.33999633789062,1955.489990234375
-2020-03-27,156.7899932861328,1900.0999755859375
-2020-03-30,165.9499969482422,1963.949951171875
-2020-03-31,166.8000030517578,1949.719970703125
-2020-04-01,159.60000610351562,1907.699951171875
-2020-04-02,158.19000244140625,1918.8299560546875
-2020-04-03,154.17999267578125,1906.5899658203125
-2020-04-06,165.5500030517578,1997.5899658203125
-2020-04-07,168.8300018310547,2011.5999755859375
-2020-04-08,174.27999877929688,2043.0
-2020-04-09,175.19000244140625,2042.760009765625
-2020-04-13,174.7899932861328,2168.8701171875
-2020-04-14,178.1699981689453,2283.320068359375
-2020-04-15,176.97000122070312,2307.679931640625
-2020-04-16,176.25,2408.18994140625
-2020-04-17,179.24000549316406,2375.0
-2020-04-20,178.24000549316406,2393.610107421875
-2020-04-21,170.8000030517578,2328.1201171875
-2020-04-22,182.27999877929688,2363.489990234375
-2020-04-23,185.1300048828125,2399.449951171875
-2020-04-24,190.07000732421875,2410.219970703125
-2020-04-27,187.5,2376.0
-2020-04-28,182.91000366210938,2314.080078125
-2020-04-29,194.19000244140625,2372.7099609375
-2020-04-30,204.7100067138672,2474.0
-2020-05-01,202.27000427246094,2286.0400390625
-2020-05-04,205.25999450683594,2315.989990234375
-2020-05-05,207.07000732421875,2317.800048828125
-2020-05-06,208.47000122070312,2351.260009765625
-2020-05-07,211.25999450683594,2367.610107421875
-2020-05-08,212.35000610351562,2379.610107421875
-2020-05-11,213.17999267578125,2409.0
-2020-05-12,210.10000610351562,2356.949951171875
-2020-05-13,205.10000610351562,2367.919921875
-2020-05-14,206.80999755859375,2388.85009765625
-2020-05-15,210.8800048828125,2409.780029296875
-2020-05-18,213.19000244140625,2426.260009765625
-2020-05-19,216.8800048828125,2449.330078125
-2020-05-20,229.97000122070312,2497.93994140625
-2020-05-21,231.38999938964844,2446.739990234375
-2020-05-22,234.91000366210938,2436.8798828125
-2020-05-26,232.1999969482422,2421.860107421875
-2020-05-27,229.13999938964844,2410.389892578125
-2020-05-28,225.4600067138672,2401.10009765625
-2020-05-29,225.08999633789062,2442.3701171875
-2020-06-01,231.91000366210938,2471.0400390625
-2020-06-02,232.72000122070312,2472.409912109375
-2020-06-03,230.16000366210938,2478.39990234375
-2020-06-04,226.2899932861328,2460.60009765625
-2020-06-05,230.77000427246094,2483.0
-2020-06-08,231.39999389648438,2524.06005859375
-2020-06-09,238.6699981689453,2600.860107421875
-2020-06-10,236.72999572753906,2647.449951171875
-2020-06-11,224.42999267578125,2557.9599609375
-2020-06-12,228.5800018310547,2545.02001953125
-2020-06-15,232.5,2572.679931640625
-2020-06-16,235.64999389648438,2615.27001953125
-2020-06-17,235.52999877929688,2640.97998046875
-2020-06-18,235.94000244140625,2653.97998046875
-2020-06-19,238.7899932861328,2675.010009765625
-2020-06-22,239.22000122070312,2713.820068359375
-2020-06-23,242.24000549316406,2764.409912109375
-2020-06-24,234.02000427246094,2734.39990234375
-2020-06-25,235.67999267578125,2754.580078125
-2020-06-26,216.0800018310547,2692.8701171875
-2020-06-29,220.63999938964844,2680.3798828125
-2020-06-30,227.07000732421875,2758.820068359375
-2020-07-01,237.5500030517578,2878.699951171875
-2020-07-02,233.4199981689453,2890.300048828125
-2020-07-06,240.27999877929688,3057.0400390625
-2020-07-07,240.86000061035156,3000.1201171875
-2020-07-08,243.5800018310547,3081.110107421875
-2020-07-09,244.5,3182.6298828125
-2020-07-10,245.07000732421875,3200.0
-2020-07-13,239.0,3104.0
-2020-07-14,239.72999572753906,3084.0
-2020-07-15,240.27999877929688,3008.8701171875
-2020-07-16,240.92999267578125,2999.89990234375
-2020-07-17,242.02999877929688,2961.969970703125
-2020-07-20,245.4199981689453,3196.840087890625
-2020-07-21,241.75,3138.2900390625
-2020-07-22,239.8699951171875,3099.909912109375
-2020-07-23,232.60000610351562,2986.550048828125
-2020-07-24,230.7100067138672,3008.909912109375
-2020-07-27,233.5,3055.2099609375
-2020-07-28,230.1199951171875,3000.330078125
-2020-07-29,233.2899932861328,3033.530029296875
-2020-07-30,234.5,3051.8798828125
-2020-07-31,253.6699981689453,3164.679931640625
-2020-08-03,251.9600067138672,3111.889892578125
-2020-08-04,249.8300018310547,3138.830078125
-2020-08-05,249.1199951171875,3205.030029296875
-2020-08-06,265.2799987792969,3225.0
-2020-08-07,268.44000244140625,3167.4599609375
-2020-08-10,263.0,3148.159912109375
-2020-08-11,256.1300048828125,3080.669921875
-2020-08-12,259.8900146484375,3162.239990234375
-2020-08-13,261.29998779296875,3161.02001953125
-2020-08-14,261.239990234375,3148.02001953125
-2020-08-17,261.1600036621094,3182.409912109375
-2020-08-18,262.3399963378906,3312.489990234375
-2020-08-19,262.5899963378906,3260.47998046875
-2020-08-20,269.010009765625,3297.3701171875
-2020-08-21,267.010009765625,3284.719970703125
-2020-08-24,271.3900146484375,3307.4599609375
-2020-08-25,280.82000732421875,3346.489990234375
-2020-08-26,303.9100036621094,3441.85009765625
-2020-08-27,293.2200012207031,3400.0
-2020-08-28,293.6600036621094,3401.800048828125
-2020-08-31,293.20001220703125,3450.9599609375
-2020-09-01,295.44000244140625,3499.1201171875
-2020-09-02,302.5,3531.449951171875
-2020-09-03,291.1199951171875,3368.0
-2020-09-04,282.7300109863281,3294.6201171875
-2020-09-08,271.1600036621094,3149.840087890625
-2020-09-09,273.7200012207031,3268.610107421875
-2020-09-10,268.0899963378906,3175.110107421875
-2020-09-11,266.6099853515625,3116.219970703125
-2020-09-14,266.1499938964844,3102.969970703125
-2020-09-15,272.4200134277344,3156.1298828125
-2020-09-16,263.5199890136719,3078.10009765625
-2020-09-17,254.82000732421875,3008.72998046875
-2020-09-18,252.52999877929688,2954.909912109375
-2020-09-21,248.14999389648438,2960.469970703125
-2020-09-22,254.75,3128.989990234375
-2020-09-23,249.02000427246094,2999.860107421875
-2020-09-24,249.52999877929688,3019.7900390625
-2020-09-25,254.82000732421875,3095.1298828125
-2020-09-28,256.82000732421875,3174.050048828125
-2020-09-29,261.7900085449219,3144.8798828125
-2020-09-30,261.8999938964844,3148.72998046875
-2020-10-01,266.6300048828125,3221.260009765625
-2020-10-02,259.94000244140625,3125.0
-2020-10-05,264.6499938964844,3199.199951171875
-2020-10-06,258.6600036621094,3099.9599609375
-2020-10-07,258.1199951171875,3195.68994140625
-2020-10-08,263.760009765625,3190.550048828125
-2020-10-09,264.45001220703125,3286.64990234375
-2020-10-12,275.75,3442.929931640625
-2020-10-13,276.1400146484375,3443.6298828125
-2020-10-14,271.82000732421875,3363.7099609375
-2020-10-15,266.7200012207031,3338.64990234375
-2020-10-16,265.92999267578125,3272.7099609375
-2020-10-19,261.3999938964844,3207.2099609375
-2020-10-20,267.55999755859375,3217.010009765625
-2020-10-21,278.7300109863281,3184.93994140625
-2020-10-22,278.1199951171875,3176.39990234375
-2020-10-23,284.7900085449219,3204.39990234375
-2020-10-26,277.1099853515625,3207.0400390625
-2020-10-27,283.2900085449219,3286.330078125
-2020-10-28,267.6700134277344,3162.780029296875
-2020-10-29,280.8299865722656,3211.010009765625
-2020-10-30,263.1099853515625,3036.14990234375
-2020-11-02,261.3599853515625,3004.47998046875
-2020-11-03,265.29998779296875,3048.409912109375
-2020-11-04,287.3800048828125,3241.159912109375
-2020-11-05,294.67999267578125,3322.0
-2020-11-06,293.4100036621094,3311.3701171875
-2020-11-09,278.7699890136719,3143.739990234375
-2020-11-10,272.42999267578125,3035.02001953125
-2020-11-11,276.4800109863281,3137.389892578125
-2020-11-12,275.0799865722656,3110.280029296875
-2020-11-13,276.95001220703125,3128.81005859375
-2020-11-16,278.9599914550781,3131.06005859375
-2020-11-17,275.0,3135.659912109375
-2020-11-18,271.9700012207031,3105.4599609375
-2020-11-19,272.94000244140625,3117.02001953125
-2020-11-20,269.70001220703125,3099.39990234375
-2020-11-23,268.42999267578125,3098.389892578125
-2020-11-24,276.9200134277344,3118.06005859375
-2020-11-25,275.5899963378906,3185.070068359375
-2020-11-27,277.80999755859375,3195.340087890625
-2020-11-30,276.9700012207031,3168.0400390625
-2020-12-01,286.54998779296875,3220.080078125
-2020-12-02,287.5199890136719,3203.530029296875
-2020-12-03,281.8500061035156,3186.72998046875
-2020-12-04,279.70001220703125,3162.580078125
-2020-12-07,285.5799865722656,3158.0
-2020-12-08,283.3999938964844,3177.2900390625
-2020-12-09,277.9200134277344,3104.199951171875
-2020-12-10,277.1199951171875,3101.489990234375
-2020-12-11,273.54998779296875,3116.419921875
-2020-12-14,274.19000244140625,3156.969970703125
-2020-12-15,275.54998779296875,3165.1201171875
-2020-12-16,275.6700134277344,3240.9599609375
-2020-12-17,274.4800109863281,3236.080078125
-2020-12-18,276.3999938964844,3201.64990234375
-2020-12-21,272.7900085449219,3206.179931640625
-2020-12-22,267.0899963378906,3206.52001953125
-2020-12-23,268.1099853515625,3185.27001953125
-2020-12-24,267.3999938964844,3172.68994140625
-2020-12-28,277.0,3283.9599609375
-2020-12-29,276.7799987792969,3322.0
-2020-12-30,271.8699951171875,3285.85009765625
-2020-12-31,273.1600036621094,3256.929931640625
-2021-01-04,268.94000244140625,3186.6298828125
-2021-01-05,270.9700012207031,3218.510009765625
-2021-01-06,263.30999755859375,3138.3798828125
-2021-01-07,268.739990234375,3162.159912109375
-2021-01-08,267.57000732421875,3182.699951171875
-2021-01-11,256.8399963378906,3114.2099609375
-2021-01-12,251.08999633789062,3120.830078125
-2021-01-13,251.63999938964844,3165.889892578125
-2021-01-14,245.63999938964844,3127.469970703125
-2021-01-15,251.36000061035156,3104.25
-2021-01-19,261.1000061035156,3120.760009765625
-2021-01-20,267.4800109863281,3263.3798828125
-2021-01-21,272.8699951171875,3306.989990234375
-2021-01-22,274.5,3292.22998046875
-2021-01-25,278.010009765625,3294.0
-2021-01-26,282.04998779296875,3326.1298828125
-2021-01-27,272.1400146484375,3232.580078125
-2021-01-28,265.0,3237.6201171875
-2021-01-29,258.3299865722656,3206.199951171875
-2021-02-01,262.010009765625,3342.8798828125
-2021-02-02,267.0799865722656,3380.0
-2021-02-03,266.6499938964844,3312.530029296875
-2021-02-04,266.489990234375,3331.0
-2021-02-05,268.1000061035156,3352.14990234375
-2021-02-08,266.5799865722656,3322.93994140625
-2021-02-09,269.45001220703125,3305.0
-2021-02-10,271.8699951171875,3286.580078125
-2021-02-11,270.3900146484375,3262.1298828125
-2021-02-12,270.5,3277.7099609375
-2021-02-16,273.9700012207031,3268.949951171875
-2021-02-17,273.57000732421875,3308.639892578125
-2021-02-18,269.3900146484375,3328.22998046875
-2021-02-19,261.55999755859375,3249.89990234375
-2021-02-22,260.3299865722656,3180.739990234375
-2021-02-23,265.8599853515625,3194.5
-2021-02-24,264.30999755859375,3159.530029296875
-2021-02-25,254.69000244140625,3057.159912109375
-2021-02-26,257.6199951171875,3092.929931640625
-2021-03-01,264.9100036621094,3146.139892578125
-2021-03-02,259.0,3094.530029296875
-2021-03-03,255.41000366210938,3005.0
-2021-03-04,257.6400146484375,2977.570068359375
-2021-03-05,264.2799987792969,3000.4599609375
-2021-03-08,255.30999755859375,2951.949951171875
-2021-03-09,265.739990234375,3062.85009765625
-2021-03-10,264.8999938964844,3057.639892578125
-2021-03-11,273.8800048828125,3113.590087890625
-2021-03-12,268.3999938964844,3089.489990234375
-"""
@@ -0,0 +1,176 @@
+"""Price fixtures stored as memory-mapped NumPy arrays
+
+A fixture is a directory with one file per group of columns:
+
+- 'meta.json', the column names in order, the value dtype and the time
+  zone of the date column
+- 'date.npy', the dates as int64 nanoseconds since the epoch (UTC)
+- 'values.npy', every other column, as one (columns, rows) array so that
+  each column is contiguous
+
+Loading memory-maps both arrays and wraps them in a dataframe without
+copying, so a fixture of any size loads in about the same time and
+pages are only read from disk when they are used. The maps are
+copy-on-write: writes to the dataframe stay in memory.
+
+Fixtures shipped with the package, e.g. the FB/AMZN example, are in the
+'data' directory next to this module. Large synthetic fixtures are
+written with `write_synthetic` in chunks, so they need not fit in memory.
+
+"""
+import json
+import os
+from os.path import join, exists, isdir, dirname
+import numpy as np
+import pandas as pd
+from ..exc import PairsError
+
+# fixtures shipped as package data
+FIXTURE_DIR = join(dirname(__file__), 'data')
+
+
+def fixture_path(name):
+    """Return the directory of the fixture `name` or of the path `name`"""
+    if isdir(name):
+        return name
+    path = join(FIXTURE_DIR, name)
+    if not exists(join(path, 'meta.json')):
+        raise PairsError(f"No fixture '{name}'.")
+    return path
+
+
+def _write_meta(path, columns, dtype, tz):
+    os.makedirs(path, exist_ok=True)
+    meta = {'columns': list(columns), 'dtype': np.dtype(dtype).name,
+            'tz': tz}
+    with open(join(path, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+
+def save_fixture(df, path, dtype='float64'):
+    """Write the prices `df` as a fixture
+
+    Parameters
+    ----------
+    df : DataFrame
+        A 'date' column, tz-aware or naive, and numeric columns, which
+        are stored as `dtype`.
+
+    path : str
+        Directory of the fixture, created if it does not exist.
+
+    """
+    if 'date' not in df.columns:
+        raise PairsError("Fixtures need a 'date' column.")
+    date = pd.DatetimeIndex(df['date'])
+    tz = None if date.tz is None else str(date.tz)
+    cols = [x for x in df.columns if x != 'date']
+    _write_meta(path, cols, dtype, tz)
+    np.save(join(path, 'date.npy'), date.asi8)
+    np.save(join(path, 'values.npy'),
+            df[cols].to_numpy(dtype=dtype).T.copy())
+
+
+def load_fixture(name, mmap=True):
+    """Load a fixture as a dataframe
+
+    Parameters
+    ----------
+    name : str
+        Name of a fixture shipped with the package, e.g. 'fb_amzn', or
+        the directory of one.
+
+    mmap : bool
+        Memory-map the arrays (copy-on-write) instead of reading them.
+
+    Returns
+    -------
+    df : DataFrame
+        Columns 'date' and the stored columns, whose values share memory
+        with the map.
+
+    """
+    path = fixture_path(name)
+    with open(join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    mode = 'c' if mmap else None
+    date = np.load(join(path, 'date.npy'), mmap_mode=mode)
+    values = np.load(join(path, 'values.npy'), mmap_mode=mode)
+
+    df = pd.DataFrame(values.T, columns=meta['columns'], copy=False)
+    dtype = 'datetime64[ns]' if meta['tz'] is None \
+        else pd.DatetimeTZDtype(tz=meta['tz'])
+    df.insert(0, 'date', pd.arrays.DatetimeArray(date.view('M8[ns]'),
+                                                 dtype=dtype))
+
+    return df
+
+
+def synthetic_chunks(n, seed=0, beta=0.5, vol=1e-3, phi=0.95, noise=0.5,
+                     chunk=1_000_000):
+    """Generate the prices of a cointegrated pair in chunks
+
+    See `helpers.synthetic_pair` for the model. The left and right
+    series draw from separate streams seeded by `seed`, and the state
+    of the random walk and of the AR(1) spread is carried over between
+    chunks, so the prices only depend on `chunk` up to rounding.
+
+    Yields arrays `price_l` and `price_r` of at most `chunk` bars.
+
+    """
+    from scipy.signal import lfilter
+    rng_l, rng_s = [np.random.default_rng(x)
+                    for x in np.random.SeedSequence(seed).spawn(2)]
+    level = 0.0
+    last = 0.0
+    for start in range(0, n, chunk):
+        size = min(chunk, n - start)
+        log_l = level + np.cumsum(rng_l.normal(0, vol, size))
+        spread, _ = lfilter([1], [1, -phi], rng_s.normal(0, noise, size),
+                            zi=[phi*last])
+        level, last = log_l[-1], spread[-1]
+        price_l = 100*np.exp(log_l)
+        yield price_l, beta*price_l + 20 + spread
+
+
+def write_synthetic(path, n, seed=0, freq='1min', dtype='float64',
+                    chunk=1_000_000, **kw):
+    """Write a synthetic cointegrated pair of `n` bars as a fixture
+
+    Prices are generated and written `chunk` bars at a time into
+    memory-mapped files, so memory use does not grow with `n`. Bars are
+    `freq` apart (a fixed frequency) from 2020-01-01, other keywords go
+    to `synthetic_chunks`. With the default `chunk`, loading the fixture
+    gives the same prices as `helpers.synthetic_pair` with the same
+    arguments.
+
+    Returns `path`.
+
+    """
+    if n < 1:
+        raise PairsError('Fixtures need at least one bar.')
+    try:
+        step = pd.Timedelta(freq).value
+    except ValueError:
+        step = 0
+    if step <= 0:
+        raise PairsError(f"Frequency '{freq}' must be a fixed interval.")
+    _write_meta(path, ['price_l', 'price_r'], dtype, None)
+    date = np.lib.format.open_memmap(join(path, 'date.npy'), mode='w+',
+                                     dtype=np.int64, shape=(n,))
+    values = np.lib.format.open_memmap(join(path, 'values.npy'), mode='w+',
+                                       dtype=dtype, shape=(2, n))
+    origin = pd.Timestamp('2020-01-01').value
+    start = 0
+    for price_l, price_r in synthetic_chunks(n, seed=seed, chunk=chunk, **kw):
+        stop = start + len(price_l)
+        date[start:stop] = origin + step*np.arange(start, stop,
+                                                   dtype=np.int64)
+        values[0, start:stop] = price_l
+        values[1, start:stop] = price_r
+        start = stop
+    date.flush()
+    values.flush()
+    del date, values
+
+    return path
@@ -1,10 +1,18 @@
 """Funcs to retrieve data for a pair and setup"""
 import pandas as pd
-from ..yahoo_finance_data.retrieve import get_data
+from ..providers import YahooProvider
 
 
-def get_pair(symbol_left, symbol_right):
-    """Use yfinance to get daily data
+def date_range(days):
+    """Return the range of the last `days` calendar days up to today"""
+    end = pd.Timestamp.utcnow().tz_convert('US/Central').floor('D')
+
+    return end - pd.Timedelta(days=days), end
+
+
+def get_pair(symbol_left, symbol_right, days=365*2, cache=None,
+             provider=None, interval='1d'):
+    """Get data for a pair from a data provider, yfinance by default
 
     Returns a dataframe with columns date, price_l and price_r, i.e. 
     in this form: 
@@ -17,8 +25,33 @@ def get_pair(symbol_left, symbol_right):
     | 2021-03-11 00:00:00 |    273.88 |   3113.59 |
     | 2021-03-12 00:00:00 |    268.4  |   3089.49 |
 
+    Both symbols are fetched with one `get_many` call of `provider` (see
+    `pairs.core.providers`). Without a provider, a `YahooProvider` using
+    the optional `PriceCache` `cache` is used. A symbol paired with
+    itself is fetched once.
+
+    """
+    prices = get_prices([symbol_left, symbol_right], days=days, cache=cache,
+                        provider=provider, interval=interval, how='inner')
+    prices = prices[[symbol_left, symbol_right]]
+    prices.columns = ['price_l', 'price_r']
+
+    return prices.rename_axis('date').reset_index()
+
+
+def get_prices(symbols, days=365*2, cache=None, provider=None, interval='1d',
+               how='outer'):
+    """Get closing prices for many symbols from a data provider
+
+    Each symbol is retrieved once, concurrently, see
+    `ProviderHandler.get_many`. Returns a dataframe indexed by date with
+    one column of prices per symbol. With `how='outer'`, dates missing
+    for some symbols are kept as NaN. `cache` is an optional
+    `PriceCache`, used when no `provider` is given.
+
     """
-    l = get_data(symbol_left, days=365*2).rename(columns={'close':'price_l'})
-    r = get_data(symbol_right, days=365*2).rename(columns={'close':'price_r'})
+    if provider is None:
+        provider = YahooProvider(cache=cache)
+    start, end = date_range(days)
 
-    return l[['date', 'price_l']].merge(r[['date', 'price_r']], on=['date'])
+    return provider.get_many(symbols, start, end, interval=interval, how=how)
@@ -0,0 +1,234 @@
+"""Hedge ratios, the shares of the right asset traded per share of the left
+
+`calculate_inputs.setup` picks the method with the param `hedge`:
+
+- "vol" (the default), the volatility ratio
+  `price_l*std_l / (price_r*std_r)` over the rolling return stds of
+  `setup`
+- "rolling_ols", the slope of a regression of `price_l` on `price_r`
+  (with an intercept) over the last `window_hedge` bars
+- "kalman", the slope of the same regression estimated by a Kalman
+  filter that lets slope and intercept drift as random walks
+
+The regression methods work on arrays of one pair, or of many pairs
+stacked as columns of 2-D arrays, and take O(n) time in the number of
+bars: rolling sums are differences of cumulative sums, and the Kalman
+filter is a single recursive loop compiled with numba when it is
+installed. Both can also run segment by segment over consecutive bars,
+carrying a state from one segment to the next (see `hedge_ratio`), so
+that long intraday series need not be held in float64 at once.
+
+"""
+import numpy as np
+from ..exc import PairsError
+from ..jit import njit
+from ..options import HEDGES, HEDGE_PARAMS
+from .rolling import blockwise, centered, window_sum
+
+# values of the `HEDGE_PARAMS` missing from the params, window_hedge
+# defaults to window_std
+DEFAULTS = dict(zip(HEDGE_PARAMS, ['vol', None, 1e-4, 1e-3]))
+
+# state of the Kalman filter of a pair, the slope, the intercept and
+# their covariance
+KALMAN_STATE = ('beta', 'alpha', 'p00', 'p01', 'p11')
+
+
+def hedge_params(params):
+    """Return the hedge params of `params` as a dict, with defaults
+
+    Raises PairsError if the method is unknown.
+
+    """
+    hp = {k: params.get(k, v) for k, v in DEFAULTS.items()}
+    if hp['hedge'] not in HEDGES:
+        raise PairsError(f"Unknown hedge '{hp['hedge']}', must be one of "
+                         f"{HEDGES}.")
+    if hp['window_hedge'] is None:
+        hp['window_hedge'] = params['window_std']
+    hp['window_hedge'] = int(hp['window_hedge'])
+    hp['kalman_delta'] = float(hp['kalman_delta'])
+    hp['kalman_obs_var'] = float(hp['kalman_obs_var'])
+
+    return hp
+
+
+def vol_ratio(price_l, price_r, std_l, std_r):
+    """The volatility weighted hedge ratio of the "vol" method"""
+    return (price_l*std_l) / (price_r*std_r)
+
+
+def _ols(y, x, window):
+    valid = ~(np.isnan(y) | np.isnan(x))
+    count = window_sum(valid.astype(np.float64), window)
+    y, _ = centered(y, valid)
+    x, _ = centered(x, valid)
+    sx = window_sum(x, window)
+    sy = window_sum(y, window)
+    sxy = window_sum(x*y, window)
+    sxx = window_sum(x*x, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        var = sxx - sx*sx/window
+        beta = (sxy - sx*sy/window) / var
+    beta[(count < window) | ~(var > 0)] = np.nan
+
+    return beta
+
+
+def rolling_ols(y, x, window):
+    """Rolling slope of a regression of `y` on `x` with an intercept
+
+    The slope of bar `i` is `cov(x, y) / var(x)` over the bars
+    `i - window + 1` to `i`, NaN until the window holds `window` bars
+    where both are valid, like `rolling(window)` in pandas. The window
+    sums are taken from cumulative sums of blocks of the series, each
+    centered on its mean (see `rolling.blockwise`), which keeps the
+    rounding error of the differences small.
+
+    Parameters
+    ----------
+    y, x : array
+        Prices of shape (bars,) or (bars, pairs).
+
+    window : int
+        Bars of the regression.
+
+    Returns
+    -------
+    beta : ndarray
+        Slopes with the shape of `y`.
+
+    """
+    y = np.asarray(y, dtype=np.float64)
+    x = np.asarray(x, dtype=np.float64)
+    if y.shape != x.shape:
+        raise PairsError('Both sides of the hedge need the same shape.')
+    if window < 2:
+        raise PairsError('The hedge window needs at least 2 bars.')
+    return blockwise(_ols, window, y, x)
+
+
+@njit
+def _kalman_loop(y, x, delta, obs_var, state, out):
+    wvar = delta / (1 - delta)
+    for p in range(y.shape[0]):
+        beta = state[p, 0]
+        alpha = state[p, 1]
+        # covariance of the state (beta, alpha)
+        p00 = state[p, 2]
+        p01 = state[p, 3]
+        p11 = state[p, 4]
+        for i in range(y.shape[1]):
+            # predict, the state is a random walk
+            p00 += wvar
+            p11 += wvar
+            out[p, i] = beta
+            yi = y[p, i]
+            xi = x[p, i]
+            if yi != yi or xi != xi:
+                continue
+
+            # update with the observation y = beta*x + alpha
+            e = yi - beta*xi - alpha
+            r0 = p00*xi + p01
+            r1 = p01*xi + p11
+            q = r0*xi + r1 + obs_var
+            k0 = r0 / q
+            k1 = r1 / q
+            beta += k0*e
+            alpha += k1*e
+            p00 -= k0*r0
+            p01 -= k0*r1
+            p11 -= k1*r1
+        state[p, 0] = beta
+        state[p, 1] = alpha
+        state[p, 2] = p00
+        state[p, 3] = p01
+        state[p, 4] = p11
+
+
+def kalman(y, x, delta=1e-4, obs_var=1e-3, state=None):
+    """Slope of `y` on `x` estimated by a Kalman filter
+
+    The slope and intercept of `y = beta*x + alpha + e` follow random
+    walks with variance `delta / (1 - delta)` per bar, and `e` has
+    variance `obs_var`. Larger `delta` adapts faster. The hedge ratio of
+    a bar is the slope predicted from the bars before it, so the spread
+    of a bar is not fitted to the bar itself. Bars where either price is
+    NaN only advance the prediction.
+
+    Parameters
+    ----------
+    y, x : array
+        Prices of shape (bars,) or (bars, pairs).
+
+    delta, obs_var : float
+        The variances of the state and of the observations.
+
+    state : ndarray
+        The `KALMAN_STATE` of every pair before the first bar, of shape
+        (pairs, 5), updated in place to the state after the last bar.
+        Defaults to zeros.
+
+    Returns
+    -------
+    beta : ndarray
+        Slopes with the shape of `y`, 0 on the first bar (or the slope
+        of `state`).
+
+    """
+    y = np.asarray(y, dtype=np.float64)
+    x = np.asarray(x, dtype=np.float64)
+    if y.shape != x.shape:
+        raise PairsError('Both sides of the hedge need the same shape.')
+    if not 0 < delta < 1:
+        raise PairsError('kalman_delta must be between 0 and 1.')
+    # one contiguous row of bars per pair
+    y2 = np.ascontiguousarray(np.atleast_2d(y.T).reshape(-1, len(y)))
+    x2 = np.ascontiguousarray(np.atleast_2d(x.T).reshape(-1, len(x)))
+    out = np.empty_like(y2)
+    if state is None:
+        state = np.zeros((len(y2), len(KALMAN_STATE)))
+    if state.shape != (len(y2), len(KALMAN_STATE)):
+        raise PairsError('The Kalman state needs one row per pair.')
+    _kalman_loop(y2, x2, float(delta), float(obs_var), state, out)
+
+    return out.reshape(y.T.shape).T
+
+
+def hedge_ratio(price_l, price_r, params, state=None):
+    """Hedge ratios of the method selected by `params`
+
+    Returns the ratios of "rolling_ols" and "kalman" with the shape of
+    the prices, see `rolling_ols` and `kalman`, or None for "vol",
+    whose ratio depends on the rolling stds calculated by `setup`.
+
+    Passing the same dict `state` (empty at first) to calls on
+    consecutive segments of the prices returns the ratios of every
+    segment as one call on all of them would: it carries the last
+    `window_hedge - 1` bars of "rolling_ols" and the filter state of
+    "kalman" from one segment to the next.
+
+    """
+    hp = hedge_params(params)
+    if hp['hedge'] == 'rolling_ols':
+        if state is None:
+            return rolling_ols(price_l, price_r, hp['window_hedge'])
+        y = np.asarray(price_l, dtype=np.float64)
+        x = np.asarray(price_r, dtype=np.float64)
+        if 'y' in state:
+            y = np.concatenate([state['y'], y])
+            x = np.concatenate([state['x'], x])
+        beta = rolling_ols(y, x, hp['window_hedge'])
+        offset = len(y) - len(price_l)
+        first = max(len(y) - hp['window_hedge'] + 1, 0)
+        state['y'], state['x'] = y[first:], x[first:]
+        return beta[offset:]
+    elif hp['hedge'] == 'kalman':
+        if state is not None and 'kalman' not in state:
+            pairs = 1 if np.ndim(price_l) < 2 else np.shape(price_l)[1]
+            state['kalman'] = np.zeros((pairs, len(KALMAN_STATE)))
+        return kalman(price_l, price_r, hp['kalman_delta'],
+                      hp['kalman_obs_var'],
+                      None if state is None else state['kalman'])
+    return None
@@ -1,12 +1,44 @@
 """Misc funcs for backtester"""
+import numpy as np
 import pandas as pd
-from io import StringIO
-from . import fb_amzn
+from . import fixtures
 
 
 def load_example():
-    """Load example input data"""
-    df = pd.read_csv(StringIO(fb_amzn.data))
-    df['date'] = pd.to_datetime(df['date']).dt.tz_localize('US/Central')
+    """Load example input data
 
-    return df
+    The FB/AMZN fixture is memory-mapped, see `fixtures.load_fixture`.
+
+    """
+    return fixtures.load_fixture('fb_amzn')
+
+
+def synthetic_pair(n, seed=0, freq='1min', beta=0.5, vol=1e-3, phi=0.95,
+                   noise=0.5):
+    """Generate prices of a cointegrated pair
+
+    The left price is a geometric random walk around 100 with per-bar
+    log return std `vol`. The right price is `beta` times the left price
+    plus 20 plus AR(1) noise with coefficient `phi` and innovation std
+    `noise`, so the spread between them is stationary. The same `seed`
+    gives the same prices.
+
+    Returns a dataframe with columns 'date' (bars of `freq` from
+    2020-01-01), 'price_l' and 'price_r'. Pairs too large to hold in
+    memory are written to disk with `fixtures.write_synthetic`.
+
+    """
+    price_l = np.empty(n)
+    price_r = np.empty(n)
+    start = 0
+    for l, r in fixtures.synthetic_chunks(n, seed=seed, beta=beta, vol=vol,
+                                          phi=phi, noise=noise):
+        price_l[start:start + len(l)] = l
+        price_r[start:start + len(r)] = r
+        start += len(l)
+
+    return pd.DataFrame({
+        'date': pd.date_range('2020-01-01', periods=n, freq=freq),
+        'price_l': price_l,
+        'price_r': price_r,
+    })
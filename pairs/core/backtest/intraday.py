@@ -0,0 +1,334 @@
+"""Memory-bounded backtest for intraday (e.g. minute) bars
+
+Millions of bars do not fit the daily pipeline, which keeps every
+`setup` column of every bar in a dataframe and snapshots rows for each
+trade. Here the prices are held as columnar arrays (int64 dates and, by
+default, float32 prices) and the setup columns and the position state
+machine are run chunk by chunk, so that only one chunk of float64
+working arrays exists at a time. The chunk size follows from a memory
+budget.
+
+Rolling statistics only look back a bounded number of bars, so every
+chunk is set up from a warm-up of preceding bars. A chunk ends flat or
+with a position still open; the next chunk starts on the bar where that
+position was opened (or after the last bar of the chunk if it ended
+flat), which replays the open position with its full lookback. Hedge
+ratios of the regression methods are computed for the new bars of every
+chunk, carrying their state from the end of the last one (see
+`hedge.hedge_ratio`).
+
+"""
+import numpy as np
+import pandas as pd
+from ..exc import PairsError
+from . import describe
+from . import kernel
+from .calculate_inputs import exit_factor
+from .equity import EquitySummary, bars_per_year, mark_to_market
+from .get_data import get_pair
+from .hedge import hedge_params, hedge_ratio
+from .ledger import positions_frame, signed_shares
+from .rolling import lagged_bands, rolling_setup
+from ..profiling import NULL_PROFILER
+
+# approximate bytes of working memory per bar of a chunk: the float64
+# setup columns and hedge ratios, the float64 copies passed to the
+# kernel and its trade buffers
+BYTES_PER_BAR = 320
+
+# bars the statistics of the data are taken over, the lag search of the
+# cointegration test grows with the number of bars
+STATS_BARS = 2000
+
+INTRADAY_DTYPES = {'float32': np.float32, 'float64': np.float64}
+
+
+def to_columns(df, dtype='float32'):
+    """Convert a dataframe of prices to sorted columnar arrays
+
+    Returns a tuple `(dates, price_l, price_r)`, with `dates` as int64
+    nanoseconds and the prices as `dtype`.
+
+    """
+    if dtype not in INTRADAY_DTYPES:
+        raise PairsError(f"Unknown price dtype '{dtype}'.")
+    date = df['date']
+    tz = date.dt.tz
+    dates = (date.dt.tz_convert('UTC') if tz is not None else date) \
+        .to_numpy(dtype='datetime64[ns]').view(np.int64)
+    price_l = df['price_l'].to_numpy(dtype=INTRADAY_DTYPES[dtype])
+    price_r = df['price_r'].to_numpy(dtype=INTRADAY_DTYPES[dtype])
+    if (np.diff(dates) < 0).any():
+        order = np.argsort(dates, kind='stable')
+        dates, price_l, price_r = dates[order], price_l[order], price_r[order]
+
+    return dates, price_l, price_r
+
+
+def to_dates(dates, tz=None):
+    """DatetimeIndex of the int64 nanosecond `dates` of `to_columns`
+
+    With a timezone `tz`, the dates are converted to it from UTC,
+    otherwise they are naive like the data they were taken from.
+
+    """
+    index = pd.DatetimeIndex(np.asarray(dates).view('datetime64[ns]'))
+    if tz is None:
+        return index
+    return index.tz_localize('UTC').tz_convert(tz)
+
+
+def chunk_bars(memory_mb, params):
+    """Number of bars per chunk that fits `memory_mb` megabytes"""
+    bars = int(float(memory_mb)*2**20) // BYTES_PER_BAR
+
+    return max(bars, 4*_warmup(params))
+
+
+def _warmup(params):
+    # the bands of a bar depend on the spread mean of the previous bar,
+    # which depends on window_std spreads, each of which depends on
+    # window_std returns
+    return 2*params['window_std'] + params['window_corr'] + 2
+
+
+def run_chunked(price_l, price_r, params, bars=None, compiled=None,
+                log=lambda x: x, profiler=NULL_PROFILER):
+    """Run setup and the position state machine chunk by chunk
+
+    Parameters
+    ----------
+    price_l, price_r : array
+        Prices of the pair, sorted by date.
+
+    params : dict
+        Backtest params, see `backtest`.
+
+    bars : int
+        Bars per chunk, see `chunk_bars`. Defaults to all bars.
+
+    compiled : bool
+        Passed to `kernel.run_state_machine`.
+
+    profiler : Profiler
+        Measures the stages 'hedge', 'setup' and 'loop' of all chunks,
+        see `profiling.Profiler`.
+
+    Returns
+    -------
+    trades : ndarray
+        Trade records with dtype `kernel.TRADE_DTYPE`, indices refer to
+        the input arrays.
+
+    last : dict
+        The setup columns of the last chunk, see `rolling.rolling_setup`,
+        with the offset of its first bar under 'offset'.
+
+    """
+    n = len(price_l)
+    bars = max(int(bars or n), 4*_warmup(params))
+    warmup = _warmup(params)
+    # regression hedge ratios of bars `sizes_lo` to `done`, the bars of
+    # the next chunk start at or after `sizes_lo`
+    regression = hedge_params(params)['hedge'] != 'vol'
+    hedge_state = dict()
+    sizes, sizes_lo, done = np.empty(0), 0, 0
+    trades = list()
+    start = 0
+    size = bars
+    while True:
+        lo = max(start - warmup, 0)
+        hi = min(start + size, n)
+        if regression:
+            with profiler.stage('hedge'):
+                if hi > done:
+                    new = hedge_ratio(price_l[done:hi], price_r[done:hi],
+                                      params, state=hedge_state)
+                    sizes = np.concatenate([sizes[lo - sizes_lo:], new])
+                    sizes_lo, done = lo, hi
+        with profiler.stage('setup'):
+            cols = rolling_setup(price_l[lo:hi], price_r[lo:hi],
+                                 params['window_std'], params['window_corr'],
+                                 params['factor_std'],
+                                 size_r=sizes[lo - sizes_lo:hi - sizes_lo]
+                                 if regression else None)
+            exit_upper, exit_lower = lagged_bands(
+                cols['spread_mean'], cols['spread_std'], exit_factor(params))
+        # no entries on warm-up bars, they were handled by the last chunk
+        spread = cols['spread'].copy()
+        spread[:start - lo] = np.nan
+        with profiler.stage('loop'):
+            t = kernel.run_state_machine(
+                price_l[lo:hi], price_r[lo:hi], np.ones(hi - lo),
+                cols['size_r'], spread, cols['band_upper'],
+                cols['band_lower'], params['window_std'],
+                params['factor_profit_std'], params['factor_loss_size'],
+                compiled=compiled, exit_band_upper=exit_upper,
+                exit_band_lower=exit_lower)
+        for field in ['idx_entry', 'idx_exit', 'idx_min_loss']:
+            t[field] += lo
+        trades.append(t)
+        log(f"bars {lo:,.0f} to {hi:,.0f}: {len(t):,.0f} trades")
+        if hi == n:
+            break
+
+        # continue from the entry of a position still open at the end
+        first = t['idx_exit'][-1] + 1 - lo if len(t) else start - lo
+        signal = (spread[first:] > cols['band_upper'][first:]) \
+            | (spread[first:] < cols['band_lower'][first:])
+        following = np.flatnonzero(signal)
+        if len(following):
+            new_start = lo + first + following[0]
+        else:
+            new_start = hi
+        # a position open for more than a chunk needs a longer chunk
+        size = 2*size if new_start == start else bars
+        start = new_start
+
+    cols['offset'] = lo
+
+    return np.concatenate(trades), cols
+
+
+def equity_chunked(dates, price_l, price_r, trades, positions, bars,
+                   equity_dtype=None):
+    """Mark the positions to market `bars` bars at a time
+
+    Parameters
+    ----------
+    dates, price_l, price_r : array
+        The columns of `to_columns`.
+
+    trades : ndarray
+        Trade records, indices refer to the arrays.
+
+    positions : DataFrame
+        The positions of `trades`, see `ledger.positions_frame`, with the
+        costs of `costs.CostModel.apply` if they carry them.
+
+    bars : int
+        Bars per chunk.
+
+    equity_dtype : str
+        If set, the curve is returned as an array of this dtype.
+
+    Returns
+    -------
+    stats : dict
+        The metrics of `equity.EquitySummary.stats`.
+
+    curve : ndarray
+        The equity of every bar, None without `equity_dtype`.
+
+    """
+    n = len(dates)
+    shares_l, shares_r = signed_shares(positions)
+    cost = positions['cost'].to_numpy() if 'cost' in positions else None
+    summary = EquitySummary()
+    curve = None if equity_dtype is None else np.empty(n, dtype=equity_dtype)
+    state = None
+    for lo in range(0, n, bars):
+        hi = min(lo + bars, n)
+        chunk, state = mark_to_market(
+            price_l[lo:hi], price_r[lo:hi], trades['idx_entry'] - lo,
+            trades['idx_exit'] - lo, shares_l, shares_r, cost, state)
+        summary.add(chunk)
+        if curve is not None:
+            curve[lo:hi] = chunk['equity']
+
+    seconds = (dates[-1] - dates[0]) / 1e9 if n else np.nan
+    return summary.stats(bars_per_year(n, seconds)), curve
+
+
+def backtest_intraday(df=None, symbols=(), params={}, interval='1m',
+                      days=7, memory_mb=256, dtype='float32', provider=None,
+                      verbose=False, compiled=None, profiler=None,
+                      costs=None, equity_dtype=None, log=print):
+    """Backtest a pair on intraday bars within a memory budget
+
+    Prices are taken from `df` (columns 'date', 'price_l' and 'price_r')
+    or retrieved for the two `symbols` from `provider` for the last
+    `days` days of `interval` bars. They are held as int64 dates and
+    `dtype` prices, and the setup and the trade loop are run in chunks
+    of `chunk_bars(memory_mb, params)` bars, see `run_chunked`.
+
+    Unlike `backtest`, positions carry no snapshots of the setup rows,
+    and the statistics of the data (correlation, cointegration, last
+    share sizes) are taken over the last `STATS_BARS` bars.
+
+    `profiler` is a `profiling.Profiler`, `costs` a `costs.CostModel`,
+    `equity_dtype` the dtype of the equity curve and `verbose` and `log`
+    the progress messages, as passed to `backtest`. The equity curve
+    covers all bars and is computed chunk by chunk, see
+    `equity_chunked`.
+
+    Returns
+    -------
+    df : DataFrame
+        The prices used, with `dtype` price columns.
+
+    positions, stats, table
+        As returned by `backtest`.
+
+    """
+    params = dict(params)
+    params['factor_loss_size'] = float(params['factor_loss_size'])
+    params['factor_profit_std'] = float(params['factor_profit_std'])
+    params['factor_std'] = float(params['factor_std'])
+    params['window_corr'] = int(params['window_corr'])
+    params['window_std'] = int(params['window_std'])
+
+    if not verbose:
+        log = lambda x: x
+    prof = NULL_PROFILER if profiler is None else profiler
+
+    if df is None:
+        if len(symbols) != 2:
+            raise PairsError('Must pass either a dataframe or two symbols.')
+        log(f"retrieving {interval} bars...")
+        with prof.stage('fetch'):
+            df = get_pair(symbols[0], symbols[1], days=days,
+                          provider=provider, interval=interval)
+    tz = df['date'].dt.tz
+    dates, price_l, price_r = to_columns(df, dtype)
+    if len(dates) < 2:
+        raise PairsError('Not enough bars to backtest.')
+    log(f"got {len(dates):,.0f} bars")
+
+    bars = chunk_bars(memory_mb, params)
+    trades, last = run_chunked(price_l, price_r, params, bars=bars,
+                               compiled=compiled, log=log, profiler=prof)
+    with prof.stage('positions'):
+        index = to_dates(dates, tz)
+        positions = positions_frame(pd.DataFrame({'date': index}), trades)
+        if costs is not None:
+            positions = costs.apply(positions, symbols)
+
+    # data statistics over the last bars, trade statistics over all
+    offset = last.pop('offset')
+    skip = max(len(dates) - offset - STATS_BARS, 0)
+    offset += skip
+    frame = pd.DataFrame({k: v[skip:] for k, v in last.items()})
+    frame.insert(0, 'date', index[offset:])
+    frame.insert(1, 'price_l', price_l[offset:].astype(np.float64))
+    frame.insert(2, 'price_r', price_r[offset:].astype(np.float64))
+    frame['size_l'] = 1
+    with prof.stage('stats'):
+        equity_stats, curve = equity_chunked(dates, price_l, price_r, trades,
+                                             positions, bars, equity_dtype)
+        stats = describe.create_stats(frame, positions, params,
+                                      profiler=prof,
+                                      equity_stats=equity_stats)
+    if curve is not None:
+        stats['equity'] = curve
+    stats['date_min'], stats['date_max'] = index[0], index[-1]
+    stats['count_data_points'] = len(dates)
+    with prof.stage('table'):
+        table = describe.create_stats_table(frame, positions, stats)
+    if prof.enabled:
+        stats['profile'] = prof.totals()
+
+    prices = pd.DataFrame({'date': pd.to_datetime(dates, utc=True),
+                           'price_l': price_l, 'price_r': price_r})
+
+    return prices, positions, stats, table
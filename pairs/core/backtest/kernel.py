@@ -0,0 +1,325 @@
+"""Position state machine over plain arrays
+
+The entry/exit logic of the backtest is sequential (a bar can only open
+a position once the previous one is closed), so it is run here as a
+tight loop over contiguous float64 arrays. The loop is compiled with
+numba when it is installed. Otherwise a NumPy implementation is used,
+which jumps between entry candidates and searches for exits in blocks.
+Both return the same trade records.
+
+"""
+import numpy as np
+from ..jit import njit, HAVE_NUMBA
+
+SIDE_BUY = 1
+SIDE_SELL = -1
+
+EXIT_TAKE_PROFIT = 0
+EXIT_STOP_LOSS = 1
+EXIT_BAND = 2
+EXIT_REASONS = ('take profit', 'stop loss', 'band exit')
+
+TRADE_DTYPE = np.dtype([
+    ('idx_entry', np.int64),
+    ('idx_exit', np.int64),
+    ('idx_min_loss', np.int64),
+    ('side', np.int8),
+    ('exit_reason', np.int8),
+    ('price_entry_l', np.float64),
+    ('price_entry_r', np.float64),
+    ('size_l', np.float64),
+    ('size_r', np.float64),
+    ('target_profit', np.float64),
+    ('target_loss', np.float64),
+    ('min_loss', np.float64),
+    ('price_exit_l', np.float64),
+    ('price_exit_r', np.float64),
+    ('profit', np.float64),
+])
+
+# layout of the plain arrays filled by the implementations below
+_INT_FIELDS = ('idx_entry', 'idx_exit', 'idx_min_loss', 'side', 'exit_reason')
+_FLOAT_FIELDS = ('price_entry_l', 'price_entry_r', 'size_l', 'size_r',
+                 'target_profit', 'target_loss', 'min_loss', 'price_exit_l',
+                 'price_exit_r', 'profit')
+
+
+@njit
+def spread_std(price_l, price_r, size_l, size_r, start, stop):
+    """Closed-form std of `size_l*price_l - size_r*price_r` over a window
+
+    The variance of the spread is var_l + var_r - 2*cov_lr, where the
+    (sample) moments are those of the equity series `size*price` on rows
+    `start` to `stop` (exclusive). This is the std that the Monte Carlo
+    spread model in `pairs.core.analyze.model` estimates by sampling.
+
+    """
+    m = stop - start
+    if m < 2:
+        return np.nan
+    mean_l = 0.0
+    mean_r = 0.0
+    for j in range(start, stop):
+        mean_l += size_l*price_l[j]
+        mean_r += size_r*price_r[j]
+    mean_l /= m
+    mean_r /= m
+    var_l = 0.0
+    var_r = 0.0
+    cov = 0.0
+    for j in range(start, stop):
+        dl = size_l*price_l[j] - mean_l
+        dr = size_r*price_r[j] - mean_r
+        var_l += dl*dl
+        var_r += dr*dr
+        cov += dl*dr
+    var = (var_l + var_r - 2*cov) / (m - 1)
+    return np.sqrt(max(var, 0.0))
+
+
+@njit
+def _state_machine_loop(price_l, price_r, size_l, size_r, spread, band_upper,
+                        band_lower, exit_upper, exit_lower, window,
+                        factor_profit_std, factor_loss_size, ints, floats):
+    """Scalar implementation, compiled by numba when available"""
+    n = len(spread)
+    count = 0
+    side = 0
+    sl = sr = pe_l = pe_r = 0.0
+    target_profit = target_loss = min_loss = 0.0
+    idx_entry = idx_min_loss = 0
+    for i in range(n):
+        s = spread[i]
+        if s != s:
+            continue
+        if side == 0:
+            if s > band_upper[i]:
+                side = SIDE_SELL
+            elif s < band_lower[i]:
+                side = SIDE_BUY
+            else:
+                continue
+            sl = size_l[i]
+            sr = size_r[i]
+            pe_l = price_l[i]
+            pe_r = price_r[i]
+            std = spread_std(price_l, price_r, sl, sr, max(i - window, 0), i + 1)
+            target_profit = factor_profit_std*std
+            target_loss = -factor_loss_size*target_profit
+            min_loss = 0.0
+            idx_min_loss = i
+            idx_entry = i
+            continue
+
+        if side == SIDE_SELL:
+            pl = sl*(pe_l - price_l[i]) + sr*(price_r[i] - pe_r)
+            exit_on_band = s < exit_lower[i]
+        else:
+            pl = sl*(price_l[i] - pe_l) + sr*(pe_r - price_r[i])
+            exit_on_band = s > exit_upper[i]
+        if pl < min_loss:
+            min_loss = pl
+            idx_min_loss = i
+
+        if pl >= target_profit:
+            reason = EXIT_TAKE_PROFIT
+        elif pl <= target_loss:
+            reason = EXIT_STOP_LOSS
+        elif exit_on_band:
+            reason = EXIT_BAND
+        else:
+            continue
+
+        ints[count, 0] = idx_entry
+        ints[count, 1] = i
+        ints[count, 2] = idx_min_loss
+        ints[count, 3] = side
+        ints[count, 4] = reason
+        floats[count, 0] = pe_l
+        floats[count, 1] = pe_r
+        floats[count, 2] = sl
+        floats[count, 3] = sr
+        floats[count, 4] = target_profit
+        floats[count, 5] = target_loss
+        floats[count, 6] = min_loss
+        floats[count, 7] = price_l[i]
+        floats[count, 8] = price_r[i]
+        floats[count, 9] = pl
+        count += 1
+        side = 0
+
+    return count
+
+
+def find_exit(price_l, price_r, exit_band, k, side, size_l, size_r,
+              price_entry_l, price_entry_r, target_profit, target_loss):
+    """Search for the exit of a position opened on bar `k`
+
+    The profit of the bars following `k` is computed in blocks that
+    double in size, so that short trades stay cheap and long trades need
+    few NumPy calls. `exit_band` flags the bars on which the spread has
+    crossed the opposite band.
+
+    Returns a tuple `(exit_k, profit, reason, min_loss, k_min_loss)`,
+    with `exit_k` set to None if the position is still open at the end
+    of the arrays. The minimum loss is the first, lowest negative profit
+    seen while the position is open (0 at bar `k` if there is none).
+
+    """
+    n = len(price_l)
+    min_loss = 0
+    k_min_loss = k
+    start = k + 1
+    block = 64
+    while start < n:
+        stop = min(start + block, n)
+        if side == SIDE_SELL:
+            pl = size_l*(price_entry_l - price_l[start:stop]) \
+                + size_r*(price_r[start:stop] - price_entry_r)
+        else:
+            pl = size_l*(price_l[start:stop] - price_entry_l) \
+                + size_r*(price_entry_r - price_r[start:stop])
+        exit_take_profit = pl >= target_profit
+        exit_stop_loss = pl <= target_loss
+        hit = exit_take_profit | exit_stop_loss | exit_band[start:stop]
+        found = hit.any()
+        end = np.argmax(hit) + 1 if found else len(hit)
+
+        j = np.argmin(pl[:end])
+        if pl[j] < min_loss:
+            min_loss = pl[j]
+            k_min_loss = start + j
+
+        if found:
+            j = end - 1
+            if exit_take_profit[j]:
+                reason = EXIT_TAKE_PROFIT
+            elif exit_stop_loss[j]:
+                reason = EXIT_STOP_LOSS
+            else:
+                reason = EXIT_BAND
+            return start + j, pl[j], reason, min_loss, k_min_loss
+        start = stop
+        block *= 2
+
+    return None, np.nan, -1, min_loss, k_min_loss
+
+
+def _state_machine_numpy(price_l, price_r, size_l, size_r, spread, band_upper,
+                         band_lower, exit_upper, exit_lower, window,
+                         factor_profit_std, factor_loss_size, ints, floats):
+    """NumPy implementation, used when numba is not installed"""
+    rows = np.flatnonzero(~np.isnan(spread))
+    cp_l = price_l[rows]
+    cp_r = price_r[rows]
+    signal_sell = spread[rows] > band_upper[rows]
+    signal_buy = spread[rows] < band_lower[rows]
+    exit_sell = spread[rows] < exit_lower[rows]
+    exit_buy = spread[rows] > exit_upper[rows]
+    candidates = np.flatnonzero(signal_sell | signal_buy)
+
+    count = 0
+    k = 0
+    while True:
+        c = np.searchsorted(candidates, k)
+        if c == len(candidates):
+            break
+        k = candidates[c]
+        i = rows[k]
+        side = SIDE_SELL if signal_sell[k] else SIDE_BUY
+        sl = size_l[i]
+        sr = size_r[i]
+        std = spread_std(price_l, price_r, sl, sr, max(i - window, 0), i + 1)
+        target_profit = factor_profit_std*std
+        target_loss = -factor_loss_size*target_profit
+
+        exit_band = exit_sell if side == SIDE_SELL else exit_buy
+        exit_k, pl, reason, min_loss, k_min_loss = find_exit(
+            cp_l, cp_r, exit_band, k, side, sl, sr, price_l[i], price_r[i],
+            target_profit, target_loss)
+        if exit_k is None:
+            break
+
+        ints[count] = (i, rows[exit_k], rows[k_min_loss], side, reason)
+        floats[count] = (price_l[i], price_r[i], sl, sr, target_profit,
+                         target_loss, min_loss, cp_l[exit_k], cp_r[exit_k], pl)
+        count += 1
+        k = exit_k + 1
+
+    return count
+
+
+def run_state_machine(price_l, price_r, size_l, size_r, spread, band_upper,
+                      band_lower, window, factor_profit_std, factor_loss_size,
+                      compiled=None, exit_band_upper=None,
+                      exit_band_lower=None):
+    """Run the backtest position state machine over arrays
+
+    A sell (buy) position is opened on a bar with a valid spread above
+    (below) the lagged upper (lower) band. The profit target is
+    `factor_profit_std` times the std of the spread over the `window`
+    preceding bars, measured with the share sizes of the entry bar, and
+    the stop loss is `factor_loss_size` times the profit target. A
+    position is closed on the first following bar that reaches the
+    profit target, the stop loss or the opposite exit band.
+
+    Parameters
+    ----------
+    price_l, price_r, size_l, size_r, spread : array
+        The columns of the same name produced by
+        `calculate_inputs.setup`.
+
+    band_upper, band_lower : array
+        The bands around the lagged spread mean, as produced by
+        `calculate_inputs.setup`.
+
+    window : int
+        Lookback for the spread std at entry, i.e. `window_std`.
+
+    factor_profit_std, factor_loss_size : float
+        The backtest params of the same name.
+
+    compiled : bool
+        Use the scalar loop (True) or the NumPy implementation (False).
+        Defaults to the scalar loop if numba is installed.
+
+    exit_band_upper, exit_band_lower : array
+        The exit bands of `calculate_inputs.setup`, a buy exits above
+        the upper one and a sell below the lower one. Default to
+        `band_upper` and `band_lower`.
+
+    Returns
+    -------
+    trades : ndarray
+        A structured array with dtype `TRADE_DTYPE`, one record per
+        closed position. Indices refer to positions in the input arrays,
+        `side` is `SIDE_BUY` or `SIDE_SELL` and `exit_reason` indexes
+        `EXIT_REASONS`. A position still open at the end is dropped.
+
+    """
+    if exit_band_upper is None:
+        exit_band_upper = band_upper
+    if exit_band_lower is None:
+        exit_band_lower = band_lower
+    arrays = [np.ascontiguousarray(x, dtype=np.float64) for x in
+              (price_l, price_r, size_l, size_r, spread, band_upper,
+               band_lower, exit_band_upper, exit_band_lower)]
+
+    # every trade spans at least two bars
+    size = len(arrays[0]) // 2 + 1
+    ints = np.empty((size, len(_INT_FIELDS)), dtype=np.int64)
+    floats = np.empty((size, len(_FLOAT_FIELDS)), dtype=np.float64)
+
+    if compiled is None:
+        compiled = HAVE_NUMBA
+    func = _state_machine_loop if compiled else _state_machine_numpy
+    count = func(*arrays, int(window), float(factor_profit_std),
+                 float(factor_loss_size), ints, floats)
+
+    trades = np.empty(count, dtype=TRADE_DTYPE)
+    for n, field in enumerate(_INT_FIELDS):
+        trades[field] = ints[:count, n]
+    for n, field in enumerate(_FLOAT_FIELDS):
+        trades[field] = floats[:count, n]
+
+    return trades
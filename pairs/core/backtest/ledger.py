@@ -0,0 +1,145 @@
+"""Compact ledger of backtest trades
+
+Trades are kept as records of `kernel.TRADE_DTYPE` in one structured
+array, which holds bar indices instead of dates and rows. A trade takes
+106 bytes, against a few kilobytes for a dict with snapshots of its entry
+and exit rows, and an array of trades is pickled as a single buffer.
+Dates and, on request, row snapshots are only looked up when the trades
+are turned into a positions dataframe.
+
+"""
+import numpy as np
+import pandas as pd
+from . import kernel
+
+# columns of a positions dataframe, in order
+POSITION_COLUMNS = [
+    'date_entry', 'stats_entry', 'side', 'price_entry_l', 'price_entry_r',
+    'size_l', 'size_r', 'std_l', 'std_r', 'min_loss', 'date_min_loss',
+    'target_profit', 'target_loss', 'date_exit', 'stats_exit',
+    'price_exit_l', 'price_exit_r', 'profit', 'exit_reason',
+]
+
+
+class TradeLedger:
+    """Growable array of trade records
+
+    Records are appended to a preallocated structured array with dtype
+    `kernel.TRADE_DTYPE`, whose capacity is doubled when it is full, so
+    appending takes amortized constant time.
+
+    Parameters
+    ----------
+    capacity : int
+        Number of records allocated up front.
+
+    """
+
+    __slots__ = ('_data', 'count')
+
+    def __init__(self, capacity=64):
+        self._data = np.empty(max(int(capacity), 1), dtype=kernel.TRADE_DTYPE)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def trades(self):
+        """The records appended so far, a view of the ledger"""
+        return self._data[:self.count]
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes
+
+    def _reserve(self, count):
+        if count > len(self._data):
+            data = np.empty(max(count, 2*len(self._data)),
+                            dtype=kernel.TRADE_DTYPE)
+            data[:self.count] = self._data[:self.count]
+            self._data = data
+
+    def append(self, **fields):
+        """Append one trade, given as the fields of `kernel.TRADE_DTYPE`"""
+        self._reserve(self.count + 1)
+        self._data[self.count] = tuple(fields[k] for k in
+                                       kernel.TRADE_DTYPE.names)
+        self.count += 1
+
+    def extend(self, trades):
+        """Append an array of trade records"""
+        self._reserve(self.count + len(trades))
+        self._data[self.count:self.count + len(trades)] = trades
+        self.count += len(trades)
+
+
+def signed_shares(positions):
+    """Shares held of the left and right asset by every position
+
+    Returns two arrays, negative where the side is short: a sell is
+    short `size_l` of the left asset and long `size_r` of the right
+    one, a buy the reverse.
+
+    """
+    sign = np.where((positions['side'] == 'sell').to_numpy(), -1.0, 1.0)
+    return (sign*positions['size_l'].to_numpy(dtype=np.float64),
+            -sign*positions['size_r'].to_numpy(dtype=np.float64))
+
+
+def positions_frame(df, trades, capture_snapshots=False):
+    """Dataframe of positions from trade records
+
+    Parameters
+    ----------
+    df : DataFrame
+        The setup data the trade indices refer to (by position). Only
+        its 'date' column is needed, the columns 'std_l' and 'std_r' are
+        copied if it has them.
+
+    trades : ndarray or TradeLedger
+        Trade records with dtype `kernel.TRADE_DTYPE`.
+
+    capture_snapshots : bool
+        Add the columns 'stats_entry' and 'stats_exit' with the rows of
+        `df` of the entry and exit bars as dicts.
+
+    Returns
+    -------
+    positions : DataFrame
+        One row per trade, with the columns `POSITION_COLUMNS` (without
+        the snapshots unless requested, and the stds unless `df` has
+        them).
+
+    """
+    if isinstance(trades, TradeLedger):
+        trades = trades.trades
+    date = lambda idx: df['date'].iloc[idx].reset_index(drop=True)
+    entry = trades['idx_entry']
+    std = {k: df[k].to_numpy()[entry] for k in ['std_l', 'std_r'] if k in df}
+    positions = pd.DataFrame({
+        'date_entry': date(entry),
+        'side': pd.Series(np.where(trades['side'] == kernel.SIDE_SELL,
+                                   'sell', 'buy'), dtype=object),
+        'price_entry_l': trades['price_entry_l'],
+        'price_entry_r': trades['price_entry_r'],
+        'size_l': trades['size_l'],
+        'size_r': trades['size_r'],
+        **std,
+        'min_loss': trades['min_loss'],
+        'date_min_loss': date(trades['idx_min_loss']),
+        'target_profit': trades['target_profit'],
+        'target_loss': trades['target_loss'],
+        'date_exit': date(trades['idx_exit']),
+        'price_exit_l': trades['price_exit_l'],
+        'price_exit_r': trades['price_exit_r'],
+        'profit': trades['profit'],
+        'exit_reason': pd.Series(np.array(kernel.EXIT_REASONS, dtype=object)[
+            trades['exit_reason']], dtype=object),
+    })
+    if capture_snapshots:
+        positions['stats_entry'] = df.iloc[entry].to_dict('records')
+        positions['stats_exit'] = \
+            df.iloc[trades['idx_exit']].to_dict('records')
+
+    return positions[[x for x in POSITION_COLUMNS if x in positions]]
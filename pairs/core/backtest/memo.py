@@ -0,0 +1,105 @@
+"""Memoization of `calculate_inputs.setup` results
+
+The output of `setup` only depends on the prices, the params
+window_std, window_corr, factor_std and factor_exit_std and the hedge
+params. Param combinations that only differ in factor_profit_std or
+factor_loss_size (which are used by the trade loop alone) can therefore
+share one prepared dataframe.
+
+"""
+from collections import OrderedDict
+from hashlib import blake2b
+import pandas as pd
+from .calculate_inputs import exit_factor, setup
+from .hedge import hedge_params
+
+
+def fingerprint(df):
+    """Return a hex digest of the 'date', 'price_l' and 'price_r' columns"""
+    h = pd.util.hash_pandas_object(df[['date', 'price_l', 'price_r']],
+                                   index=False)
+
+    return blake2b(h.to_numpy().tobytes(), digest_size=16).hexdigest()
+
+
+class SetupCache:
+    """LRU cache of `setup` results bounded by a memory budget
+
+    Results are keyed on the fingerprint of the prices, the setup params
+    and the setup engine. When the total size of the cached dataframes
+    exceeds `max_bytes` the least recently used ones are evicted. The
+    most recent result is always kept, even if it alone is larger than
+    the budget.
+
+    Callers get shallow copies of the cached dataframes, so they can
+    add, drop or replace columns without changing the cache, but the
+    column data is shared and must not be modified in place. The
+    fingerprints of the last few price dataframes are remembered per
+    object, so these must not be modified after being passed to the
+    cache either.
+
+    """
+
+    # number of price dataframes whose fingerprint is remembered
+    max_digests = 8
+
+    def __init__(self, max_bytes=256*2**20):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._digests = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def fingerprint(self, df):
+        """Return `fingerprint(df)`, remembered for the object `df`"""
+        if id(df) in self._digests:
+            # the dataframe is stored too, so its id cannot be reused
+            return self._digests[id(df)][1]
+        digest = fingerprint(df)
+        self._digests[id(df)] = (df, digest)
+        if len(self._digests) > self.max_digests:
+            self._digests.popitem(last=False)
+        return digest
+
+    def key(self, df, params, engine='pandas'):
+        """Return the cache key of `setup(df, params, engine)`"""
+        return (self.fingerprint(df),
+                int(params['window_std']),
+                int(params['window_corr']),
+                float(params['factor_std']),
+                exit_factor(params),
+                tuple(hedge_params(params).values()),
+                engine)
+
+    def setup(self, df, params, engine='pandas'):
+        """Return `setup(df, params, engine)`, computing it on a miss
+
+        The result is a shallow copy of the cached dataframe.
+
+        """
+        key = self.key(df, params, engine)
+        if key in self._items:
+            self.hits += 1
+            self._items.move_to_end(key)
+            return self._items[key][0].copy(deep=False)
+
+        self.misses += 1
+        result = setup(df, params, engine=engine)
+        size = int(result.memory_usage(index=True, deep=False).sum())
+        self._items[key] = (result, size)
+        self.nbytes += size
+        while self.nbytes > self.max_bytes and len(self._items) > 1:
+            _, (_, size) = self._items.popitem(last=False)
+            self.nbytes -= size
+
+        return result.copy(deep=False)
+
+    def clear(self):
+        """Remove all cached results"""
+        self._items.clear()
+        self._digests.clear()
+        self.nbytes = 0
@@ -0,0 +1,318 @@
+"""Backtest many pairs as one portfolio
+
+All pairs are backtested over one aligned date x symbol price matrix, so
+a symbol that appears in several pairs is loaded, aligned and set up
+(returns and rolling stds) once, see `calculate_inputs.setup_panel`. The
+position state machines of all pairs are run in lockstep, bar by bar,
+which gives the mark-to-market value of every pair on every bar and so
+the equity curve of the portfolio.
+
+"""
+import numpy as np
+import pandas as pd
+from ..analyze.screen import align
+from ..exc import PairsError
+from ..jit import njit
+from ..options import ALLOCATIONS, MIN_COVERAGE
+from . import kernel
+from .calculate_inputs import setup_panel
+
+# layout of the plain arrays of trades filled by `_lockstep_loop`
+_INT_FIELDS = ('pair', 'idx_entry', 'idx_exit', 'idx_min_loss', 'side',
+               'exit_reason')
+_FLOAT_FIELDS = ('units', 'price_entry_l', 'price_entry_r', 'size_l',
+                 'size_r', 'target_profit', 'target_loss', 'min_loss',
+                 'price_exit_l', 'price_exit_r', 'profit')
+
+
+def parse_pairs(text):
+    """Parse a CLI list of pairs like "FB/AMZN,XLK/QQQ" into tuples"""
+    pairs = list()
+    for x in text.split(','):
+        if not x.strip():
+            continue
+        symbols = x.strip().split('/')
+        if len(symbols) != 2:
+            raise PairsError(f"Pair '{x}' must be like 'FB/AMZN'.")
+        pairs.append(tuple(symbols))
+
+    return pairs
+
+
+def allocation_weights(pairs, allocation):
+    """Return the share of capital of each pair
+
+    `allocation` is "equal" (the same share for every pair), "fixed"
+    (no capital, one unit of every spread is traded, i.e. the share
+    sizes of `backtest`) or a dict mapping pairs (tuples or "L/R"
+    labels) to weights, which are normalized to sum to 1.
+
+    """
+    if isinstance(allocation, dict):
+        w = dict()
+        for k, v in allocation.items():
+            w[tuple(k.split('/')) if isinstance(k, str) else tuple(k)] = v
+        missing = [p for p in pairs if p not in w]
+        if missing:
+            raise PairsError(f"No allocation for pairs {missing}.")
+        weights = np.array([w[p] for p in pairs], dtype=float)
+        if (weights < 0).any() or weights.sum() <= 0:
+            raise PairsError('Allocation weights must be positive.')
+        return weights / weights.sum()
+    if allocation not in ALLOCATIONS:
+        raise PairsError(f"Unknown allocation '{allocation}', must be in "
+                         f"{ALLOCATIONS} or a dict of weights.")
+    if allocation == 'equal':
+        return np.full(len(pairs), 1 / len(pairs))
+    return np.full(len(pairs), np.nan)
+
+
+@njit
+def _lockstep_loop(prices, idx_l, idx_r, size_r, spread, band_upper,
+                   band_lower, exit_upper, exit_lower, window,
+                   factor_profit_std, factor_loss_size, budget, pnl, ints,
+                   floats):
+    """Run the state machines of all pairs bar by bar
+
+    The position logic is that of `kernel._state_machine_loop`. `prices`
+    is symbol x date, the setup arrays are pair x date. A position is
+    sized at entry to `budget[p]` dollars of gross exposure, or to one
+    unit of the spread if the budget is NaN. `pnl[p, t]` is set to the
+    realized plus open profit of pair `p` after bar `t`.
+
+    """
+    k, n = spread.shape
+    side = np.zeros(k, dtype=np.int64)
+    units = np.zeros(k)
+    pe_l = np.zeros(k)
+    pe_r = np.zeros(k)
+    sr = np.zeros(k)
+    target_profit = np.zeros(k)
+    target_loss = np.zeros(k)
+    min_loss = np.zeros(k)
+    idx_entry = np.zeros(k, dtype=np.int64)
+    idx_min_loss = np.zeros(k, dtype=np.int64)
+    realized = np.zeros(k)
+    count = 0
+    for t in range(n):
+        for p in range(k):
+            open_pl = 0.0
+            s = spread[p, t]
+            pl_ = prices[idx_l[p], t]
+            pr_ = prices[idx_r[p], t]
+            if s != s:
+                # no signals, but an open position is still marked
+                if side[p] == kernel.SIDE_SELL:
+                    pl = (pe_l[p] - pl_) + sr[p]*(pr_ - pe_r[p])
+                    open_pl = units[p]*pl
+                elif side[p] == kernel.SIDE_BUY:
+                    pl = (pl_ - pe_l[p]) + sr[p]*(pe_r[p] - pr_)
+                    open_pl = units[p]*pl
+            elif side[p] == 0:
+                entered = True
+                if s > band_upper[p, t]:
+                    side[p] = kernel.SIDE_SELL
+                elif s < band_lower[p, t]:
+                    side[p] = kernel.SIDE_BUY
+                else:
+                    entered = False
+                if entered:
+                    sr[p] = size_r[p, t]
+                    pe_l[p] = pl_
+                    pe_r[p] = pr_
+                    std = kernel.spread_std(prices[idx_l[p]],
+                                            prices[idx_r[p]], 1.0, sr[p],
+                                            max(t - window, 0), t + 1)
+                    target_profit[p] = factor_profit_std*std
+                    target_loss[p] = -factor_loss_size*target_profit[p]
+                    min_loss[p] = 0.0
+                    idx_entry[p] = t
+                    idx_min_loss[p] = t
+                    if budget[p] == budget[p]:
+                        units[p] = budget[p] / (pl_ + abs(sr[p])*pr_)
+                    else:
+                        units[p] = 1.0
+            else:
+                if side[p] == kernel.SIDE_SELL:
+                    pl = (pe_l[p] - pl_) + sr[p]*(pr_ - pe_r[p])
+                    exit_on_band = s < exit_lower[p, t]
+                else:
+                    pl = (pl_ - pe_l[p]) + sr[p]*(pe_r[p] - pr_)
+                    exit_on_band = s > exit_upper[p, t]
+                if pl < min_loss[p]:
+                    min_loss[p] = pl
+                    idx_min_loss[p] = t
+
+                reason = -1
+                if pl >= target_profit[p]:
+                    reason = kernel.EXIT_TAKE_PROFIT
+                elif pl <= target_loss[p]:
+                    reason = kernel.EXIT_STOP_LOSS
+                elif exit_on_band:
+                    reason = kernel.EXIT_BAND
+                if reason >= 0:
+                    ints[count, 0] = p
+                    ints[count, 1] = idx_entry[p]
+                    ints[count, 2] = t
+                    ints[count, 3] = idx_min_loss[p]
+                    ints[count, 4] = side[p]
+                    ints[count, 5] = reason
+                    floats[count, 0] = units[p]
+                    floats[count, 1] = pe_l[p]
+                    floats[count, 2] = pe_r[p]
+                    floats[count, 3] = 1.0
+                    floats[count, 4] = sr[p]
+                    floats[count, 5] = target_profit[p]
+                    floats[count, 6] = target_loss[p]
+                    floats[count, 7] = min_loss[p]
+                    floats[count, 8] = pl_
+                    floats[count, 9] = pr_
+                    floats[count, 10] = pl
+                    count += 1
+                    realized[p] += units[p]*pl
+                    side[p] = 0
+                else:
+                    open_pl = units[p]*pl
+            pnl[p, t] = realized[p] + open_pl
+
+    return count
+
+
+def portfolio_backtest(prices, pairs, params, allocation='equal',
+                       capital=1e6, min_coverage=MIN_COVERAGE):
+    """Backtest many pairs over one price matrix
+
+    Every pair is traded by the rules of `backtest` (compiled engine,
+    incremental setup), with its own position. Pairs are run in
+    lockstep and sized by `allocation` (see `allocation_weights`): with
+    a share of capital, a position is opened with that many dollars of
+    gross exposure (both legs), its profit scales accordingly.
+
+    Parameters
+    ----------
+    prices : DataFrame
+        Prices indexed by date, one column per symbol, e.g. from
+        `get_prices`. Only dates on which every symbol has a price are
+        used, see `screen.align`.
+
+    pairs : list
+        Pairs of symbols, as tuples `(symbol_l, symbol_r)`.
+
+    params : dict
+        The backtest params, shared by all pairs.
+
+    allocation : str or dict
+        See `allocation_weights`.
+
+    capital : float
+        Starting capital of the portfolio.
+
+    min_coverage : float
+        Share of the dates every symbol needs prices on. A symbol with
+        less would cut the history of all pairs to its own and raises
+        PairsError, pass 0 to backtest over the dates of all symbols
+        anyway.
+
+    Returns
+    -------
+    equity : DataFrame
+        Indexed by date, with the column 'equity' (the portfolio value,
+        marked to market on every bar) and one column per pair with its
+        contribution, i.e. its realized plus open profit.
+
+    positions : DataFrame
+        The closed positions of all pairs, with the columns of the
+        positions of `backtest` plus 'pair' and 'units' (the multiple of
+        the share sizes traded). 'profit' is per unit, 'pnl' is
+        `units*profit`.
+
+    summary : DataFrame
+        One row per pair with its number of trades, winrate, sum of
+        profits and final contribution.
+
+    """
+    pairs = [tuple(x) for x in pairs]
+    if not pairs:
+        raise PairsError('Need at least one pair.')
+    symbols = list(dict.fromkeys(s for pair in pairs for s in pair))
+    missing = [s for s in symbols if s not in prices.columns]
+    if missing:
+        raise PairsError(f"No prices for symbols {missing}.")
+    prices = align(prices[symbols], min_coverage)
+    if len(prices.columns) < len(symbols):
+        short = [s for s in symbols if s not in prices.columns]
+        raise PairsError(f"Symbols {short} have prices on less than "
+                         f"{min_coverage:.0%} of the dates.")
+    window = int(params['window_std'])
+
+    # one row of prices per symbol, so that rows are contiguous
+    matrix = np.ascontiguousarray(prices.to_numpy(dtype=np.float64).T)
+    column = {s: i for i, s in enumerate(prices.columns)}
+    idx_l = np.array([column[p[0]] for p in pairs], dtype=np.int64)
+    idx_r = np.array([column[p[1]] for p in pairs], dtype=np.int64)
+    k, n = len(pairs), matrix.shape[1]
+    # setup of all pairs at once, one row per pair
+    cols = setup_panel(matrix.T, np.column_stack([idx_l, idx_r]), params)
+    setup = np.empty((6, k, n))
+    for j, col in enumerate(['size_r', 'spread', 'band_upper', 'band_lower',
+                             'exit_band_upper', 'exit_band_lower']):
+        setup[j] = cols[col].T
+
+    weights = allocation_weights(pairs, allocation)
+    budget = capital*weights
+    # every trade starts on an entry signal
+    with np.errstate(invalid='ignore'):
+        size = int(((setup[1] > setup[2]) | (setup[1] < setup[3])).sum()) + 1
+    ints = np.empty((size, len(_INT_FIELDS)), dtype=np.int64)
+    floats = np.empty((size, len(_FLOAT_FIELDS)))
+    pnl = np.empty((k, n))
+    count = _lockstep_loop(matrix, idx_l, idx_r, *setup, window,
+                           float(params['factor_profit_std']),
+                           float(params['factor_loss_size']), budget, pnl,
+                           ints, floats)
+
+    labels = [f"{l}/{r}" for l, r in pairs]
+    dates = prices.index
+    positions = pd.DataFrame(ints[:count], columns=_INT_FIELDS)
+    positions = pd.concat([positions, pd.DataFrame(floats[:count],
+                                                   columns=_FLOAT_FIELDS)],
+                          axis=1)
+    positions = pd.DataFrame({
+        'pair': np.array(labels, dtype=object)[positions['pair']],
+        'date_entry': dates[positions['idx_entry']],
+        'side': np.where(positions['side'] == kernel.SIDE_SELL, 'sell',
+                         'buy'),
+        'units': positions['units'],
+        'price_entry_l': positions['price_entry_l'],
+        'price_entry_r': positions['price_entry_r'],
+        'size_l': positions['size_l'],
+        'size_r': positions['size_r'],
+        'min_loss': positions['min_loss'],
+        'date_min_loss': dates[positions['idx_min_loss']],
+        'target_profit': positions['target_profit'],
+        'target_loss': positions['target_loss'],
+        'date_exit': dates[positions['idx_exit']],
+        'price_exit_l': positions['price_exit_l'],
+        'price_exit_r': positions['price_exit_r'],
+        'profit': positions['profit'],
+        'pnl': positions['units']*positions['profit'],
+        'exit_reason': np.array(kernel.EXIT_REASONS, dtype=object)[
+            positions['exit_reason']],
+    })
+
+    contributions = pd.DataFrame(pnl.T, index=dates, columns=labels)
+    equity = capital + contributions.sum(axis=1)
+    equity = pd.concat([equity.rename('equity'), contributions], axis=1)
+
+    g = positions.groupby('pair')
+    summary = pd.DataFrame({
+        'pair': labels,
+        'count_trades': g.size().reindex(labels, fill_value=0).to_numpy(),
+        'winrate': g['pnl'].apply(lambda x: (x >= 0).mean())
+                           .reindex(labels).to_numpy(),
+        'sum_profit': g['pnl'].sum().reindex(labels, fill_value=0)
+                              .to_numpy(),
+        'contribution': pnl[:, -1],
+    })
+
+    return equity, positions, summary
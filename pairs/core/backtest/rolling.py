@@ -0,0 +1,380 @@
+"""Incremental rolling-window statistics for `calculate_inputs.setup`
+
+All columns documented in `calculate_inputs.setup` are produced in one
+pass over NumPy arrays. Rolling means, standard deviations and the
+correlation are maintained with Welford-style running moments that are
+updated in O(1) per bar when a value enters and leaves the window. The
+loop is compiled with numba when it is installed.
+
+Like pandas, a rolling statistic is only defined once the window holds
+`window` valid (non-NaN) values. To bound floating point drift from the
+add/remove updates, the moments are recomputed from the window contents
+every `RESYNC` bars by default.
+
+For many series at once, `window_sum` and `rolling_mean_std` compute
+rolling sums, means and stds along the rows of 2-D arrays as differences
+of cumulative sums, in whole-array NumPy operations. They work on
+blocks of `RESYNC` rows (see `blockwise`), each centered on its own mean,
+so that the rounding error of the cumulative sums does not grow with the
+length or the drift of the series.
+
+"""
+import numpy as np
+from ..jit import njit
+
+RESYNC = 4096
+
+# output columns, in the order they are added to the dataframe
+COLUMNS = ('return_l', 'price_change_l', 'std_l', 'std_pcg_l', 'return_r',
+           'price_change_r', 'std_r', 'std_pcg_r', 'corr_rolling', 'size_r',
+           'spread', 'spread_std', 'spread_mean', 'band_upper', 'band_lower')
+
+(RETURN_L, PRICE_CHANGE_L, STD_L, STD_PCG_L, RETURN_R, PRICE_CHANGE_R, STD_R,
+ STD_PCG_R, CORR_ROLLING, SIZE_R, SPREAD, SPREAD_STD, SPREAD_MEAN, BAND_UPPER,
+ BAND_LOWER) = range(len(COLUMNS))
+
+
+@njit
+def _push(st, x):
+    """Add `x` to the moments `st = [count, mean, m2]`"""
+    if x != x:
+        return
+    st[0] += 1
+    d = x - st[1]
+    st[1] += d / st[0]
+    st[2] += d*(x - st[1])
+
+
+@njit
+def _pop(st, x):
+    """Remove `x` from the moments `st = [count, mean, m2]`"""
+    if x != x:
+        return
+    st[0] -= 1
+    if st[0] == 0:
+        st[1] = 0.0
+        st[2] = 0.0
+        return
+    d = x - st[1]
+    st[1] -= d / st[0]
+    st[2] -= d*(x - st[1])
+
+
+@njit
+def _push2(st, x, y):
+    """Add `(x, y)` to the co-moments `st = [count, mx, my, m2x, m2y, cxy]`"""
+    if x != x or y != y:
+        return
+    st[0] += 1
+    dx = x - st[1]
+    dy = y - st[2]
+    st[1] += dx / st[0]
+    st[2] += dy / st[0]
+    st[3] += dx*(x - st[1])
+    st[4] += dy*(y - st[2])
+    st[5] += dx*(y - st[2])
+
+
+@njit
+def _pop2(st, x, y):
+    """Remove `(x, y)` from the co-moments `st`"""
+    if x != x or y != y:
+        return
+    st[0] -= 1
+    if st[0] == 0:
+        st[1:] = 0.0
+        return
+    dx = x - st[1]
+    dy = y - st[2]
+    st[1] -= dx / st[0]
+    st[2] -= dy / st[0]
+    st[3] -= dx*(x - st[1])
+    st[4] -= dy*(y - st[2])
+    st[5] -= dx*(y - st[2])
+
+
+@njit
+def _std(st, window):
+    """Sample std of a full window, NaN otherwise"""
+    if st[0] < window or window < 2:
+        return np.nan
+    return np.sqrt(max(st[2], 0.0) / (st[0] - 1))
+
+
+def new_state(window_std, window_corr):
+    """Return the running state of `rolling_steps` before the first bar
+
+    The state is a tuple `(ring, moments, last)`: a ring buffer holding
+    the `COLUMNS` of the last bars (bar `i` at position `i % size`), the
+    moments of the windows of returns, price changes, spread and
+    correlation, and the last prices `[last_l, last_r, prev_l, prev_r]`
+    where "last" prices are forward filled.
+
+    """
+    ring = np.full((len(COLUMNS), max(window_std, window_corr) + 1), np.nan)
+    moments = np.zeros((6, 6))
+    last = np.full(4, np.nan)
+
+    return ring, moments, last
+
+
+@njit
+def _at(j, cap):
+    """Position of bar `j` in a ring buffer of `cap` bars"""
+    # no division when the buffer holds every bar, see `rolling_steps`
+    return j if j < cap else j % cap
+
+
+@njit
+def _roll(st, ring, col, i, window, resync):
+    """Slide the window of column `col` of a ring buffer to end at bar `i`
+
+    The ring buffer holds bar `j` at position `j % size` and needs at
+    least `window + 1` bars.
+
+    """
+    cap = ring.shape[1]
+    if resync:
+        st[:3] = 0.0
+        for j in range(max(i - window + 1, 0), i + 1):
+            _push(st, ring[col, _at(j, cap)])
+        return
+    if i >= window:
+        _pop(st, ring[col, _at(i - window, cap)])
+    _push(st, ring[col, _at(i, cap)])
+
+
+@njit
+def _roll2(st, ring, col_x, col_y, i, window, resync):
+    """Slide the paired window of columns `col_x`, `col_y` to end at bar `i`"""
+    cap = ring.shape[1]
+    if resync:
+        st[:] = 0.0
+        for j in range(max(i - window + 1, 0), i + 1):
+            _push2(st, ring[col_x, _at(j, cap)], ring[col_y, _at(j, cap)])
+        return
+    if i >= window:
+        j = _at(i - window, cap)
+        _pop2(st, ring[col_x, j], ring[col_y, j])
+    _push2(st, ring[col_x, _at(i, cap)], ring[col_y, _at(i, cap)])
+
+
+@njit
+def rolling_steps(start, stop, price_l, price_r, sizes, window_std,
+                  window_corr, factor_std, resync_every, ring, moments, last):
+    """Calculate the `COLUMNS` of bars `start` to `stop - 1`
+
+    Continues from the state of bar `start - 1`, as returned by
+    `new_state` or the last call, and leaves the state of bar
+    `stop - 1`. The prices of bar `i` are read from position
+    `i % len(price_l)`, the share size from `sizes` (the volatility
+    ratio if it is empty), and the columns are written to
+    `ring[:, i % ring.shape[1]]`. `rolling_setup` is one call on arrays
+    holding every bar, `stream.PairSignalStream` one call per bar on
+    ring buffers, so both run the same floating point operations.
+
+    """
+    cap = ring.shape[1]
+    cap_prices = len(price_l)
+    has_sizes = len(sizes) > 0
+    st_rl = moments[0]
+    st_pl = moments[1]
+    st_rr = moments[2]
+    st_pr = moments[3]
+    st_sp = moments[4]
+    st_corr = moments[5]
+    last_l, last_r, prev_l, prev_r = last[0], last[1], last[2], last[3]
+    for i in range(start, stop):
+        k = _at(i, cap)
+        for col in range(len(COLUMNS)):
+            ring[col, k] = np.nan
+        p = _at(i, cap_prices)
+        pl = price_l[p]
+        pr = price_r[p]
+
+        # returns are taken on forward filled prices, like pct_change
+        cur_l = pl if pl == pl else last_l
+        cur_r = pr if pr == pr else last_r
+        if i > 0:
+            ring[RETURN_L, k] = cur_l / last_l - 1
+            ring[RETURN_R, k] = cur_r / last_r - 1
+            ring[PRICE_CHANGE_L, k] = pl - prev_l
+            ring[PRICE_CHANGE_R, k] = pr - prev_r
+        last_l = cur_l
+        last_r = cur_r
+        prev_l = pl
+        prev_r = pr
+
+        resync = i > 0 and i % resync_every == 0
+        _roll(st_rl, ring, RETURN_L, i, window_std, resync)
+        _roll(st_pl, ring, PRICE_CHANGE_L, i, window_std, resync)
+        _roll(st_rr, ring, RETURN_R, i, window_std, resync)
+        _roll(st_pr, ring, PRICE_CHANGE_R, i, window_std, resync)
+        _roll2(st_corr, ring, RETURN_L, RETURN_R, i, window_corr, resync)
+        ring[STD_L, k] = _std(st_rl, window_std)
+        ring[STD_PCG_L, k] = _std(st_pl, window_std)
+        ring[STD_R, k] = _std(st_rr, window_std)
+        ring[STD_PCG_R, k] = _std(st_pr, window_std)
+        if st_corr[0] >= window_corr and st_corr[3] > 0 and st_corr[4] > 0:
+            ring[CORR_ROLLING, k] = st_corr[5] / np.sqrt(st_corr[3]
+                                                         * st_corr[4])
+
+        # share size and spread
+        if has_sizes:
+            size_r = sizes[p]
+        else:
+            size_r = (pl*ring[STD_L, k]) / (pr*ring[STD_R, k])
+        ring[SIZE_R, k] = size_r
+        ring[SPREAD, k] = pl - size_r*pr
+        _roll(st_sp, ring, SPREAD, i, window_std, resync)
+        ring[SPREAD_STD, k] = _std(st_sp, window_std)
+        if st_sp[0] >= window_std:
+            ring[SPREAD_MEAN, k] = st_sp[1]
+
+        # bands around the previous bar's mean
+        if i > 0:
+            j = _at(i - 1, cap)
+            mean = ring[SPREAD_MEAN, j]
+            std = ring[SPREAD_STD, j]
+            ring[BAND_UPPER, k] = mean + factor_std*std
+            ring[BAND_LOWER, k] = mean - factor_std*std
+    last[0] = last_l
+    last[1] = last_r
+    last[2] = prev_l
+    last[3] = prev_r
+
+
+def blockwise(func, window, *arrays, block=RESYNC):
+    """Apply a rolling statistic to blocks of rows and stitch the results
+
+    `func(*arrays, window)` computes statistics of the last `window`
+    rows of every row of `arrays`, returning an array or a tuple of
+    arrays with one row per row. It is applied to blocks of `block`
+    rows (at least `window`), each with the `window - 1` rows before
+    it, so that cumulative sums taken by `func` restart on every block.
+
+    """
+    n = len(arrays[0])
+    block = max(int(block), window)
+    if n < block + window:
+        return func(*arrays, window)
+    parts = list()
+    for lo in range(0, n, block):
+        first = max(lo - window + 1, 0)
+        result = func(*[a[first:lo + block] for a in arrays], window)
+        if isinstance(result, tuple):
+            parts.append(tuple(x[lo - first:] for x in result))
+        else:
+            parts.append(result[lo - first:])
+    if isinstance(parts[0], tuple):
+        return tuple(np.concatenate(x) for x in zip(*parts))
+    return np.concatenate(parts)
+
+
+def _window_sum(a, window):
+    s = np.cumsum(a, axis=0)
+    s[window:] -= s[:-window].copy()
+    return s
+
+
+def window_sum(a, window, block=RESYNC):
+    """Sums of the last `window` rows of `a`, partial in the first rows
+
+    The cumulative sums the sums are taken from restart every `block`
+    rows, see `blockwise`.
+
+    """
+    return blockwise(_window_sum, window, np.asarray(a), block=block)
+
+
+def lagged_bands(mean, std, factor):
+    """Bands `factor` stds around the mean of the previous row
+
+    Returns the upper and lower band of every row of `mean` and `std`
+    (1-D or 2-D), NaN in the first row.
+
+    """
+    upper = np.full_like(mean, np.nan)
+    lower = np.full_like(mean, np.nan)
+    upper[1:] = mean[:-1] + factor*std[:-1]
+    lower[1:] = mean[:-1] - factor*std[:-1]
+
+    return upper, lower
+
+
+def centered(a, valid):
+    """`a` minus the mean of its valid values along axis 0, 0 elsewhere
+
+    Window sums of centered values lose less precision to the
+    differences of cumulative sums.
+
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(valid, a, 0).sum(axis=0) / valid.sum(axis=0)
+    return np.where(valid, a - mean, 0.0), mean
+
+
+def _mean_std(a, window):
+    valid = ~np.isnan(a)
+    full = window_sum(valid.astype(np.float64), window) >= window
+    x, center = centered(a, valid)
+    s1 = window_sum(x, window)
+    s2 = window_sum(x*x, window)
+    mean = s1/window + center
+    mean[~full] = np.nan
+    if window < 2:
+        return mean, np.full_like(mean, np.nan)
+    std = np.sqrt(np.maximum(s2 - s1*s1/window, 0.0) / (window - 1))
+    std[~full] = np.nan
+
+    return mean, std
+
+
+def rolling_mean_std(a, window):
+    """Rolling mean and sample std along the rows of a 1-D or 2-D array
+
+    A window is only defined once it holds `window` valid values, as in
+    `rolling_setup`. Both have the shape of `a`. The values are centered
+    on the mean of every block of `RESYNC` rows, see `blockwise`.
+
+    """
+    return blockwise(_mean_std, window, np.asarray(a, dtype=np.float64))
+
+
+def rolling_setup(price_l, price_r, window_std, window_corr, factor_std,
+                  resync=RESYNC, size_r=None):
+    """Calculate the `setup` columns in one pass over price arrays
+
+    Parameters
+    ----------
+    price_l, price_r : array
+        Prices of the pair, sorted by date.
+
+    window_std, window_corr, factor_std : int, int, float
+        The params of the same name used by `calculate_inputs.setup`.
+
+    resync : int
+        Number of bars after which the running moments are recomputed
+        from the window contents.
+
+    size_r : array
+        Share sizes of the right asset, e.g. from `hedge.hedge_ratio`.
+        Defaults to the volatility ratio.
+
+    Returns
+    -------
+    cols : dict
+        A dict of float64 arrays keyed by the names in `COLUMNS`.
+
+    """
+    price_l = np.ascontiguousarray(price_l, dtype=np.float64)
+    price_r = np.ascontiguousarray(price_r, dtype=np.float64)
+    sizes = np.empty(0) if size_r is None \
+        else np.ascontiguousarray(size_r, dtype=np.float64)
+    out = np.full((len(COLUMNS), len(price_l)), np.nan)
+    _, moments, last = new_state(int(window_std), int(window_corr))
+    rolling_steps(0, len(price_l), price_l, price_r, sizes, int(window_std),
+                  int(window_corr), float(factor_std), int(resync), out,
+                  moments, last)
+
+    return dict(zip(COLUMNS, out))
@@ -0,0 +1,261 @@
+"""Online signals for live bars
+
+`PairSignalStream` takes one bar at a time and keeps the rolling state
+of `calculate_inputs.setup` and the position state of the backtest, so
+that paper trading does not need to rerun the batch pipeline on every
+new bar. Each update is a single call of a compiled function (when
+numba is installed) that does a constant amount of work per bar.
+
+"""
+import numpy as np
+from ..exc import PairsError
+from ..jit import njit
+from . import kernel
+from .calculate_inputs import exit_factor
+from .hedge import hedge_params
+from .rolling import (COLUMNS, RESYNC, STD_L, STD_R, SIZE_R, SPREAD,
+                      SPREAD_STD, SPREAD_MEAN, BAND_UPPER, BAND_LOWER,
+                      new_state, rolling_steps)
+
+# layout of the position state array
+(POS_SIDE, POS_SIZE_L, POS_SIZE_R, POS_PRICE_ENTRY_L, POS_PRICE_ENTRY_R,
+ POS_TARGET_PROFIT, POS_TARGET_LOSS, POS_MIN_LOSS, POS_IDX_ENTRY,
+ POS_IDX_MIN_LOSS) = range(10)
+
+# layout of the output array of `_step`
+OUT_EVENT, OUT_REASON, OUT_PROFIT = range(3)
+EVENT_NONE, EVENT_ENTRY, EVENT_EXIT = range(3)
+
+
+@njit
+def _ring_spread_std(prices, size_l, size_r, start, stop):
+    """`kernel.spread_std` over a ring buffer of prices"""
+    cap = prices.shape[1]
+    m = stop - start
+    if m < 2:
+        return np.nan
+    mean_l = 0.0
+    mean_r = 0.0
+    for j in range(start, stop):
+        mean_l += size_l*prices[0, j % cap]
+        mean_r += size_r*prices[1, j % cap]
+    mean_l /= m
+    mean_r /= m
+    var_l = 0.0
+    var_r = 0.0
+    cov = 0.0
+    for j in range(start, stop):
+        dl = size_l*prices[0, j % cap] - mean_l
+        dr = size_r*prices[1, j % cap] - mean_r
+        var_l += dl*dl
+        var_r += dr*dr
+        cov += dl*dr
+    var = (var_l + var_r - 2*cov) / (m - 1)
+    return np.sqrt(max(var, 0.0))
+
+
+@njit
+def _step(i, price_l, price_r, window_std, window_corr, factor_std,
+          factor_exit_std, factor_profit_std, factor_loss_size, resync_every,
+          ring, moments, last, prices, pos, out):
+    """Process bar `i`, the same as one iteration of the batch pipeline
+
+    The setup columns are calculated by `rolling.rolling_steps`, the
+    position is updated like `kernel._state_machine_loop`, with exit
+    bands `factor_exit_std` stds around the spread mean of bar `i - 1`.
+
+    """
+    prices[0, i % prices.shape[1]] = price_l
+    prices[1, i % prices.shape[1]] = price_r
+    # no sizes, the stream hedges with the volatility ratio
+    rolling_steps(i, i + 1, prices[0], prices[1], prices[0, :0], window_std,
+                  window_corr, factor_std, resync_every, ring, moments, last)
+    out[OUT_EVENT] = EVENT_NONE
+    out[OUT_PROFIT] = np.nan
+
+    k = i % ring.shape[1]
+    s = ring[SPREAD, k]
+    if s != s:
+        return
+    if pos[POS_SIDE] == 0:
+        if s > ring[BAND_UPPER, k]:
+            pos[POS_SIDE] = kernel.SIDE_SELL
+        elif s < ring[BAND_LOWER, k]:
+            pos[POS_SIDE] = kernel.SIDE_BUY
+        else:
+            return
+        pos[POS_SIZE_L] = 1.0
+        pos[POS_SIZE_R] = ring[SIZE_R, k]
+        pos[POS_PRICE_ENTRY_L] = price_l
+        pos[POS_PRICE_ENTRY_R] = price_r
+        std = _ring_spread_std(prices, pos[POS_SIZE_L], pos[POS_SIZE_R],
+                               max(i - window_std, 0), i + 1)
+        pos[POS_TARGET_PROFIT] = factor_profit_std*std
+        pos[POS_TARGET_LOSS] = -factor_loss_size*pos[POS_TARGET_PROFIT]
+        pos[POS_MIN_LOSS] = 0.0
+        pos[POS_IDX_ENTRY] = i
+        pos[POS_IDX_MIN_LOSS] = i
+        out[OUT_EVENT] = EVENT_ENTRY
+        return
+
+    # a position is opened after the first bar, so bar i - 1 exists
+    j = (i - 1) % ring.shape[1]
+    mean = ring[SPREAD_MEAN, j]
+    std = ring[SPREAD_STD, j]
+    if pos[POS_SIDE] == kernel.SIDE_SELL:
+        pl = pos[POS_SIZE_L]*(pos[POS_PRICE_ENTRY_L] - price_l) \
+            + pos[POS_SIZE_R]*(price_r - pos[POS_PRICE_ENTRY_R])
+        exit_on_band = s < mean - factor_exit_std*std
+    else:
+        pl = pos[POS_SIZE_L]*(price_l - pos[POS_PRICE_ENTRY_L]) \
+            + pos[POS_SIZE_R]*(pos[POS_PRICE_ENTRY_R] - price_r)
+        exit_on_band = s > mean + factor_exit_std*std
+    out[OUT_PROFIT] = pl
+    if pl < pos[POS_MIN_LOSS]:
+        pos[POS_MIN_LOSS] = pl
+        pos[POS_IDX_MIN_LOSS] = i
+
+    if pl >= pos[POS_TARGET_PROFIT]:
+        out[OUT_REASON] = kernel.EXIT_TAKE_PROFIT
+    elif pl <= pos[POS_TARGET_LOSS]:
+        out[OUT_REASON] = kernel.EXIT_STOP_LOSS
+    elif exit_on_band:
+        out[OUT_REASON] = kernel.EXIT_BAND
+    else:
+        return
+    out[OUT_EVENT] = EVENT_EXIT
+    pos[POS_SIDE] = 0
+
+
+class PairSignalStream:
+    """Signals, entries and exits of a pair, updated one bar at a time
+
+    Feeding the bars of a dataframe to `update` in date order gives, for
+    every bar, the same setup values as
+    `calculate_inputs.setup(df, params, engine='incremental')` and the
+    same positions as `backtest(df, params=params, engine='compiled',
+    setup_engine='incremental')`.
+
+    The state is kept in small arrays: ring buffers of the last bars
+    and the running moments of the rolling windows. Updating a bar takes
+    constant time; only a bar that opens a position also looks back over
+    the `window_std` bars that set its profit target.
+
+    Parameters
+    ----------
+    params : dict
+        The backtest params, see `backtest`. Only the "vol" hedge is
+        supported.
+
+    resync : int
+        See `rolling.rolling_setup`.
+
+    Attributes
+    ----------
+    positions : list
+        Closed positions, as dicts with the keys of the positions
+        returned by `backtest` (without row snapshots).
+
+    position : dict
+        The open position, or None.
+
+    """
+
+    def __init__(self, params, resync=RESYNC):
+        if hedge_params(params)['hedge'] != 'vol':
+            raise PairsError('Streams only support the "vol" hedge.')
+        self.window_std = int(params['window_std'])
+        self.window_corr = int(params['window_corr'])
+        self.factor_std = float(params['factor_std'])
+        self.factor_exit_std = exit_factor(params)
+        self.factor_profit_std = float(params['factor_profit_std'])
+        self.factor_loss_size = float(params['factor_loss_size'])
+        self.resync = int(resync)
+        self.ring, self.moments, self.last = new_state(self.window_std,
+                                                       self.window_corr)
+        self.prices = np.full((2, self.window_std + 1), np.nan)
+        self._pos = np.zeros(10)
+        self._out = np.zeros(3)
+        self.count = 0
+        self.positions = list()
+        self.position = None
+
+    def update(self, date, price_l, price_r):
+        """Process the next bar and return its signals
+
+        Returns a dict with keys 'date', 'spread', 'band_upper',
+        'band_lower', 'signal_buy', 'signal_sell', 'entry' ('buy' or
+        'sell' if a position is opened on this bar, else None), 'exit'
+        (the exit reason if the open position is closed on this bar, else
+        None) and 'profit' (of the open position, NaN if there is none).
+
+        """
+        i = self.count
+        pos = self._pos
+        idx_min_loss = pos[POS_IDX_MIN_LOSS]
+        _step(i, float(price_l), float(price_r), self.window_std,
+              self.window_corr, self.factor_std, self.factor_exit_std,
+              self.factor_profit_std, self.factor_loss_size, self.resync,
+              self.ring, self.moments, self.last, self.prices, pos,
+              self._out)
+        self.count += 1
+
+        k = i % self.ring.shape[1]
+        spread = self.ring[SPREAD, k]
+        band_upper = self.ring[BAND_UPPER, k]
+        band_lower = self.ring[BAND_LOWER, k]
+        event = self._out[OUT_EVENT]
+        entry = exit_reason = None
+        if event == EVENT_ENTRY:
+            entry = 'sell' if pos[POS_SIDE] == kernel.SIDE_SELL else 'buy'
+            self.position = {
+                'date_entry': date,
+                'side': entry,
+                'price_entry_l': pos[POS_PRICE_ENTRY_L],
+                'price_entry_r': pos[POS_PRICE_ENTRY_R],
+                'size_l': pos[POS_SIZE_L],
+                'size_r': pos[POS_SIZE_R],
+                'std_l': self.ring[STD_L, k],
+                'std_r': self.ring[STD_R, k],
+                'min_loss': 0.0,
+                'date_min_loss': date,
+                'target_profit': pos[POS_TARGET_PROFIT],
+                'target_loss': pos[POS_TARGET_LOSS],
+            }
+        elif self.position is not None:
+            if pos[POS_IDX_MIN_LOSS] != idx_min_loss:
+                self.position['min_loss'] = pos[POS_MIN_LOSS]
+                self.position['date_min_loss'] = date
+            if event == EVENT_EXIT:
+                exit_reason = kernel.EXIT_REASONS[int(self._out[OUT_REASON])]
+                self.position.update({
+                    'date_exit': date,
+                    'price_exit_l': float(price_l),
+                    'price_exit_r': float(price_r),
+                    'profit': self._out[OUT_PROFIT],
+                    'exit_reason': exit_reason,
+                })
+                self.positions.append(self.position)
+                self.position = None
+
+        return {
+            'date': date,
+            'spread': spread,
+            'band_upper': band_upper,
+            'band_lower': band_lower,
+            'signal_buy': spread < band_lower,
+            'signal_sell': spread > band_upper,
+            'entry': entry,
+            'exit': exit_reason,
+            'profit': self._out[OUT_PROFIT],
+        }
+
+    def values(self):
+        """Return the setup columns of the last bar as a dict"""
+        if not self.count:
+            return dict()
+        k = (self.count - 1) % self.ring.shape[1]
+        values = dict(zip(COLUMNS, self.ring[:, k].tolist()))
+        values['size_l'] = 1
+
+        return values
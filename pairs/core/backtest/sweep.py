@@ -0,0 +1,174 @@
+"""Grid search over backtest params"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+import numpy as np
+import pandas as pd
+from ..exc import PairsError
+from .backtest import backtest
+from ..options import PARAM_NAMES, SETUP_PARAMS
+from .memo import SetupCache
+
+# price data and setup cache shared by all tasks of a worker process, see
+# `_init_worker`
+_DATA = None
+_OPTIONS = None
+_CACHE = None
+
+
+def parse_values(text, dtype=float):
+    """Parse a CLI list of param values
+
+    Accepts a comma separated list ("5,10,20") or a range given as
+    "start:stop:step", where `stop` is included if it is hit by the
+    steps ("5:20:5" is 5, 10, 15, 20).
+
+    """
+    if ':' in text:
+        try:
+            start, stop, step = [float(x) for x in text.split(':')]
+        except ValueError:
+            raise PairsError(f"Range '{text}' must be 'start:stop:step'.")
+        if step <= 0:
+            raise PairsError(f"Range '{text}' must have a positive step.")
+        values = np.arange(start, stop + step/2, step)
+        values = [round(x, 10) for x in values]
+    else:
+        values = [float(x) for x in text.split(',') if x.strip()]
+
+    return [dtype(x) for x in values]
+
+
+def make_grid(grid, defaults):
+    """Expand a dict of param values into a list of param dicts
+
+    `grid` maps names in `PARAM_NAMES` to lists of values, params that
+    are missing from `grid` are taken from `defaults` (which may be
+    None if `grid` has all of them). The optional params of `setup`
+    (`SETUP_PARAMS`) in `defaults` are the same in every combination.
+
+    """
+    defaults = defaults or {}
+    for k in grid:
+        if k not in PARAM_NAMES:
+            raise PairsError(f"Unknown sweep param '{k}'.")
+    missing = [k for k in PARAM_NAMES if k not in grid and k not in defaults]
+    if missing:
+        raise PairsError(f"Params {missing} need values in the grid or "
+                         f"defaults.")
+    values = [grid[k] if k in grid else [defaults[k]] for k in PARAM_NAMES]
+    fixed = {k: defaults[k] for k in SETUP_PARAMS if k in defaults}
+
+    return [dict(zip(PARAM_NAMES, x), **fixed) for x in product(*values)]
+
+
+def flatten_stats(stats):
+    """Flatten a `create_stats` dict into one row of scalars"""
+    row = {f"param_{k}": v for k, v in stats['general_params'].items()}
+    for k, v in stats.items():
+        if k == 'general_params':
+            continue
+        elif k == 'exit_reasons':
+            for reason, share in v.items():
+                row[f"exit_reason_{reason.replace(' ', '_')}"] = share
+        elif k.startswith('corr_last_'):
+            # the key depends on window_corr, so it gets a fixed name
+            row['corr_last_bars'] = v
+        else:
+            row[k] = v
+
+    return row
+
+
+def _init_worker(df, options, cache_bytes):
+    """Store the price data and create a setup cache once per process"""
+    global _DATA, _OPTIONS, _CACHE
+    _DATA = df
+    _OPTIONS = options
+    _CACHE = SetupCache(max_bytes=cache_bytes)
+
+
+def _run_one(params):
+    """Backtest one param combination on the worker's data"""
+    _, _, stats, _ = backtest(df=_DATA, params=dict(params),
+                              setup_cache=_CACHE, **_OPTIONS)
+
+    return flatten_stats(stats)
+
+
+def sweep(df, grid, defaults=None, max_workers=None, engine='compiled',
+          setup_engine='incremental', cache_mb=256, costs=None,
+          symbols=(None, None), equity_dtype=None):
+    """Backtest every combination of params in `grid`
+
+    The combinations are fanned out over a `ProcessPoolExecutor`. The
+    price data is sent to each worker process once, when it starts, and
+    only the params are sent with each task.
+
+    Each worker keeps a `memo.SetupCache`. Combinations are ordered so
+    that the setup params (window_std, window_corr, factor_std) vary
+    slowest, so that consecutive tasks, which are sent to a worker in
+    chunks, reuse the same prepared dataframe.
+
+    Parameters
+    ----------
+    df : DataFrame
+        Dataframe of prices. Must have columns 'date', 'price_l' and
+        'price_r'.
+
+    grid : dict
+        Maps param names (see `PARAM_NAMES`) to a list of values.
+
+    defaults : dict
+        Values for params missing from `grid`, e.g. the
+        `backtest_daily` config section.
+
+    max_workers : int
+        Number of worker processes, defaults to the number of CPUs.
+        With 1, the combinations are run in this process.
+
+    engine, setup_engine : str
+        Passed to `backtest`.
+
+    cache_mb : float
+        Memory budget of the setup cache of each worker, in megabytes.
+
+    costs : CostModel
+        Trading costs at the rates of `symbols`, passed to `backtest`.
+        Without it, costs are zero.
+
+    equity_dtype : str
+        If set, e.g. to "float32", the equity curve of every combination
+        is kept as an array of this dtype in the column 'equity'.
+
+    Returns
+    -------
+    results : DataFrame
+        One row per combination with the params (prefixed by "param_")
+        and the `create_stats` metrics, sorted by `sum_profit_net`, the
+        profit after costs.
+
+    """
+    combos = make_grid(grid, defaults)
+    df = df[['date', 'price_l', 'price_r']]
+    options = {'engine': engine, 'setup_engine': setup_engine,
+               'costs': costs, 'symbols': tuple(symbols),
+               'equity_dtype': equity_dtype}
+    cache_bytes = int(cache_mb*2**20)
+
+    workers = min(max_workers or os.cpu_count() or 1, len(combos))
+    if workers <= 1:
+        _init_worker(df, options, cache_bytes)
+        rows = [_run_one(x) for x in combos]
+    else:
+        # a few chunks per worker keeps every core busy to the end
+        chunksize = max(1, len(combos) // (4*workers))
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_init_worker,
+                                 initargs=(df, options, cache_bytes)) as ex:
+            rows = list(ex.map(_run_one, combos, chunksize=chunksize))
+
+    results = pd.DataFrame(rows)
+
+    return (results.sort_values(by=['sum_profit_net'], ascending=False)
+                   .reset_index(drop=True))
@@ -0,0 +1,275 @@
+"""Walk-forward optimization of backtest params
+
+The history is split into folds of a train window followed by a test
+window. On every fold the params of a grid are ranked by their backtest
+on the train window, and the best ones are backtested on the test
+window. Stitching the test windows gives an out-of-sample backtest,
+free of the in-sample bias of picking params on the data they are
+evaluated on. With a `costs.CostModel`, the trades of every window
+carry their costs, so that params can be ranked net of costs
+('sum_profit_net') and the out-of-sample positions are net of them.
+
+The setup columns are computed by causal rolling windows, so the setup
+of a window is the setup of the whole history restricted to it. Every
+worker therefore sets up the whole history once per combination of
+setup params (keeping it in a `memo.SetupCache`) and slices it for all
+of its folds.
+
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from ..exc import PairsError
+from . import describe
+from . import kernel
+from .ledger import positions_frame
+from .memo import SetupCache
+from .sweep import make_grid
+
+# columns passed to `kernel.run_state_machine`, the exit bands by keyword
+KERNEL_COLUMNS = ['price_l', 'price_r', 'size_l', 'size_r', 'spread',
+                  'band_upper', 'band_lower', 'exit_band_upper',
+                  'exit_band_lower']
+
+# functions of the profits of the trades of a train window (a dataframe
+# with the columns 'profit' and 'profit_net', see `window_profits`),
+# higher is better, named as in `options.WALK_FORWARD_METRICS`
+METRICS = {
+    'sum_profit': lambda x: x['profit'].sum(),
+    'sum_profit_net': lambda x: x['profit_net'].sum(),
+    'profit_mean': lambda x: x['profit'].mean() if len(x) else np.nan,
+    'winrate': lambda x: (x['profit'] >= 0).mean() if len(x) else np.nan,
+}
+
+# price data, params grid, setup cache and cost model of a worker
+# process, see `_init_worker`
+_DATA = None
+_COMBOS = None
+_METRIC = None
+_CACHE = None
+_COSTS = None
+_SYMBOLS = (None, None)
+
+
+def make_folds(n, train, test, step=None):
+    """Split `n` bars into folds of a train and a test window
+
+    The train windows have `train` bars and are followed by test windows
+    of `test` bars. Folds start `step` bars apart, by default `test`, so
+    that the test windows cover every bar after the first train window
+    once. The last test window may be shorter. A `step` longer than
+    `test` skips the bars between the test windows, a shorter one would
+    test bars more than once and raises a `PairsError`.
+
+    Returns a list of `(train_start, test_start, test_end)` tuples.
+
+    """
+    step = step or test
+    if train < 2 or test < 1 or step < 1:
+        raise PairsError('Train and test windows must be positive.')
+    if step < test:
+        raise PairsError(f"Step of {step:,.0f} bars must not be shorter "
+                         f"than the test window of {test:,.0f} bars.")
+    if train >= n:
+        raise PairsError(f"Train window of {train:,.0f} bars needs more "
+                         f"than {n:,.0f} bars.")
+    folds = list()
+    start = 0
+    while start + train < n:
+        folds.append((start, start + train, min(start + train + test, n)))
+        start += step
+
+    return folds
+
+
+def run_window(df, params, start, stop):
+    """Run the state machine on bars `start` to `stop` of setup `df`
+
+    Positions can only be opened from bar `start` on; the `window_std`
+    bars before it only serve the profit target of early entries.
+    Positions still open on bar `stop - 1` are dropped. Returns trade
+    records with indices into `df`.
+
+    """
+    lo = max(start - int(params['window_std']), 0)
+    arrays = [df[x].to_numpy(dtype=float)[lo:stop] for x in KERNEL_COLUMNS]
+    arrays[4] = arrays[4].copy()
+    arrays[4][:start - lo] = np.nan
+    trades = kernel.run_state_machine(*arrays[:7], params['window_std'],
+                                      params['factor_profit_std'],
+                                      params['factor_loss_size'],
+                                      exit_band_upper=arrays[7],
+                                      exit_band_lower=arrays[8])
+    for field in ['idx_entry', 'idx_exit', 'idx_min_loss']:
+        trades[field] += lo
+
+    return trades
+
+
+def window_profits(df, trades, costs=None, symbols=(None, None)):
+    """Profits of trade records before and after costs
+
+    Returns a dataframe with the columns 'profit' and 'profit_net', the
+    profit less the costs of `costs` at the rates of `symbols` (the
+    same without `costs`).
+
+    """
+    if costs is None:
+        profit = trades['profit']
+        return pd.DataFrame({'profit': profit, 'profit_net': profit})
+    positions = costs.apply(positions_frame(df, trades), symbols)
+    return positions[['profit', 'profit_net']]
+
+
+def _init_worker(df, combos, metric, cache_bytes, costs=None,
+                 symbols=(None, None)):
+    """Store the prices and the grid and create a setup cache once"""
+    global _DATA, _COMBOS, _METRIC, _CACHE, _COSTS, _SYMBOLS
+    _DATA = df
+    _COMBOS = combos
+    _METRIC = metric
+    _CACHE = SetupCache(max_bytes=cache_bytes)
+    _COSTS = costs
+    _SYMBOLS = symbols
+
+
+def _run_fold(fold):
+    """Pick the best params on the train window and run the test window"""
+    train_start, test_start, test_end = fold
+    score = METRICS[_METRIC]
+    best, best_score, best_trades = None, -np.inf, 0
+    for params in _COMBOS:
+        df = _CACHE.setup(_DATA, params, engine='incremental')
+        trades = run_window(df, params, train_start, test_start)
+        s = score(window_profits(df, trades, _COSTS, _SYMBOLS))
+        if s > best_score:
+            best, best_score, best_trades = params, s, len(trades)
+    if best is None:
+        # no combination has a defined score, e.g. no trades at all
+        best, best_score = _COMBOS[0], np.nan
+
+    df = _CACHE.setup(_DATA, best, engine='incremental')
+    trades = run_window(df, best, test_start, test_end)
+
+    return {
+        'params': best,
+        'score_train': best_score,
+        'count_trades_train': best_trades,
+        'trades': trades,
+    }
+
+
+def walk_forward(df, grid, defaults=None, train=250, test=60, step=None,
+                 metric='sum_profit', max_workers=None, cache_mb=256,
+                 costs=None, symbols=(None, None)):
+    """Walk-forward optimization of backtest params
+
+    Parameters
+    ----------
+    df : DataFrame
+        Dataframe of prices. Must have columns 'date', 'price_l' and
+        'price_r'.
+
+    grid, defaults : dict
+        The params to search, see `sweep.sweep`.
+
+    train, test, step : int
+        Lengths of the windows in bars, see `make_folds`.
+
+    metric : str
+        The function of the train trades to maximize, a key of
+        `METRICS`.
+
+    max_workers : int
+        Number of worker processes the folds are spread over, defaults
+        to the number of CPUs. With 1, the folds are run in this process.
+
+    cache_mb : float
+        Memory budget of the setup cache of each worker, in megabytes.
+
+    costs : CostModel
+        Trading costs at the rates of `symbols`, taken off the profits
+        of the train windows (which only changes the ranking by
+        'sum_profit_net') and of the out-of-sample positions. Without
+        it, costs are zero.
+
+    symbols : tuple
+        The left and right symbol, see `costs.CostModel.apply`.
+
+    Returns
+    -------
+    df : DataFrame
+        The setup data of the test windows, each with the params chosen
+        for its fold.
+
+    positions : DataFrame
+        The positions of all test windows, as returned by `backtest`.
+
+    stats : dict
+        `describe.create_stats` of the stitched data and positions, with
+        the params chosen on the last fold as `general_params`.
+
+    folds : DataFrame
+        One row per fold with the dates of its windows, the chosen
+        params, their train score and the test results.
+
+    """
+    if metric not in METRICS:
+        raise PairsError(f"Unknown metric '{metric}'.")
+    combos = make_grid(grid, defaults)
+    for params in combos:
+        for k in ['window_std', 'window_corr']:
+            params[k] = int(params[k])
+        for k in ['factor_std', 'factor_profit_std', 'factor_loss_size']:
+            params[k] = float(params[k])
+    df = (df[['date', 'price_l', 'price_r']].sort_values(by=['date'])
+                                            .reset_index(drop=True))
+    folds = make_folds(len(df), train, test, step)
+    symbols = tuple(symbols)
+    args = (df, combos, metric, int(cache_mb*2**20), costs, symbols)
+
+    workers = min(max_workers or os.cpu_count() or 1, len(folds))
+    if workers <= 1:
+        _init_worker(*args)
+        results = [_run_fold(x) for x in folds]
+    else:
+        # consecutive folds go to the same worker, which sets up the
+        # data once for all of them
+        chunksize = -(-len(folds) // workers)
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_init_worker,
+                                 initargs=args) as ex:
+            results = list(ex.map(_run_fold, folds, chunksize=chunksize))
+
+    # stitch the test windows
+    cache = SetupCache(max_bytes=int(cache_mb*2**20))
+    frames, positions, rows = list(), list(), list()
+    for (train_start, test_start, test_end), r in zip(folds, results):
+        d = cache.setup(df, r['params'], engine='incremental')
+        frames.append(d.iloc[test_start:test_end])
+        p = positions_frame(d, r['trades'])
+        if costs is not None:
+            p = costs.apply(p, symbols)
+        positions.append(p)
+        row = {
+            'date_train': df['date'].iat[train_start],
+            'date_test': df['date'].iat[test_start],
+            'date_end': df['date'].iat[test_end - 1],
+        }
+        row.update({f"param_{k}": v for k, v in r['params'].items()})
+        row['score_train'] = r['score_train']
+        row['count_trades_train'] = r['count_trades_train']
+        row['count_trades_test'] = len(p)
+        row['sum_profit_test'] = p['profit'].sum() if len(p) else 0.0
+        row['sum_profit_net_test'] = \
+            p['profit_net'].sum() if 'profit_net' in p else \
+            row['sum_profit_test']
+        rows.append(row)
+
+    df_oos = pd.concat(frames).reset_index(drop=True)
+    positions = pd.concat(positions).reset_index(drop=True)
+    stats = describe.create_stats(df_oos, positions,
+                                  dict(results[-1]['params']))
+
+    return df_oos, positions, stats, pd.DataFrame(rows)
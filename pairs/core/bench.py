@@ -0,0 +1,240 @@
+"""Benchmarks of the backtest pipeline
+
+Every stage of a backtest (`setup`, the position state machine, `model`,
+`is_cointegrated`, `create_stats` and `create_stats_table`) is timed on
+the archived FB/AMZN data and on seeded synthetic cointegrated pairs of
+1k, 100k and 10M bars. For each stage and input the best of a few runs
+and the peak memory traced by `tracemalloc` during one more run are
+recorded, along with the throughput in bars per second.
+
+Reports are plain dicts that are written as JSON, so that the reports
+of two versions can be diffed with `compare`.
+
+"""
+import platform
+import time
+import tracemalloc
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from .analyze.cointegration import is_cointegrated
+from .analyze.model import model
+from .backtest import describe
+from .backtest import kernel
+from .backtest.calculate_inputs import setup
+from .backtest.helpers import load_example, synthetic_pair
+from .backtest.ledger import positions_frame
+from .exc import PairsError
+from .jit import HAVE_NUMBA
+from .options import BENCH_INPUTS as INPUTS, BENCH_STAGES as STAGES
+from .version import get_version
+
+# the lag search of the cointegration test grows superlinearly with the
+# number of bars, stages that run it are skipped on larger inputs
+MAX_BARS = {
+    'is_cointegrated': 100_000,
+    'create_stats': 100_000,
+    'create_stats_table': 100_000,
+}
+
+PARAMS = {
+    'window_std': 10,
+    'window_corr': 10,
+    'factor_std': 1.5,
+    'factor_profit_std': 0.75,
+    'factor_loss_size': 3,
+}
+
+_SUFFIXES = {'k': 10**3, 'm': 10**6}
+
+
+def parse_size(text):
+    """Parse a number of bars like "1000", "100k" or "10M" """
+    text = text.strip()
+    scale = _SUFFIXES.get(text[-1:].lower(), 1)
+    try:
+        return int(float(text[:-1] if scale > 1 else text)*scale)
+    except ValueError:
+        raise PairsError(f"Input '{text}' must be 'fb_amzn' or a size "
+                         "like '100k'.")
+
+
+def load_input(name, seed=0):
+    """Return the prices of a bench input, "fb_amzn" or a size"""
+    if name == 'fb_amzn':
+        return load_example()
+    return synthetic_pair(parse_size(name), seed=seed)
+
+
+def measure(func, repeat=3, min_time=0.2):
+    """Time `func` and trace its peak memory
+
+    `func` is run once under `tracemalloc` and then timed up to `repeat`
+    times, stopping early once the runs took `min_time` seconds in all.
+
+    Returns the best time in seconds and the peak of traced memory in
+    bytes.
+
+    """
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    best = np.inf
+    total = 0.0
+    for _ in range(max(int(repeat), 1)):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        total += elapsed
+        if total >= min_time:
+            break
+
+    return best, peak
+
+
+def run_stages(df, params, stages=STAGES, repeat=3,
+               setup_engine='incremental', log=lambda x: x):
+    """Benchmark the stages of a backtest on the prices `df`
+
+    Returns a list of dicts with the keys 'stage', 'bars', 'seconds',
+    'bars_per_sec' and 'peak_mb'. Stages over more bars than allowed by
+    `MAX_BARS` get a 'skipped' key instead of measurements.
+
+    """
+    unknown = [x for x in stages if x not in STAGES]
+    if unknown:
+        raise PairsError(f"Unknown bench stages {unknown}.")
+    n = len(df)
+    window = int(params['window_std'])
+    cols = ['price_l', 'price_r', 'size_l', 'size_r', 'spread', 'band_upper',
+            'band_lower']
+    exits = ['exit_band_upper', 'exit_band_lower']
+
+    # every stage but setup runs on its output
+    data = setup(df, params, engine=setup_engine)
+    arrays = [data[x].to_numpy(dtype=np.float64) for x in cols]
+    bands = {x: data[x].to_numpy(dtype=np.float64) for x in exits}
+    trades = kernel.run_state_machine(*arrays, window,
+                                      params['factor_profit_std'],
+                                      params['factor_loss_size'], **bands)
+    positions = positions_frame(data, trades)
+    last = data.iloc[-window - 1:]
+    stats = None
+    if 'create_stats_table' in stages and n <= MAX_BARS['create_stats']:
+        stats = describe.create_stats(data, positions, params)
+
+    funcs = {
+        'setup': (n, lambda: setup(df, params, engine=setup_engine)),
+        'backtest': (n, lambda: kernel.run_state_machine(
+            *arrays, window, params['factor_profit_std'],
+            params['factor_loss_size'], **bands)),
+        'model': (len(last), lambda: model(last, last['size_l'].iat[-1],
+                                           last['size_r'].iat[-1])),
+        'is_cointegrated': (n, lambda: is_cointegrated(data)),
+        'create_stats': (n, lambda: describe.create_stats(data, positions,
+                                                          params)),
+        'create_stats_table': (n, lambda: describe.create_stats_table(
+            data, positions, stats)),
+    }
+
+    rows = list()
+    for stage in stages:
+        bars, func = funcs[stage]
+        if n > MAX_BARS.get(stage, n):
+            rows.append({'stage': stage, 'bars': bars,
+                         'skipped': f"more than {MAX_BARS[stage]:,.0f} bars"})
+            continue
+        seconds, peak = measure(func, repeat=repeat)
+        rows.append({
+            'stage': stage,
+            'bars': bars,
+            'seconds': seconds,
+            'bars_per_sec': bars / seconds if seconds else np.inf,
+            'peak_mb': peak / 2**20,
+        })
+        log(f"{stage}: {seconds:.4f}s, {bars / seconds:,.0f} bars/s, "
+            f"{peak / 2**20:,.1f} MB")
+
+    return rows
+
+
+def run(inputs=INPUTS, stages=STAGES, params=None, repeat=3, seed=0,
+        setup_engine='incremental', log=lambda x: x):
+    """Run the benchmarks on every input
+
+    Parameters
+    ----------
+    inputs : list
+        "fb_amzn" for the archived example data, or sizes of synthetic
+        pairs like "100k" (see `parse_size` and
+        `helpers.synthetic_pair`). Inputs are generated one at a time.
+
+    stages : list
+        Names in `STAGES`.
+
+    params : dict
+        The backtest params, defaults to `PARAMS`.
+
+    repeat : int
+        Maximum number of timed runs of each stage, see `measure`.
+
+    seed : int
+        Seed of the synthetic pairs.
+
+    setup_engine : str
+        Passed to `setup` as `engine`.
+
+    Returns
+    -------
+    report : dict
+        The environment ('version', 'python', 'numpy', 'pandas',
+        'numba', 'created'), the 'params' and 'setup_engine' used, and
+        under 'results' one dict per stage and input, see `run_stages`.
+
+    """
+    params = dict(PARAMS if params is None else params)
+    results = list()
+    for name in inputs:
+        df = load_input(name, seed=seed)
+        log(f"benchmarking {name} ({len(df):,.0f} bars)...")
+        for row in run_stages(df, params, stages=stages, repeat=repeat,
+                              setup_engine=setup_engine, log=log):
+            results.append(dict(input=name, **row))
+        del df
+
+    return {
+        'version': get_version(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'numba': HAVE_NUMBA,
+        'created': datetime.now(timezone.utc).isoformat(),
+        'params': params,
+        'setup_engine': setup_engine,
+        'results': results,
+    }
+
+
+def compare(base, new, tolerance=0.25):
+    """Compare the timings of two reports
+
+    Returns a dataframe with one row per stage and input measured in
+    both reports, with the times of both, their ratio (new / base) and
+    'regression', which is True where the new time is more than
+    `tolerance` (a fraction) slower.
+
+    """
+    key = ['stage', 'input']
+    cols = key + ['seconds']
+    a = pd.DataFrame(base['results']).reindex(columns=cols).dropna()
+    b = pd.DataFrame(new['results']).reindex(columns=cols).dropna()
+    tb = a.merge(b, on=key, suffixes=('_base', '_new'))
+    tb['ratio'] = tb['seconds_new'] / tb['seconds_base']
+    tb['regression'] = tb['ratio'] > 1 + tolerance
+
+    return tb
@@ -0,0 +1,21 @@
+"""Optional JIT compilation with numba"""
+
+try:
+    from numba import njit as _njit
+except ImportError:
+    _njit = None
+
+HAVE_NUMBA = _njit is not None
+
+
+def njit(func):
+    """Compile `func` in nopython mode if numba is installed
+
+    numba is an optional dependency. Without it `func` is returned
+    unchanged, so callers should check `HAVE_NUMBA` and prefer a NumPy
+    implementation when the plain Python version would be too slow.
+
+    """
+    if _njit is None:
+        return func
+    return _njit(cache=True)(func)
@@ -0,0 +1,36 @@
+"""Names of params and choices of the CLI
+
+The controllers need these to define their arguments, so they live here,
+away from the modules that use them, which import the scientific stack.
+Importing this module is cheap.
+
+"""
+
+# backtest params searched by sweeps, the params used by `setup` come
+# first, so that they vary slowest in a grid
+PARAM_NAMES = ['window_std', 'window_corr', 'factor_std', 'factor_profit_std',
+               'factor_loss_size']
+
+# methods of hedge ratios and their params
+HEDGES = ['vol', 'rolling_ols', 'kalman']
+HEDGE_PARAMS = ['hedge', 'window_hedge', 'kalman_delta', 'kalman_obs_var']
+
+# optional params of `setup`, which are carried over from the config to
+# every combination of a sweep
+SETUP_PARAMS = HEDGE_PARAMS + ['factor_exit_std']
+
+# allocations of capital to the pairs of a portfolio
+ALLOCATIONS = ['equal', 'fixed']
+
+# share of the dates a symbol of a screen or portfolio needs prices on,
+# see `screen.align`
+MIN_COVERAGE = 0.9
+
+# train metrics params are picked by in walk-forward optimization
+WALK_FORWARD_METRICS = ['sum_profit', 'sum_profit_net', 'profit_mean',
+                        'winrate']
+
+# stages and inputs of the benchmarks
+BENCH_STAGES = ['setup', 'backtest', 'model', 'is_cointegrated',
+                'create_stats', 'create_stats_table']
+BENCH_INPUTS = ['fb_amzn', '1k', '100k', '10M']
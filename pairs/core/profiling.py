@@ -0,0 +1,155 @@
+"""Per-stage profiling of backtest runs
+
+A `Profiler` is passed down to the functions of a run, which wrap their
+stages (data retrieval, `setup`, the trade loop, model calls, the
+cointegration test, stats and table) in `profiler.stage(name)`. It
+accumulates the wall time, CPU time and peak allocations of every stage,
+so that it shows whether time goes to the network, to pandas or to
+statsmodels. Where no profiler is passed, `NULL_PROFILER` is used, whose
+stages cost next to nothing.
+
+"""
+import cProfile
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+
+class Profiler:
+    """Wall time, CPU time and allocations of the stages of a run
+
+    Stages may be nested, e.g. the model calls within the trade loop;
+    the times of a stage include those of the stages within it. A stage
+    entered many times is reported once, with its number of calls and
+    total times.
+
+    Allocations are traced with `tracemalloc`, which slows down code
+    that allocates many small Python objects. The peak of a stage is the
+    most memory allocated during one call of it, above what was
+    allocated when it was entered.
+
+    Parameters
+    ----------
+    log : callable
+        Called by `report` with a message per stage, e.g. the `info`
+        method of the app's logger.
+
+    trace_memory : bool
+        Trace allocations, otherwise 'peak_mb' is not recorded.
+
+    cprofile : str
+        Also run `cProfile` while the profiler is started and dump its
+        stats to this file, for `pstats` or a viewer like snakeviz.
+
+    """
+
+    enabled = True
+
+    def __init__(self, log=None, trace_memory=True, cprofile=None):
+        self.log = log
+        self.trace_memory = trace_memory
+        self.cprofile = cprofile
+        self.stages = dict()
+        self._stack = list()
+        self._profile = None
+        self._tracing = False
+
+    def start(self):
+        """Start tracing allocations and the cProfile profiler"""
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+        if self.cprofile:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        return self
+
+    def stop(self):
+        """Stop tracing and write the cProfile stats"""
+        if self._profile is not None:
+            self._profile.disable()
+            pstats.Stats(self._profile).dump_stats(self.cprofile)
+            self._profile = None
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @contextmanager
+    def stage(self, name):
+        """Measure the code run within the context as stage `name`"""
+        tracing = tracemalloc.is_tracing()
+        frame = {'peak': 0}
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1]['peak'] = max(self._stack[-1]['peak'], peak)
+            tracemalloc.reset_peak()
+            frame['base'] = current
+        self._stack.append(frame)
+        s = self.stages.setdefault(name, {'calls': 0, 'wall': 0.0,
+                                          'cpu': 0.0})
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            self._stack.pop()
+            s['calls'] += 1
+            s['wall'] += wall
+            s['cpu'] += cpu
+            if tracing:
+                peak = max(tracemalloc.get_traced_memory()[1], frame['peak'])
+                if self._stack:
+                    self._stack[-1]['peak'] = max(self._stack[-1]['peak'],
+                                                  peak)
+                s['peak_mb'] = max(s.get('peak_mb', 0.0),
+                                   (peak - frame['base']) / 2**20)
+
+    def totals(self):
+        """Return the totals of every stage, in the order first entered
+
+        A dict mapping stage names to dicts with the keys 'calls',
+        'wall' and 'cpu' (seconds) and, if allocations were traced,
+        'peak_mb'.
+
+        """
+        return {k: dict(v) for k, v in self.stages.items()}
+
+    def report(self):
+        """Log one line with the totals of every stage"""
+        if self.log is None:
+            return
+        for name, s in self.stages.items():
+            msg = (f"profile {name}: {s['calls']:,.0f} calls, wall "
+                   f"{s['wall']:.4f}s, cpu {s['cpu']:.4f}s")
+            if 'peak_mb' in s:
+                msg += f", peak {s['peak_mb']:,.1f} MB"
+            self.log(msg)
+        if self.cprofile:
+            self.log(f"wrote cProfile stats to '{self.cprofile}'.")
+
+
+class _NullProfiler:
+    """A profiler that measures nothing"""
+
+    enabled = False
+
+    _context = nullcontext()
+
+    def stage(self, name):
+        return self._context
+
+    def totals(self):
+        return dict()
+
+
+NULL_PROFILER = _NullProfiler()
@@ -0,0 +1,238 @@
+"""Data providers, pluggable sources of price history
+
+Providers are cement handlers of the 'provider' interface. The app
+resolves the one named by the `provider` setting of the 'pairs' config
+section, handlers read their settings from the section
+'provider.<label>'. Outside of the app they can be used directly, e.g.
+`MemoryProvider(data=prices).get_many(['FB', 'AMZN'], start, end)`.
+
+The module is imported when the app starts, so pandas is only imported
+by the methods that use it.
+
+"""
+import os
+from abc import abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from os.path import join, exists
+from cement import Handler, Interface
+from .exc import PairsError
+
+
+class ProviderInterface(Interface):
+    """Interface of data providers"""
+
+    class Meta:
+        interface = 'provider'
+
+    @abstractmethod
+    def get(self, symbol, start, end, interval='1d'):
+        """Return the bars of `symbol` from `start` up to `end`
+
+        Returns a dataframe with at least the columns 'date' and 'close',
+        sorted by date.
+
+        """
+        pass    # pragma: nocover
+
+    @abstractmethod
+    def get_many(self, symbols, start, end, interval='1d', how='outer'):
+        """Return closing prices of `symbols` as one wide dataframe"""
+        pass    # pragma: nocover
+
+
+class ProviderHandler(ProviderInterface, Handler):
+    """Base data provider, fetches symbols concurrently
+
+    Subclasses implement `get`. `get_many` calls it for every symbol in
+    a thread pool of at most `max_workers` threads, which bounds the
+    number of concurrent requests to the data source.
+
+    """
+
+    class Meta:
+        label = None
+
+        # threads used by `get_many`
+        max_workers = 8
+
+    def __init__(self, max_workers=None, **kw):
+        super().__init__(**kw)
+        self.max_workers = max_workers or self._meta.max_workers
+
+    def _setup(self, app):
+        super()._setup(app)
+        if self._meta.config_defaults is not None:
+            self.max_workers = int(self._config('max_workers'))
+
+    def _config(self, key):
+        return self.app.config.get(self._meta.config_section, key)
+
+    def get_many(self, symbols, start, end, interval='1d', how='outer'):
+        """Return closing prices of `symbols` as one wide dataframe
+
+        Parameters
+        ----------
+        symbols : list
+            Symbols to fetch, each is fetched once.
+
+        start, end : Timestamp
+            Range of the bars, `end` is excluded.
+
+        interval : str
+            Bar interval, e.g. '1d' or '1h'.
+
+        how : str
+            'outer' keeps every date, with NaN where a symbol has no
+            price, 'inner' keeps the dates on which every symbol has a
+            bar.
+
+        Returns
+        -------
+        prices : DataFrame
+            Indexed by date and sorted, one column per symbol in the
+            order of `symbols`.
+
+        """
+        import pandas as pd
+        symbols = list(dict.fromkeys(symbols))
+        workers = max(1, min(self.max_workers, len(symbols)))
+
+        def fetch(symbol):
+            df = self.get(symbol, start, end, interval=interval)
+            return df.set_index('date')['close'].rename(symbol)
+
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            closes = list(ex.map(fetch, symbols))
+        if not closes:
+            return pd.DataFrame()
+        prices = pd.concat(closes, axis=1, join=how)
+
+        return prices[~prices.index.duplicated(keep='last')].sort_index()
+
+
+def _clip(df, start, end):
+    """Rows of `df` from `start` up to `end`, matching the tz of 'date'"""
+    import pandas as pd
+    tz = df['date'].dt.tz
+    bounds = []
+    for x in [pd.Timestamp(start), pd.Timestamp(end)]:
+        if tz is None and x.tz is not None:
+            x = x.tz_localize(None)
+        elif tz is not None and x.tz is None:
+            x = x.tz_localize(tz)
+        bounds.append(x)
+    m = (df['date'] >= bounds[0]) & (df['date'] < bounds[1])
+
+    return df[m].sort_values(by=['date']).reset_index(drop=True)
+
+
+class YahooProvider(ProviderHandler):
+    """Price history from Yahoo Finance
+
+    Downloads go through `cache` (a `PriceCache`) if one is given. In the
+    app the cache is set up from the 'cache' config section.
+
+    """
+
+    class Meta:
+        label = 'yahoo'
+        config_defaults = {'max_workers': 8}
+
+    def __init__(self, cache=None, **kw):
+        super().__init__(**kw)
+        self.cache = cache
+
+    def _setup(self, app):
+        super()._setup(app)
+        from .yahoo_finance_data.cache import PriceCache
+        if PriceCache.enabled(app.config) and self.cache is None:
+            self.cache = PriceCache.from_config(app.config)
+
+    def get(self, symbol, start, end, interval='1d'):
+        if self.cache is not None:
+            return self.cache.get(symbol, start, end, interval=interval)
+        from .yahoo_finance_data.retrieve import download
+        return download(symbol, start, end, interval=interval)
+
+
+class DirectoryProvider(ProviderHandler):
+    """Price history from a directory of CSV or Parquet files
+
+    The bars of a symbol are read from '<symbol>_<interval>.<ext>' or,
+    if there is no such file, from '<symbol>.<ext>', where ext is one
+    of 'parquet', 'pq' or 'csv'. Files must have the columns 'date' and
+    'close'.
+
+    """
+
+    class Meta:
+        label = 'directory'
+        config_defaults = {'max_workers': 4, 'path': None}
+
+    extensions = ['parquet', 'pq', 'csv']
+
+    def __init__(self, path=None, **kw):
+        super().__init__(**kw)
+        self.path = path
+
+    def _setup(self, app):
+        super()._setup(app)
+        if self.path is None:
+            self.path = self._config('path')
+
+    def filepath(self, symbol, interval='1d'):
+        """Return the file of `symbol`, raise PairsError if there is none"""
+        if self.path is None:
+            raise PairsError("No directory set for the 'directory' provider.")
+        for name in [f"{symbol}_{interval}", symbol]:
+            for ext in self.extensions:
+                fp = join(os.path.expanduser(self.path), f"{name}.{ext}")
+                if exists(fp):
+                    return fp
+        raise PairsError(f"No price file for '{symbol}' in '{self.path}'.")
+
+    def get(self, symbol, start, end, interval='1d'):
+        import pandas as pd
+        fp = self.filepath(symbol, interval)
+        if fp.endswith('.csv'):
+            df = pd.read_csv(fp)
+        else:
+            df = pd.read_parquet(fp)
+        df.columns = [str(x).lower() for x in df.columns]
+        date = pd.to_datetime(df['date'])
+        if date.dtype == object:
+            # offsets differ, e.g. across daylight saving time
+            date = pd.to_datetime(df['date'], utc=True)
+        df['date'] = date
+
+        return _clip(df, start, end)
+
+
+class MemoryProvider(ProviderHandler):
+    """Price history held in memory
+
+    `data` is a wide dataframe of closing prices indexed by date with
+    one column per symbol, or a dict mapping symbols to dataframes with
+    columns 'date' and 'close'.
+
+    """
+
+    class Meta:
+        label = 'memory'
+
+    def __init__(self, data=None, **kw):
+        super().__init__(**kw)
+        self.data = {} if data is None else data
+
+    def get(self, symbol, start, end, interval='1d'):
+        import pandas as pd
+        if symbol not in self.data:
+            raise PairsError(f"No data for '{symbol}'.")
+        df = self.data[symbol]
+        if isinstance(df, pd.Series):
+            df = df.dropna().rename('close').rename_axis('date').reset_index()
+
+        return _clip(df, start, end)
+
+
+PROVIDERS = [YahooProvider, DirectoryProvider, MemoryProvider]
@@ -0,0 +1,214 @@
+"""Local on-disk cache of price history"""
+import os
+import pickle
+import threading
+import time
+from os.path import join, exists
+from urllib.parse import quote, unquote
+import pandas as pd
+
+SUFFIX = '.pkl'
+
+
+class PriceCache:
+    """Cache of price history keyed by symbol and interval
+
+    Every symbol/interval pair is stored in one pickle file under `path`
+    together with the date range that was requested from the provider.
+    A request for a range that is already covered is served from disk.
+    Otherwise only the missing bars are fetched: older history before
+    the cached range, and, once the entry is older than `ttl` seconds,
+    the bars after the last cached one (which is fetched again, since it
+    may have been incomplete).
+
+    When the files grow beyond `max_bytes` the least recently used
+    entries are deleted.
+
+    Parameters
+    ----------
+    path : str
+        Directory of the cache files, created if missing.
+
+    ttl : float
+        Seconds after which the newest bars of an entry are refreshed.
+
+    max_bytes : int
+        Size budget of the cache directory.
+
+    fetch : callable
+        Called as `fetch(symbol, date_from, date_to, interval=interval)`
+        and must return a dataframe with a 'date' column.
+        Defaults to `retrieve.download`.
+
+    """
+
+    def __init__(self, path, ttl=12*3600, max_bytes=512*2**20, fetch=None):
+        if fetch is None:
+            from .retrieve import download
+            fetch = download
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.fetch = fetch
+        # entries of different symbols may be fetched from several threads
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def enabled(config):
+        """Whether the cache is enabled in the app `config`"""
+        return str(config.get('cache', 'enabled')).lower() not in \
+            ['false', 'no', '0']
+
+    @classmethod
+    def from_config(cls, config, **kw):
+        """Create a cache from the 'cache' section of the app `config`"""
+        return cls(os.path.expanduser(config.get('cache', 'path')),
+                   ttl=float(config.get('cache', 'ttl_hours'))*3600,
+                   max_bytes=int(float(config.get('cache', 'max_mb'))*2**20),
+                   **kw)
+
+    def filepath(self, symbol, interval):
+        """Return the cache file of `symbol` and `interval`"""
+        return join(self.path, f"{quote(symbol, safe='')}_{interval}{SUFFIX}")
+
+    def load(self, symbol, interval='1d'):
+        """Return the cache entry of `symbol`, or None if there is none
+
+        An entry is a dict with keys 'data' (the dataframe), 'start' and
+        'end' (the covered range) and 'fetched' (time of the last fetch).
+
+        """
+        fp = self.filepath(symbol, interval)
+        if not exists(fp):
+            return None
+        try:
+            with open(fp, 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            # evicted by another thread
+            return None
+
+    def get(self, symbol, date_from, date_to, interval='1d'):
+        """Return the bars of `symbol` from `date_from` up to `date_to`"""
+        entry = self.load(symbol, interval)
+        now = time.time()
+        if entry is None:
+            data = self.fetch(symbol, date_from, date_to, interval=interval)
+            entry = {'data': data, 'start': date_from, 'end': date_to,
+                     'fetched': now}
+            self._save(symbol, interval, entry)
+        else:
+            changed = False
+            data = entry['data']
+            if date_from < entry['start']:
+                head = self.fetch(symbol, date_from, entry['start'],
+                                  interval=interval)
+                data = pd.concat([head, data])
+                entry['start'] = date_from
+                changed = True
+            if date_to > entry['end'] and now - entry['fetched'] > self.ttl:
+                since = data['date'].max() if len(data) else entry['end']
+                tail = self.fetch(symbol, since, date_to, interval=interval)
+                data = pd.concat([data, tail])
+                entry['end'] = date_to
+                entry['fetched'] = now
+                changed = True
+            if changed:
+                entry['data'] = (data.drop_duplicates(subset=['date'],
+                                                      keep='last')
+                                     .sort_values(by=['date'])
+                                     .reset_index(drop=True))
+                self._save(symbol, interval, entry)
+            else:
+                self._touch(symbol, interval)
+
+        data = entry['data']
+        m = (data['date'] >= date_from) & (data['date'] < date_to)
+
+        return data[m].reset_index(drop=True)
+
+    def _save(self, symbol, interval, entry):
+        fp = self.filepath(symbol, interval)
+        with self._lock:
+            with open(fp, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            self.evict(keep=fp)
+
+    def _touch(self, symbol, interval):
+        # the access time orders entries for eviction
+        fp = self.filepath(symbol, interval)
+        try:
+            st = os.stat(fp)
+            os.utime(fp, (time.time(), st.st_mtime))
+        except FileNotFoundError:
+            pass
+
+    def entries(self):
+        """Return a dataframe describing every cache file"""
+        rows = list()
+        for fn in sorted(os.listdir(self.path)):
+            if not fn.endswith(SUFFIX):
+                continue
+            fp = join(self.path, fn)
+            symbol, interval = fn[:-len(SUFFIX)].rsplit('_', 1)
+            try:
+                st = os.stat(fp)
+            except FileNotFoundError:
+                continue
+            rows.append({'symbol': unquote(symbol), 'interval': interval,
+                         'bytes': st.st_size,
+                         'accessed': pd.Timestamp(st.st_atime, unit='s'),
+                         'modified': pd.Timestamp(st.st_mtime, unit='s'),
+                         'filepath': fp})
+
+        return pd.DataFrame(rows, columns=['symbol', 'interval', 'bytes',
+                                           'accessed', 'modified',
+                                           'filepath'])
+
+    def size(self):
+        """Total size of the cache files in bytes"""
+        return int(self.entries()['bytes'].sum())
+
+    def evict(self, keep=None):
+        """Delete least recently used entries until within `max_bytes`
+
+        The file `keep` is never deleted. Returns the number of deleted
+        entries.
+
+        """
+        e = self.entries().sort_values(by=['accessed'])
+        total = e['bytes'].sum()
+        count = 0
+        for fp, size in zip(e['filepath'], e['bytes']):
+            if total <= self.max_bytes:
+                break
+            if fp == keep:
+                continue
+            os.remove(fp)
+            total -= size
+            count += 1
+
+        return count
+
+    def prune(self, max_age):
+        """Delete entries not accessed in `max_age` seconds
+
+        Returns the number of deleted entries.
+
+        """
+        cutoff = pd.Timestamp(time.time() - max_age, unit='s')
+        e = self.entries()
+        old = e[e['accessed'] < cutoff]
+        for fp in old['filepath']:
+            os.remove(fp)
+
+        return len(old)
+
+    def clear(self):
+        """Delete every entry, returns the number of deleted entries"""
+        e = self.entries()
+        for fp in e['filepath']:
+            os.remove(fp)
+
+        return len(e)
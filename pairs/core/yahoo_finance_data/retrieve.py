@@ -1,14 +1,16 @@
 """Use Yahoo Finance to retrieve data data"""
 import pandas as pd
 import yfinance as yf
-import os 
 
 
-def get_data(symbol='AAPL', period='1d', days=365):
+def get_data(symbol='AAPL', period='1d', days=365, interval='1d', cache=None):
     """Retrieve daily data for symbol
 
     days is the number of (calendar) days back from today to retrieve
 
+    If a `cache.PriceCache` is passed as `cache`, the data is taken from
+    it, which only downloads bars that are not cached yet.
+
     docstring of yfinance.Ticker.history
 
     period : str
@@ -39,12 +41,27 @@ def get_data(symbol='AAPL', period='1d', days=365):
         Optional timezone locale for dates.
         (default data is returned as non-localized dates)
     """
-    s = yf.Ticker(symbol)
     date_to = pd.Timestamp.utcnow().tz_convert('US/Central').floor('D')
     date_from = date_to - pd.Timedelta(days=days)
-    fd = lambda x: x.isoformat()[:10]
-    df = s.history(start=date_from, end=date_to, period='max', ).reset_index()
+    if cache is not None:
+        return cache.get(symbol, date_from, date_to, interval=interval)
+
+    return download(symbol, date_from, date_to, interval=interval)
+
+
+def download(symbol, date_from, date_to, interval='1d'):
+    """Download history for symbol from `date_from` up to `date_to`
+
+    Returns a dataframe with lower case columns, e.g. 'date' and
+    'close', sorted by date.
+
+    """
+    s = yf.Ticker(symbol)
+    df = s.history(start=date_from, end=date_to, interval=interval,
+                   period='max').reset_index()
     df.columns = [x.lower().replace(' ', '_') for x in df.columns]
+    # intraday history is indexed by 'datetime'
+    df = df.rename(columns={'datetime': 'date'})
     df['date'] = pd.to_datetime(df['date'])
 
     return df.sort_values(by=['date']).reset_index(drop=True)
@@ -3,23 +3,42 @@ from cement import App, TestApp, init_defaults
 from cement.core.exc import CaughtSignal
 from .core.exc import PairsError
 from .controllers.base import Base
-import os
-from os.path import join, exists
+from .core.providers import ProviderInterface, PROVIDERS
+from os.path import join
 from pathlib import Path
 
 HOME = str(Path.home())
 
-# configuration defaults
+# configuration defaults, the directory is created by the commands that
+# write to it
 cfp = join(HOME, '.config', 'pairs')
-if not exists(cfp):
-    os.mkdir(cfp)
-CONFIG = init_defaults('pairs', 'backtest_daily')
+CONFIG = init_defaults('pairs', 'backtest_daily', 'backtest_intraday', 'cache',
+                       'costs')
 CONFIG['pairs']['config_filepath'] = join(cfp, 'pairs.yml')
+CONFIG['pairs']['provider'] = 'yahoo'
+CONFIG['pairs']['history_days'] = 365*2
+CONFIG['cache']['enabled'] = True
+CONFIG['cache']['path'] = join(cfp, 'cache')
+CONFIG['cache']['ttl_hours'] = 12
+CONFIG['cache']['max_mb'] = 512
 CONFIG['backtest_daily']['window_std'] = 10
 CONFIG['backtest_daily']['window_corr'] = 10
 CONFIG['backtest_daily']['factor_std'] = 1.5
 CONFIG['backtest_daily']['factor_profit_std'] = 0.75
 CONFIG['backtest_daily']['factor_loss_size'] = 3
+CONFIG['backtest_daily']['hedge'] = 'vol'
+CONFIG['backtest_intraday']['window_std'] = 60
+CONFIG['backtest_intraday']['window_corr'] = 60
+CONFIG['backtest_intraday']['factor_std'] = 2
+CONFIG['backtest_intraday']['factor_profit_std'] = 1
+CONFIG['backtest_intraday']['factor_loss_size'] = 3
+CONFIG['backtest_intraday']['hedge'] = 'vol'
+CONFIG['backtest_intraday']['history_days'] = 7
+CONFIG['backtest_intraday']['memory_mb'] = 256
+CONFIG['backtest_intraday']['dtype'] = 'float32'
+CONFIG['costs']['commission'] = 0.0
+CONFIG['costs']['slippage_bps'] = 0.0
+CONFIG['costs']['borrow_bps'] = 0.0
 
 
 class Pairs(App):
@@ -53,10 +72,15 @@ class Pairs(App):
         # set the output handler
         output_handler = 'jinja2'
 
+        # interfaces defined by the app
+        interfaces = [
+            ProviderInterface
+        ]
+
         # register handlers
         handlers = [
             Base
-        ]
+        ] + PROVIDERS
 
 
 class PairsTest(TestApp,Pairs):
@@ -18,9 +18,13 @@ setup(
     author_email='john.doe@example.com',
     url='https://github.com/def-mycroft/pairs',
     license='MIT',
-    packages=find_packages(exclude=['ez_setup', 'tests*']),
-    package_data={'pairs': ['templates/*']},
+    packages=find_packages(exclude=['ez_setup', 'tests*', 'benchmarks*']),
+    package_data={'pairs': ['templates/*', 'core/backtest/data/*/*']},
     include_package_data=True,
+    extras_require={
+        # compiles the backtest state machine
+        'numba': ['numba'],
+    },
     entry_points="""
         [console_scripts]
         pairs = pairs.main:main
@@ -0,0 +1,95 @@
+
+import numpy as np
+import pandas as pd
+from pytest import raises
+from pairs.core.backtest.backtest import _run_reference, backtest
+from pairs.core.exc import PairsError
+
+PARAMS = {
+    'window_std': 10,
+    'window_corr': 10,
+    'factor_std': 1.5,
+    'factor_profit_std': 0.75,
+    'factor_loss_size': 3,
+}
+
+
+def run(engine, params=PARAMS, **kw):
+    return backtest(example=True, params=dict(params), engine=engine, **kw)
+
+
+def test_engines_match():
+    _, ref, _, _ = run('reference', capture_snapshots=True)
+    _, vec, _, _ = run('vectorized', capture_snapshots=True)
+    assert len(ref)
+
+    # row snapshots hold NaNs, which never compare equal inside dicts
+    cols = [x for x in ref.columns if not x.startswith('stats_')]
+    pd.testing.assert_frame_equal(ref[cols], vec[cols])
+    for col in ['stats_entry', 'stats_exit']:
+        assert [x['date'] for x in ref[col]] == [x['date'] for x in vec[col]]
+
+
+def test_engines_match_wide_bands():
+    params = dict(PARAMS, factor_std=2.5, factor_loss_size=1)
+    _, ref, _, _ = run('reference', params)
+    _, vec, _, _ = run('vectorized', params)
+    cols = [x for x in ref.columns if not x.startswith('stats_')]
+    pd.testing.assert_frame_equal(ref[cols], vec[cols])
+
+
+def test_unknown_engine():
+    with raises(PairsError):
+        run('nope')
+
+
+def test_engines_match_monte_carlo():
+    # the Monte Carlo model is seeded, so both engines draw the same samples
+    _, ref, _, _ = run('reference', model_method='mc')
+    _, vec, _, _ = run('vectorized', model_method='mc')
+    cols = [x for x in ref.columns if not x.startswith('stats_')]
+    pd.testing.assert_frame_equal(ref[cols], vec[cols])
+
+
+def test_compiled_engine_matches():
+    _, vec, _, _ = run('vectorized')
+    _, com, stats, _ = run('compiled')
+    assert com.columns.tolist() == vec.columns.tolist()
+    assert stats['count_trades'] == len(com)
+    for col in ['date_entry', 'date_exit', 'side', 'exit_reason']:
+        assert com[col].tolist() == vec[col].tolist()
+    for col in ['target_profit', 'profit', 'min_loss']:
+        np.testing.assert_allclose(com[col], vec[col])
+
+
+def test_exit_bands_default_to_entry_bands():
+    df, _, _, _ = run('vectorized')
+    np.testing.assert_array_equal(df['exit_band_upper'], df['band_upper'])
+    np.testing.assert_array_equal(df['exit_band_lower'], df['band_lower'])
+
+
+def test_reference_does_not_shift(monkeypatch):
+    _, expected, _, _ = run('vectorized')
+
+    def shift(*args, **kw):
+        raise AssertionError('the reference loop shifted the dataframe')
+
+    df, _, _, _ = run('reference')
+    monkeypatch.setattr(pd.DataFrame, 'shift', shift)
+    ledger = _run_reference(df, dict(PARAMS), lambda x: x)
+    assert len(ledger) == len(expected)
+
+
+def test_engines_match_exit_factor():
+    params = dict(PARAMS, factor_exit_std=0.5)
+    _, ref, _, _ = run('reference', params)
+    _, vec, _, _ = run('vectorized', params)
+    _, com, _, _ = run('compiled', params)
+    cols = [x for x in ref.columns if not x.startswith('stats_')]
+    pd.testing.assert_frame_equal(ref[cols], vec[cols])
+    for col in ['date_entry', 'date_exit', 'side', 'exit_reason']:
+        assert com[col].tolist() == vec[col].tolist()
+
+    # narrower exit bands close positions on the band sooner
+    _, default, _, _ = run('vectorized')
+    assert vec['date_exit'].tolist() != default['date_exit'].tolist()
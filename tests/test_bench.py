@@ -0,0 +1,52 @@
+
+from pytest import raises
+from pairs.core import bench
+from pairs.core.backtest.helpers import synthetic_pair
+from pairs.core.exc import PairsError
+
+
+def test_parse_size():
+    assert bench.parse_size('1000') == 1000
+    assert bench.parse_size('100k') == 100_000
+    assert bench.parse_size('10M') == 10_000_000
+    assert bench.parse_size('1.5k') == 1500
+    with raises(PairsError):
+        bench.parse_size('lots')
+
+
+def test_synthetic_pair():
+    a = synthetic_pair(500, seed=1)
+    assert a.equals(synthetic_pair(500, seed=1))
+    assert not a.equals(synthetic_pair(500, seed=2))
+    assert a['date'].is_monotonic_increasing
+    # the spread is stationary around 20
+    spread = a['price_r'] - 0.5*a['price_l']
+    assert abs(spread.mean() - 20) < 2
+
+
+def test_run_and_compare(monkeypatch):
+    report = bench.run(inputs=['fb_amzn', '1k'], repeat=1)
+    assert report['params'] == bench.PARAMS
+    assert len(report['results']) == 2*len(bench.STAGES)
+    row = report['results'][0]
+    assert row['input'] == 'fb_amzn' and row['stage'] == 'setup'
+    assert row['bars'] == 504
+    assert row['peak_mb'] > 0
+
+    # stages that run the cointegration test are skipped on large inputs
+    rows = bench.run_stages(synthetic_pair(1000), bench.PARAMS,
+                            stages=['backtest', 'create_stats'])
+    assert 'seconds' in rows[0]
+    monkeypatch.setitem(bench.MAX_BARS, 'create_stats', 100)
+    rows = bench.run_stages(synthetic_pair(1000), bench.PARAMS,
+                            stages=['create_stats'])
+    assert 'skipped' in rows[0]
+
+    slower = dict(report, results=[dict(x, seconds=2*x['seconds'])
+                                   for x in report['results']])
+    tb = bench.compare(report, slower)
+    assert len(tb) == len(report['results'])
+    assert tb['regression'].all()
+    assert not bench.compare(slower, report)['regression'].any()
+    with raises(PairsError):
+        bench.run_stages(synthetic_pair(100), bench.PARAMS, stages=['nope'])
@@ -0,0 +1,104 @@
+
+import time
+import pandas as pd
+from pairs.core.backtest.helpers import load_example
+from pairs.core.yahoo_finance_data.cache import PriceCache
+from pairs.core.yahoo_finance_data.retrieve import get_data
+from pairs.main import PairsTest
+
+HISTORY = load_example().rename(columns={'price_l': 'close'})[['date', 'close']]
+
+
+class StubProvider:
+    """Serves the example prices and records every request"""
+
+    def __init__(self):
+        self.calls = list()
+
+    def __call__(self, symbol, date_from, date_to, interval='1d'):
+        self.calls.append((symbol, date_from, date_to, interval))
+        m = (HISTORY['date'] >= date_from) & (HISTORY['date'] < date_to)
+        return HISTORY[m].reset_index(drop=True)
+
+
+def ts(x):
+    return pd.Timestamp(x, tz='US/Central')
+
+
+def test_cached_and_topped_up(tmp):
+    fetch = StubProvider()
+    cache = PriceCache(tmp.dir, ttl=3600, fetch=fetch)
+
+    a = cache.get('FB', ts('2019-06-01'), ts('2020-06-01'))
+    b = cache.get('FB', ts('2019-07-01'), ts('2020-06-01'))
+    assert len(fetch.calls) == 1
+    assert b.equals(a[a['date'] >= ts('2019-07-01')].reset_index(drop=True))
+
+    # older history only fetches the missing head
+    c = cache.get('FB', ts('2019-04-01'), ts('2020-06-01'))
+    assert fetch.calls[-1][1:3] == (ts('2019-04-01'), ts('2019-06-01'))
+    assert c['date'].is_monotonic_increasing
+    assert c['date'].min() == HISTORY.loc[HISTORY['date'] >= ts('2019-04-01'),
+                                          'date'].min()
+
+    # newer bars are fetched once the entry is stale, from the last bar on
+    cache.get('FB', ts('2019-04-01'), ts('2020-07-01'))
+    assert len(fetch.calls) == 2
+    cache.ttl = 0
+    d = cache.get('FB', ts('2019-04-01'), ts('2020-07-01'))
+    assert fetch.calls[-1][1] == c['date'].max()
+    assert not d['date'].duplicated().any()
+    expected = HISTORY[(HISTORY['date'] >= ts('2019-04-01'))
+                       & (HISTORY['date'] < ts('2020-07-01'))]
+    assert d['close'].tolist() == expected['close'].tolist()
+
+
+def test_keyed_by_interval(tmp):
+    fetch = StubProvider()
+    cache = PriceCache(tmp.dir, fetch=fetch)
+    cache.get('BRK-B', ts('2019-06-01'), ts('2020-06-01'))
+    cache.get('BRK-B', ts('2019-06-01'), ts('2020-06-01'), interval='1h')
+    assert len(fetch.calls) == 2
+    e = cache.entries()
+    assert sorted(e['interval']) == ['1d', '1h']
+    assert set(e['symbol']) == {'BRK-B'}
+
+
+def test_eviction_and_prune(tmp):
+    fetch = StubProvider()
+    cache = PriceCache(tmp.dir, fetch=fetch)
+    for symbol in ['A', 'B', 'C']:
+        cache.get(symbol, ts('2019-06-01'), ts('2020-06-01'))
+        time.sleep(0.01)
+    size = cache.entries()['bytes'].max()
+
+    # 'A' is used again, so 'B' is the least recently used
+    cache.get('A', ts('2019-06-01'), ts('2020-06-01'))
+    cache.max_bytes = 2*size
+    assert cache.evict() == 1
+    assert sorted(cache.entries()['symbol']) == ['A', 'C']
+
+    assert cache.prune(3600) == 0
+    assert cache.prune(-1) == 2
+    assert len(cache.entries()) == 0
+
+
+def test_get_data_uses_cache(tmp):
+    fetch = StubProvider()
+    cache = PriceCache(tmp.dir, fetch=fetch)
+    get_data('FB', days=365, cache=cache)
+    get_data('FB', days=365, cache=cache)
+    assert len(fetch.calls) == 1
+
+
+def test_cache_command(tmp):
+    PriceCache(tmp.dir, fetch=StubProvider()).get(
+        'FB', ts('2019-06-01'), ts('2020-06-01'))
+    with PairsTest(argv=['cache']) as app:
+        app.config.set('cache', 'path', tmp.dir)
+        app.run()
+        assert app.exit_code == 0
+    with PairsTest(argv=['cache', '--clear']) as app:
+        app.config.set('cache', 'path', tmp.dir)
+        app.run()
+    assert len(PriceCache(tmp.dir).entries()) == 0
@@ -0,0 +1,27 @@
+
+import warnings
+import numpy as np
+from pairs.core.analyze.cointegration import coint_many, coint_pvalue
+
+
+def test_coint_many_matches_coint():
+    rng = np.random.default_rng(1)
+    x = rng.normal(0, 1, (300, 6)).cumsum(axis=0)
+    x[:, 1] = x[:, 0] + rng.normal(0, 1, 300)
+    x[:, 2] = 2*x[:, 3] + rng.normal(0, 3, 300)
+    pairs = [(i, j) for i in range(6) for j in range(6) if i != j]
+
+    result = coint_many(x, pairs, chunk=7)
+    expected = [coint_pvalue(x[:, i], x[:, j]) for i, j in pairs]
+    np.testing.assert_allclose(result, expected, atol=1e-10)
+    assert result[0] < 0.01
+
+
+def test_coint_many_collinear():
+    rng = np.random.default_rng(2)
+    x = rng.normal(0, 1, (200, 1)).cumsum(axis=0)
+    x = np.hstack([x, 3*x + 1])
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        expected = coint_pvalue(x[:, 0], x[:, 1])
+    assert coint_many(x, [(0, 1)])[0] == expected == 0
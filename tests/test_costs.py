@@ -0,0 +1,107 @@
+
+import numpy as np
+import pandas as pd
+from pytest import raises
+from pairs.core.backtest import sweep
+from pairs.core.backtest.backtest import backtest
+from pairs.core.backtest.costs import COST_COLUMNS, CostModel
+from pairs.core.backtest.helpers import load_example
+from pairs.core.exc import PairsError
+from pairs.main import PairsTest
+
+PARAMS = {
+    'window_std': 10,
+    'window_corr': 10,
+    'factor_std': 1.5,
+    'factor_profit_std': 0.75,
+    'factor_loss_size': 3,
+}
+
+
+def positions():
+    return pd.DataFrame({
+        'date_entry': pd.to_datetime(['2020-01-01', '2020-01-01']),
+        'side': ['sell', 'buy'],
+        'price_entry_l': [100.0, 100.0],
+        'price_entry_r': [50.0, 50.0],
+        'size_l': [1.0, 1.0],
+        'size_r': [2.0, 2.0],
+        'date_exit': pd.to_datetime(['2020-01-11', '2021-01-01']),
+        'price_exit_l': [90.0, 110.0],
+        'price_exit_r': [50.0, 60.0],
+        'profit': [10.0, -10.0],
+    })
+
+
+def test_zero_costs():
+    got = CostModel().apply(positions())
+    assert (got['cost'] == 0).all()
+    assert (got['profit_net'] == got['profit']).all()
+
+
+def test_costs():
+    model = CostModel(commission=0.01, slippage_bps=10, borrow_bps=365,
+                      symbols={'B': {'borrow_bps': 730}})
+    got = model.apply(positions(), ('A', 'B'))
+    assert got.columns[-len(COST_COLUMNS):].tolist() == COST_COLUMNS
+    # 1 left and 2 right shares, bought and sold
+    np.testing.assert_allclose(got['cost_commission'], [0.06, 0.06])
+    np.testing.assert_allclose(got['cost_slippage'],
+                               [1e-3*(190 + 200), 1e-3*(210 + 220)])
+    # a sell is short the left asset for 10 days, a buy is short the
+    # right one for 366 days at the higher fee of 'B'
+    np.testing.assert_allclose(got['cost_borrow'],
+                               [0.0365*100*10/365, 0.073*100*366/365])
+    np.testing.assert_allclose(got['profit_net'],
+                               got['profit'] - got['cost'])
+
+    # the default rates apply to symbols without rates of their own
+    got = model.apply(positions(), ('A', 'C'))
+    np.testing.assert_allclose(got['cost_borrow'][1], 0.0365*100*366/365)
+
+
+def test_invalid_rates():
+    with raises(PairsError):
+        CostModel(commission=-1)
+    with raises(PairsError):
+        CostModel(symbols={'A': {'nope': 1}})
+
+
+def test_from_config():
+    with PairsTest() as app:
+        app.config.set('costs', 'commission', 0.005)
+        app.config.add_section('costs.GME')
+        app.config.set('costs.GME', 'borrow_bps', 2500)
+        model = CostModel.from_config(app.config)
+    assert model.rates('XLK') == {'commission': 0.005, 'slippage_bps': 0.0,
+                                  'borrow_bps': 0.0}
+    assert model.rates('GME')['borrow_bps'] == 2500
+    assert model.rates('GME')['commission'] == 0.005
+
+
+def test_backtest_net_of_costs():
+    _, gross, stats, _ = backtest(example=True, params=dict(PARAMS),
+                                  engine='compiled')
+    assert stats['sum_costs'] == 0
+    assert stats['sum_profit_net'] == stats['sum_profit']
+
+    model = CostModel(commission=0.01, slippage_bps=5, borrow_bps=50)
+    _, net, stats, table = backtest(example=True, params=dict(PARAMS),
+                                    engine='compiled', costs=model)
+    pd.testing.assert_frame_equal(net[gross.columns], gross)
+    assert (net['cost'] > 0).all()
+    np.testing.assert_allclose(stats['sum_costs'], net['cost'].sum())
+    np.testing.assert_allclose(stats['sum_profit_net'],
+                               stats['sum_profit'] - stats['sum_costs'])
+    assert 'sum_profit_net' in table
+
+
+def test_sweep_ranks_net_of_costs():
+    grid = {'window_std': [5, 20]}
+    model = CostModel(commission=5)
+    results = sweep.sweep(load_example(), grid, PARAMS, max_workers=1,
+                          costs=model)
+    assert results['sum_profit_net'].is_monotonic_decreasing
+    assert (results['sum_costs'] > 0).all()
+    np.testing.assert_allclose(results['sum_profit_net'],
+                               results['sum_profit'] - results['sum_costs'])
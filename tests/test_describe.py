@@ -0,0 +1,64 @@
+
+import io
+import json
+import pandas as pd
+from pytest import raises
+from pairs.core.backtest import describe
+from pairs.core.backtest.backtest import backtest
+from pairs.core.backtest.helpers import load_example
+from pairs.core.exc import PairsError
+
+PARAMS = {
+    'window_std': 10,
+    'window_corr': 10,
+    'factor_std': 1.5,
+    'factor_profit_std': 0.75,
+    'factor_loss_size': 3,
+}
+
+
+def run(**kw):
+    return backtest(df=load_example(), params=dict(PARAMS, **kw),
+                    engine='compiled')
+
+
+def test_create_stats_table():
+    df, _, stats, table = run()
+    lines = table.splitlines()
+    assert lines[0].split('|')[2].strip() == 'metric'
+    assert len(lines) == 2 + len(describe.METRICS_FORMATTERS)
+    rows = {x.split('|')[2].strip(): x.split('|')[3].strip()
+            for x in lines[2:]}
+    assert rows['count_data_points'] == f"{len(df):,.0f}"
+    assert rows['param_window_std'] == '10'
+    assert rows['sum_profit'] == f"${stats['sum_profit']:,.2f}"
+    assert 'corr_last_10_bars' in rows
+
+
+def test_compare_stats():
+    stats = [run()[2], run(window_corr=20)[2], run(factor_std=50)[2]]
+    labels = ['a', 'b', 'c']
+
+    table = describe.compare_stats(stats, labels=labels)
+    lines = table.splitlines()
+    assert len(lines) == 2 + len(stats)
+    assert 'corr_last_bars' in lines[0]
+    # values are formatted for display
+    assert f"${stats[0]['sum_profit']:,.2f}" in lines[2]
+
+    tb = pd.read_csv(io.StringIO(describe.compare_stats(stats, labels,
+                                                        fmt='csv')))
+    assert tb['label'].tolist() == labels
+    assert tb['param_window_corr'].tolist() == [10, 20, 10]
+    assert tb['count_trades'].iloc[2] == 0
+    assert tb['sum_profit'].iloc[0] == stats[0]['sum_profit']
+
+    records = json.loads(describe.compare_stats(stats, fmt='json'))
+    assert len(records) == 3
+    assert abs(records[1]['corr_last_bars']
+               - stats[1]['corr_last_20_bars']) < 1e-12
+
+    with raises(PairsError):
+        describe.compare_stats(stats, fmt='html')
+    with raises(PairsError):
+        describe.compare_stats(stats, labels=['a'])
@@ -0,0 +1,136 @@
+
+import numpy as np
+import pandas as pd
+from pairs.core.backtest import sweep
+from pairs.core.backtest.backtest import backtest
+from pairs.core.backtest.costs import CostModel
+from pairs.core.backtest.equity import (EquitySummary, bars_per_year,
+                                        mark_to_market, positions_curve)
+from pairs.core.backtest.helpers import load_example, synthetic_pair
+from pairs.core.backtest.intraday import backtest_intraday
+from pairs.core.backtest.ledger import signed_shares
+
+PARAMS = {
+    'window_std': 10,
+    'window_corr': 10,
+    'factor_std': 1.5,
+    'factor_profit_std': 0.75,
+    'factor_loss_size': 3,
+}
+
+
+def naive_curve(df, positions):
+    """Equity of every bar, walking the bars of every position"""
+    equity = np.zeros(len(df))
+    exposure = np.zeros(len(df))
+    dates = df['date'].tolist()
+    pl, pr = df['price_l'].to_numpy(), df['price_r'].to_numpy()
+    shares_l, shares_r = signed_shares(positions)
+    for p, row in enumerate(positions.itertuples()):
+        entry = dates.index(row.date_entry)
+        exit_ = dates.index(row.date_exit)
+        for t in range(entry, len(df)):
+            k = min(t, exit_)
+            equity[t] += shares_l[p]*(pl[k] - row.price_entry_l) \
+                + shares_r[p]*(pr[k] - row.price_entry_r)
+            if t < exit_:
+                exposure[t] += abs(shares_l[p])*pl[t] + abs(shares_r[p])*pr[t]
+    return equity, exposure
+
+
+def test_same_as_naive():
+    df, positions, stats, _ = backtest(example=True, params=dict(PARAMS),
+                                       engine='compiled',
+                                       equity_dtype='float64')
+    curve = positions_curve(df['date'], df['price_l'], df['price_r'],
+                            positions)
+    equity, exposure = naive_curve(df, positions)
+    np.testing.assert_allclose(curve['equity'], equity, atol=1e-9)
+    np.testing.assert_allclose(curve['exposure'], exposure, atol=1e-9)
+    np.testing.assert_array_equal(stats['equity'], curve['equity'])
+    np.testing.assert_allclose(stats['equity'][-1], stats['sum_profit'])
+
+    # metrics of the curve
+    pnl = pd.Series(curve['pnl'])
+    years = (df['date'].iat[-1] - df['date'].iat[0]).total_seconds() \
+        / (365.25*86400)
+    scale = np.sqrt((len(df) - 1) / years)
+    np.testing.assert_allclose(stats['sharpe'], pnl.mean() / pnl.std()*scale)
+    down = np.sqrt((pnl.clip(upper=0)**2).mean())
+    np.testing.assert_allclose(stats['sortino'], pnl.mean() / down*scale)
+    peak = np.maximum.accumulate(np.maximum(equity, 0))
+    np.testing.assert_allclose(stats['max_drawdown'], (equity - peak).min(),
+                               atol=1e-9)
+    assert stats['time_in_market'] == (exposure > 0).mean()
+    np.testing.assert_allclose(stats['exposure_mean'], exposure.mean())
+    np.testing.assert_allclose(stats['exposure_max'], exposure.max())
+
+
+def test_chunks():
+    df, positions, _, _ = backtest(example=True, params=dict(PARAMS),
+                                   engine='compiled')
+    full = positions_curve(df['date'], df['price_l'], df['price_r'],
+                           positions)
+    idx_entry = df['date'].searchsorted(positions['date_entry'])
+    idx_exit = df['date'].searchsorted(positions['date_exit'])
+    shares = signed_shares(positions)
+    summary = EquitySummary()
+    chunks = list()
+    state = None
+    for lo in range(0, len(df), 37):
+        curve, state = mark_to_market(
+            df['price_l'].to_numpy()[lo:lo + 37],
+            df['price_r'].to_numpy()[lo:lo + 37], idx_entry - lo,
+            idx_exit - lo, *shares, state=state)
+        summary.add(curve)
+        chunks.append(curve)
+    for col in full:
+        np.testing.assert_allclose(np.concatenate([x[col] for x in chunks]),
+                                   full[col], atol=1e-9)
+    bpy = bars_per_year(len(df), 1e8)
+    for k, v in EquitySummary().add(full).stats(bpy).items():
+        np.testing.assert_allclose(summary.stats(bpy)[k], v, atol=1e-9)
+
+
+def test_costs_and_float32():
+    model = CostModel(commission=0.01, slippage_bps=5, borrow_bps=50)
+    _, _, stats, _ = backtest(example=True, params=dict(PARAMS),
+                              engine='compiled', costs=model,
+                              equity_dtype='float32')
+    assert stats['equity'].dtype == np.float32
+    np.testing.assert_allclose(stats['equity'][-1], stats['sum_profit_net'],
+                               rtol=1e-5)
+
+
+def test_no_positions():
+    _, positions, stats, _ = backtest(example=True,
+                                      params=dict(PARAMS, factor_std=50))
+    assert not len(positions)
+    assert stats['max_drawdown'] == 0
+    assert stats['time_in_market'] == 0
+    assert np.isnan(stats['sharpe'])
+
+
+def test_intraday():
+    df = synthetic_pair(5000)
+    # chunks of a few hundred bars
+    _, positions, stats, _ = backtest_intraday(df=df, params=PARAMS,
+                                               memory_mb=0.1,
+                                               equity_dtype='float32')
+    assert len(stats['equity']) == len(df)
+    np.testing.assert_allclose(stats['equity'][-1], stats['sum_profit'],
+                               rtol=1e-4)
+    prices = df.astype({'price_l': 'float32', 'price_r': 'float32'})
+    curve = positions_curve(prices['date'], prices['price_l'],
+                            prices['price_r'], positions)
+    np.testing.assert_allclose(stats['equity'], curve['equity'], rtol=1e-5,
+                               atol=1e-3)
+    assert stats['time_in_market'] == (curve['count_open'] > 0).mean()
+
+
+def test_sweep_curves():
+    results = sweep.sweep(load_example(), {'window_std': [5, 10]}, PARAMS,
+                          max_workers=1, equity_dtype='float32')
+    assert all(x.dtype == np.float32 for x in results['equity'])
+    np.testing.assert_allclose([x[-1] for x in results['equity']],
+                               results['sum_profit'], rtol=1e-5)
@@ -0,0 +1,63 @@
+
+import numpy as np
+import pandas as pd
+from pytest import raises
+from pairs.core.backtest import fixtures
+from pairs.core.backtest.helpers import load_example, synthetic_pair
+from pairs.core.exc import PairsError
+
+
+def is_mapped(values):
+    while not isinstance(values, np.memmap) and values.base is not None:
+        values = values.base
+    return isinstance(values, np.memmap)
+
+
+def test_load_example():
+    df = load_example()
+    assert df.columns.tolist() == ['date', 'price_l', 'price_r']
+    assert len(df) == 504
+    assert str(df['date'].dt.tz) == 'US/Central'
+    assert df['date'].iloc[0] == pd.Timestamp('2019-03-14', tz='US/Central')
+    assert df['price_l'].iloc[0] == 170.1699981689453
+    assert df['price_r'].iloc[-1] == 3089.489990234375
+
+    # the prices are mapped from the file, writes do not reach it
+    assert is_mapped(df['price_l'].to_numpy())
+    df.loc[0, 'price_l'] = 0
+    assert load_example()['price_l'].iloc[0] == 170.1699981689453
+
+
+def test_save_and_load(tmp):
+    df = synthetic_pair(100)
+    df['date'] = df['date'].dt.tz_localize('UTC')
+    path = f"{tmp.dir}/pair"
+    fixtures.save_fixture(df, path)
+    loaded = fixtures.load_fixture(path)
+    assert loaded.equals(df)
+    unmapped = fixtures.load_fixture(path, mmap=False)
+    assert unmapped.equals(df)
+    assert not is_mapped(unmapped['price_l'].to_numpy())
+    with raises(PairsError):
+        fixtures.load_fixture('nope')
+
+
+def test_write_synthetic(tmp):
+    path = fixtures.write_synthetic(f"{tmp.dir}/big", 2500, seed=3)
+    df = fixtures.load_fixture(path)
+    assert df.equals(synthetic_pair(2500, seed=3))
+    assert is_mapped(df['price_r'].to_numpy())
+
+    # chunks carry the state of the series over
+    chunked = fixtures.load_fixture(fixtures.write_synthetic(
+        f"{tmp.dir}/chunked", 2500, seed=3, chunk=7))
+    assert chunked['date'].equals(df['date'])
+    assert np.allclose(chunked['price_r'], df['price_r'], rtol=1e-12)
+
+    small = fixtures.load_fixture(fixtures.write_synthetic(
+        f"{tmp.dir}/small", 2500, seed=3, dtype='float32'))
+    assert small['price_r'].dtype == np.float32
+    assert np.allclose(small['price_r'], df['price_r'], rtol=1e-6)
+
+    with raises(PairsError):
+        fixtures.write_synthetic(f"{tmp.dir}/b", 10, freq='B')
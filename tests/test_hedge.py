@@ -0,0 +1,139 @@
+
+import numpy as np
+import pandas as pd
+import pytest
+from pairs.core.backtest import hedge
+from pairs.core.backtest.backtest import backtest
+from pairs.core.backtest.calculate_inputs import setup
+from pairs.core.backtest.helpers import load_example, synthetic_pair
+from pairs.core.backtest.memo import SetupCache
+from pairs.core.backtest.portfolio import portfolio_backtest
+from pairs.core.backtest.stream import PairSignalStream
+from pairs.core.backtest.sweep import make_grid
+from pairs.core.exc import PairsError
+
+PARAMS = {
+    'window_std': 10,
+    'window_corr': 10,
+    'factor_std': 1.5,
+    'factor_profit_std': 0.75,
+    'factor_loss_size': 3,
+}
+
+
+def test_rolling_ols():
+    df = synthetic_pair(3000, seed=2)
+    y, x = df['price_l'], df['price_r']
+    beta = hedge.rolling_ols(y, x, 40)
+    expected = y.rolling(40).cov(x) / x.rolling(40).var()
+    np.testing.assert_allclose(beta, expected, rtol=1e-6)
+    assert np.isnan(beta[:39]).all()
+
+    # a missing price leaves the windows that hold it undefined
+    y = y.to_numpy().copy()
+    y[100] = np.nan
+    beta = hedge.rolling_ols(y, x, 40)
+    assert np.isnan(beta[100:140]).all()
+    assert not np.isnan(beta[[99, 140]]).any()
+
+    # pairs stacked as columns
+    stacked = hedge.rolling_ols(np.column_stack([y, 2*y]),
+                                np.column_stack([x, x]), 40)
+    np.testing.assert_allclose(stacked[:, 0], beta)
+    np.testing.assert_allclose(stacked[:, 1], 2*beta)
+
+    with pytest.raises(PairsError):
+        hedge.rolling_ols(y, x[:10], 40)
+
+
+def test_kalman():
+    rng = np.random.default_rng(0)
+    x = 50 + np.cumsum(rng.normal(0, 1, 2000))
+    y = 2*x + 3 + rng.normal(0, 0.1, 2000)
+    beta = hedge.kalman(y, x, delta=1e-5, obs_var=1e-2)
+    assert beta[0] == 0
+    assert abs(np.median(beta[1000:]) - 2) < 0.01
+
+    # the ratio of a bar is predicted from the bars before it
+    y[1500:] = np.nan
+    beta_nan = hedge.kalman(y, x, delta=1e-5, obs_var=1e-2)
+    np.testing.assert_array_equal(beta_nan[:1501], beta[:1501])
+    assert (beta_nan[1501:] == beta_nan[1500]).all()
+
+    stacked = hedge.kalman(np.column_stack([y, y]), np.column_stack([x, x]),
+                           delta=1e-5, obs_var=1e-2)
+    assert stacked.shape == (2000, 2)
+    np.testing.assert_array_equal(stacked[:, 1], beta_nan)
+
+    with pytest.raises(PairsError):
+        hedge.kalman(y, x, delta=0)
+
+
+
+@pytest.mark.parametrize('method', ['rolling_ols', 'kalman'])
+def test_segments(method):
+    # ratios of consecutive segments with a carried state are those of
+    # the whole series
+    params = dict(PARAMS, hedge=method, window_hedge=20)
+    df = synthetic_pair(3000)
+    y, x = df['price_l'].to_numpy(), df['price_r'].to_numpy()
+    expected = hedge.hedge_ratio(y, x, params)
+    state = dict()
+    bounds = [0, 5, 19, 20, 700, 2999, 3000]
+    beta = np.concatenate([
+        hedge.hedge_ratio(y[a:b], x[a:b], params, state=state)
+        for a, b in zip(bounds[:-1], bounds[1:])])
+    np.testing.assert_allclose(beta, expected, rtol=1e-9)
+
+
+@pytest.mark.parametrize('method', hedge.HEDGES)
+def test_setup_engines(method):
+    params = dict(PARAMS, hedge=method, window_hedge=20)
+    a = setup(load_example(), params, engine='pandas')
+    b = setup(load_example(), params, engine='incremental')
+    for col in ['size_r', 'spread', 'band_upper', 'band_lower']:
+        np.testing.assert_allclose(a[col], b[col], rtol=1e-8, atol=1e-10)
+    expected = hedge.hedge_ratio(a['price_l'], a['price_r'], params)
+    if expected is not None:
+        np.testing.assert_allclose(a['size_r'], expected)
+    np.testing.assert_allclose(a['spread'],
+                               a['price_l'] - a['size_r']*a['price_r'])
+
+
+def test_params():
+    assert hedge.hedge_params(PARAMS)['window_hedge'] == 10
+    with pytest.raises(PairsError):
+        setup(load_example(), dict(PARAMS, hedge='nope'))
+    with pytest.raises(PairsError):
+        PairSignalStream(dict(PARAMS, hedge='kalman'))
+
+    # hedge params are kept by sweeps and in the keys of cached setups
+    combos = make_grid({'window_std': [10, 20]}, dict(PARAMS, hedge='kalman'))
+    assert [x['hedge'] for x in combos] == ['kalman', 'kalman']
+    cache = SetupCache()
+    df = load_example()
+    assert cache.key(df, PARAMS) != cache.key(df, dict(PARAMS,
+                                                       hedge='kalman'))
+    assert cache.key(df, PARAMS) == cache.key(df, dict(PARAMS, hedge='vol'))
+
+
+def test_portfolio_matches_backtest():
+    rng = np.random.default_rng(3)
+    base = 100 + np.cumsum(rng.normal(0, 1, 750))
+    prices = pd.DataFrame({
+        'A': base + rng.normal(0, 1, 750),
+        'B': 0.5*base + 30 + rng.normal(0, 1, 750),
+        'C': 2*base - 50 + rng.normal(0, 2, 750),
+    }, index=pd.date_range('2020-01-01', periods=750, freq='B', name='date'))
+    params = dict(PARAMS, hedge='rolling_ols', window_hedge=30)
+    _, positions, _ = portfolio_backtest(prices, [('A', 'B'), ('C', 'B')],
+                                         params, allocation='fixed')
+    for pair in [('A', 'B'), ('C', 'B')]:
+        df = (prices[list(pair)].set_axis(['price_l', 'price_r'], axis=1)
+                                .reset_index())
+        _, expected, _, _ = backtest(df, params=dict(params),
+                                     engine='compiled',
+                                     setup_engine='incremental')
+        got = positions[positions['pair'] == '/'.join(pair)]
+        assert len(got) == len(expected) > 5
+        np.testing.assert_allclose(got['profit'], expected['profit'])
@@ -0,0 +1,144 @@
+
+import tracemalloc
+import numpy as np
+import pandas as pd
+import pytest
+from pairs.core.backtest import kernel
+from pairs.core.backtest.backtest import backtest
+from pairs.core.backtest.helpers import load_example
+from pairs.core.backtest.intraday import (backtest_intraday, chunk_bars,
+                                          run_chunked, to_columns,
+                                          to_dates)
+from pairs.core.backtest.rolling import rolling_setup
+from pairs.core.exc import PairsError
+from pairs.core.profiling import Profiler
+from pairs.main import PairsTest
+
+PARAMS = {
+    'window_std': 30,
+    'window_corr': 30,
+    'factor_std': 2,
+    'factor_profit_std': 1,
+    'factor_loss_size': 3,
+}
+
+
+def minute_bars(n=200000, seed=1):
+    rng = np.random.default_rng(seed)
+    x = 100 + np.cumsum(rng.normal(0, 0.05, n))
+    y = 50 + 0.5*x + rng.normal(0, 0.2, n)
+    return pd.DataFrame({
+        'date': pd.date_range('2021-01-04 09:30', periods=n, freq='min',
+                              tz='US/Eastern'),
+        'price_l': x, 'price_r': y})
+
+
+def unchunked(price_l, price_r, params=PARAMS):
+    cols = rolling_setup(price_l, price_r, params['window_std'],
+                         params['window_corr'], params['factor_std'])
+    return kernel.run_state_machine(
+        price_l, price_r, np.ones(len(price_l)), cols['size_r'],
+        cols['spread'], cols['band_upper'], cols['band_lower'],
+        params['window_std'], params['factor_profit_std'],
+        params['factor_loss_size'])
+
+
+def test_chunks_match_single_pass():
+    _, price_l, price_r = to_columns(minute_bars(), 'float32')
+    expected = unchunked(price_l, price_r)
+    assert len(expected) > 1000
+    for bars in [500, 4999, 70000]:
+        trades, _ = run_chunked(price_l, price_r, PARAMS, bars=bars)
+        assert len(trades) == len(expected)
+        for field in ['idx_entry', 'idx_exit', 'idx_min_loss', 'side',
+                      'exit_reason']:
+            assert (trades[field] == expected[field]).all()
+        np.testing.assert_allclose(trades['profit'], expected['profit'],
+                                   rtol=1e-9)
+
+
+
+@pytest.mark.parametrize('hedge', ['rolling_ols', 'kalman'])
+def test_chunked_hedge(hedge):
+    # regression ratios are computed chunk by chunk, as over all bars
+    params = dict(PARAMS, hedge=hedge, window_hedge=50)
+    _, price_l, price_r = to_columns(minute_bars(50000), 'float64')
+    expected, _ = run_chunked(price_l, price_r, params)
+    with Profiler() as profiler:
+        trades, _ = run_chunked(price_l, price_r, params, bars=3000,
+                                profiler=profiler)
+    assert len(trades) == len(expected)
+    for field in ['idx_entry', 'idx_exit', 'side', 'exit_reason']:
+        assert (trades[field] == expected[field]).all()
+    np.testing.assert_allclose(trades['size_r'], expected['size_r'],
+                               rtol=1e-9)
+    totals = profiler.totals()
+    assert totals['hedge']['calls'] == totals['setup']['calls'] > 1
+
+
+def test_long_positions_span_chunks():
+    # short windows allow chunks of 4*17 bars, which positions outlast
+    params = dict(PARAMS, window_std=5, window_corr=5, factor_loss_size=50,
+                  factor_profit_std=20)
+    _, price_l, price_r = to_columns(minute_bars(50000), 'float64')
+    expected = unchunked(price_l, price_r, params)
+    trades, _ = run_chunked(price_l, price_r, params, bars=1)
+    assert (expected['idx_exit'] - expected['idx_entry'] > 4*17).any()
+    assert (trades['idx_entry'] == expected['idx_entry']).all()
+    assert (trades['idx_exit'] == expected['idx_exit']).all()
+
+
+def test_matches_daily_backtest():
+    params = dict(PARAMS, window_std=10, window_corr=10, factor_std=1.5,
+                  factor_profit_std=0.75)
+    _, daily, _, _ = backtest(load_example(), params=dict(params),
+                              engine='compiled', setup_engine='incremental')
+    _, positions, stats, table = backtest_intraday(
+        load_example(), params=params, dtype='float64', memory_mb=0)
+    assert stats['count_data_points'] == len(load_example())
+    for col in ['side', 'exit_reason']:
+        assert positions[col].tolist() == daily[col].tolist()
+    np.testing.assert_allclose(positions['profit'], daily['profit'])
+    assert (positions['date_exit'] == daily['date_exit']).all()
+    assert 'stats_entry' not in positions.columns
+    # the dates keep the timezone of the data
+    assert positions['date_entry'].dt.tz == daily['date_entry'].dt.tz
+    assert stats['date_max'] == load_example()['date'].max()
+
+
+@pytest.mark.parametrize('hedge', ['vol', 'rolling_ols', 'kalman'])
+def test_memory_budget(hedge):
+    params = dict(PARAMS, hedge=hedge)
+    _, price_l, price_r = to_columns(minute_bars(), 'float32')
+    bars = chunk_bars(4, params)
+    run_chunked(price_l[:bars], price_r[:bars], params, bars=bars)
+
+    tracemalloc.start()
+    try:
+        trades, _ = run_chunked(price_l, price_r, params, bars=bars)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert bars < len(price_l) // 10
+    # the budget covers the working memory, the trades are the output
+    assert peak < 4*2**20 + 2*trades.nbytes
+
+
+def test_columns():
+    df = minute_bars(1000).sample(frac=1, random_state=0)
+    dates, price_l, price_r = to_columns(df)
+    assert dates.dtype == np.int64 and (np.diff(dates) > 0).all()
+    assert price_l.dtype == np.float32 and price_r.dtype == np.float32
+    with pytest.raises(PairsError):
+        to_columns(df, dtype='float16')
+    assert (to_dates(dates, df['date'].dt.tz)
+            == df['date'].sort_values()).all()
+    naive = df['date'].dt.tz_localize(None)
+    assert (to_dates(to_columns(df.assign(date=naive))[0])
+            == naive.sort_values()).all()
+
+
+def test_interval_option():
+    with PairsTest(argv=['analyze-pair', '--interval', '1m']) as app:
+        with pytest.raises(PairsError):
+            app.run()
@@ -0,0 +1,55 @@
+
+import numpy as np
+from pairs.core.backtest import kernel
+from pairs.core.backtest.calculate_inputs import setup
+from pairs.core.backtest.helpers import load_example
+
+PARAMS = {
+    'window_std': 10,
+    'window_corr': 10,
+    'factor_std': 1.5,
+    'factor_profit_std': 0.75,
+    'factor_loss_size': 3,
+}
+
+
+def arrays(params=PARAMS):
+    df = setup(load_example(), params)
+    cols = ['price_l', 'price_r', 'size_l', 'size_r', 'spread', 'band_upper',
+            'band_lower']
+    return df, [df[x].to_numpy(dtype=float) for x in cols]
+
+
+def test_loop_matches_numpy():
+    _, a = arrays()
+    args = a + [PARAMS['window_std'], PARAMS['factor_profit_std'],
+                PARAMS['factor_loss_size']]
+    loop = kernel.run_state_machine(*args, compiled=True)
+    vec = kernel.run_state_machine(*args, compiled=False)
+    assert loop.dtype == kernel.TRADE_DTYPE
+    assert len(loop) > 10
+    for field in kernel.TRADE_DTYPE.names:
+        np.testing.assert_allclose(loop[field], vec[field], rtol=1e-12)
+
+
+def test_trades_follow_signals():
+    df, a = arrays()
+    args = a + [PARAMS['window_std'], PARAMS['factor_profit_std'],
+                PARAMS['factor_loss_size']]
+    trades = kernel.run_state_machine(*args)
+    sells = trades['side'] == kernel.SIDE_SELL
+    assert df['signal_sell'].to_numpy()[trades['idx_entry'][sells]].all()
+    assert df['signal_buy'].to_numpy()[trades['idx_entry'][~sells]].all()
+    # positions do not overlap
+    assert (trades['idx_entry'][1:] > trades['idx_exit'][:-1]).all()
+    np.testing.assert_allclose(trades['target_loss'],
+                               -PARAMS['factor_loss_size']*trades['target_profit'])
+
+
+def test_spread_std():
+    _, (price_l, price_r, *_) = arrays()
+    x = np.vstack([price_l[20:31], 0.5*price_r[20:31]])
+    c = np.cov(x)
+    expected = np.sqrt(c[0, 0] + c[1, 1] - 2*c[0, 1])
+    assert np.isclose(kernel.spread_std(price_l, price_r, 1.0, 0.5, 20, 31),
+                      expected)
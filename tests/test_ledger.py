@@ -0,0 +1,56 @@
+
+import pickle
+import numpy as np
+from pairs.core.backtest import kernel
+from pairs.core.backtest.backtest import backtest
+from pairs.core.backtest.ledger import TradeLedger, positions_frame
+
+PARAMS = {
+    'window_std': 10,
+    'window_corr': 10,
+    'factor_std': 1.5,
+    'factor_profit_std': 0.75,
+    'factor_loss_size': 3,
+}
+
+
+def trade(i):
+    return {k: i for k in kernel.TRADE_DTYPE.names}
+
+
+def test_ledger_grows():
+    ledger = TradeLedger(capacity=2)
+    for i in range(100):
+        ledger.append(**trade(i))
+    assert len(ledger) == 100
+    assert ledger.nbytes == 128*kernel.TRADE_DTYPE.itemsize
+    assert (ledger.trades['idx_entry'] == np.arange(100)).all()
+    assert (ledger.trades['profit'] == np.arange(100)).all()
+
+    ledger.extend(ledger.trades.copy())
+    assert len(ledger) == 200
+    assert (ledger.trades['idx_exit'][100:] == np.arange(100)).all()
+    assert not hasattr(ledger, '__dict__')
+
+
+def test_positions_snapshots():
+    df, positions, _, _ = backtest(example=True, params=dict(PARAMS),
+                                   engine='compiled')
+    assert len(positions)
+    assert not any(x.startswith('stats_') for x in positions.columns)
+
+    _, snapped, _, _ = backtest(example=True, params=dict(PARAMS),
+                                engine='compiled', capture_snapshots=True)
+    assert snapped.drop(columns=['stats_entry', 'stats_exit']) \
+        .equals(positions)
+    assert [x['date'] for x in snapped['stats_entry']] \
+        == positions['date_entry'].tolist()
+
+    # trade records pickle much smaller than positions with snapshots
+    trades = kernel.run_state_machine(
+        *[df[x].to_numpy() for x in ['price_l', 'price_r', 'size_l',
+                                     'size_r', 'spread', 'band_upper',
+                                     'band_lower']],
+        10, 0.75, 3)
+    assert positions_frame(df, trades).equals(positions)
+    assert 4*len(pickle.dumps(trades)) < len(pickle.dumps(snapped))
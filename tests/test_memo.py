@@ -0,0 +1,72 @@
+
+from pairs.core.backtest.backtest import backtest
+from pairs.core.backtest.calculate_inputs import setup
+from pairs.core.backtest.helpers import load_example
+from pairs.core.backtest.memo import SetupCache, fingerprint
+
+PARAMS = {
+    'window_std': 10,
+    'window_corr': 10,
+    'factor_std': 1.5,
+    'factor_profit_std': 0.75,
+    'factor_loss_size': 3,
+}
+
+
+def test_fingerprint():
+    df = load_example()
+    assert fingerprint(df) == fingerprint(load_example())
+    df.loc[10, 'price_l'] += 0.01
+    assert fingerprint(df) != fingerprint(load_example())
+
+
+def test_hits_and_misses():
+    df = load_example()
+    cache = SetupCache()
+    a = cache.setup(df, PARAMS)
+    # thresholds of the trade loop do not matter
+    b = cache.setup(df, dict(PARAMS, factor_profit_std=2, factor_loss_size=1))
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert a.equals(b)
+    assert a.equals(setup(df, PARAMS))
+
+    # callers get copies, the cached result keeps its columns
+    b['extra'] = 1.0
+    a.drop(columns=['spread'], inplace=True)
+    assert cache.setup(df, PARAMS).equals(setup(df, PARAMS))
+    assert (cache.hits, cache.misses) == (2, 1)
+
+    cache.setup(df, dict(PARAMS, window_std=20))
+    cache.setup(df, PARAMS, engine='incremental')
+    assert (cache.hits, cache.misses) == (2, 3)
+    assert len(cache) == 3
+    # the exit bands are part of the setup
+    cache.setup(df, dict(PARAMS, factor_exit_std=0.5))
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_eviction():
+    df = load_example()
+    size = SetupCache().setup(df, PARAMS).memory_usage().sum()
+    cache = SetupCache(max_bytes=2.5*size)
+    for w in [5, 10, 15]:
+        cache.setup(df, dict(PARAMS, window_std=w))
+    assert len(cache) == 2
+    assert cache.nbytes <= cache.max_bytes
+
+    # the least recently used result was evicted
+    cache.setup(df, dict(PARAMS, window_std=15))
+    assert cache.hits == 1
+    cache.setup(df, dict(PARAMS, window_std=5))
+    assert cache.misses == 4
+
+
+def test_backtest_with_cache():
+    cache = SetupCache()
+    df = load_example()
+    _, expected, _, _ = backtest(df=df, params=dict(PARAMS))
+    for _ in range(2):
+        _, positions, _, _ = backtest(df=df, params=dict(PARAMS),
+                                      setup_cache=cache)
+        assert positions['profit'].equals(expected['profit'])
+    assert (cache.hits, cache.misses) == (1, 1)
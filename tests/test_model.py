@@ -0,0 +1,34 @@
+
+import numpy as np
+from pytest import raises
+from pairs.core.analyze.model import model
+from pairs.core.backtest.helpers import load_example
+from pairs.core.exc import PairsError
+
+
+def window():
+    return load_example().iloc[100:111]
+
+
+def test_analytic_matches_monte_carlo():
+    sl = window()
+    a = model(sl, 1, 0.12)
+    mc = model(sl, 1, 0.12, N=200000, method='mc')
+    assert list(a.keys()) == list(mc.keys())
+    assert np.isclose(a['mean'], mc['mean'], atol=0.02)
+    assert np.isclose(a['std'], mc['std'], rtol=0.01)
+    for k in ['1%', '25%', '50%', '75%', '99%']:
+        assert np.isclose(a[k], mc[k], atol=0.05)
+    assert a['min'] < a['1%'] < a['99%'] < a['max']
+
+
+def test_monte_carlo_is_seeded():
+    sl = window()
+    assert model(sl, 1, 0.12, method='mc') == model(sl, 1, 0.12, method='mc')
+    assert model(sl, 1, 0.12, method='mc', seed=1) \
+        != model(sl, 1, 0.12, method='mc', seed=2)
+
+
+def test_unknown_method():
+    with raises(PairsError):
+        model(window(), 1, 0.12, method='nope')
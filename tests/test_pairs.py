@@ -1,7 +1,49 @@
 
+import json
+import subprocess
+import sys
+import pandas as pd
 from pytest import raises
+from pairs.core import bench
+from pairs.core import options
+from pairs.core.backtest import walkforward as wf
+from pairs.core.backtest.helpers import load_example
+from pairs.core.exc import PairsError
+from pairs.core.providers import MemoryProvider
 from pairs.main import PairsTest
 
+
+class RecordingProvider(MemoryProvider):
+    """The example prices, recording the arguments of every request"""
+
+    class Meta:
+        label = 'memory'
+
+    calls = list()
+
+    def __init__(self, **kw):
+        df = load_example().set_index('date')
+        super().__init__(data={'FB': df['price_l'], 'AMZN': df['price_r']},
+                         **kw)
+
+    def get(self, symbol, start, end, interval='1d'):
+        self.calls.append({'start': pd.Timestamp(start),
+                           'end': pd.Timestamp(end), 'interval': interval})
+        return super().get(symbol, pd.Timestamp(0, tz='UTC'), end, interval)
+
+
+def analyze_pair(*args, days=None):
+    RecordingProvider.calls = list()
+    argv = ['analyze-pair', '--symbols', 'FB,AMZN', *args]
+    with PairsTest(argv=argv) as app:
+        app.config.set('pairs', 'provider', 'memory')
+        if days is not None:
+            app.config.set('pairs', 'history_days', days)
+        app.handler.register(RecordingProvider, force=True)
+        app.run()
+        assert app.exit_code == 0
+    return RecordingProvider.calls
+
 def test_pairs():
     # test pairs without any subcommands or arguments
     with PairsTest() as app:
@@ -17,20 +59,54 @@ def test_pairs_debug():
         assert app.debug is True
 
 
-def test_command1():
-    # test command1 without arguments
-    argv = ['command1']
+def test_startup_imports():
+    # the version and help of the app do not import the scientific stack
+    code = ("import sys; from pairs.main import main; sys.argv = ['pairs', "
+            "'--version']\ntry:\n    main()\nexcept SystemExit:\n    pass\n"
+            "print(','.join(x for x in ['pandas', 'statsmodels', 'yfinance', "
+            "'tabulate'] if x in sys.modules))")
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True,
+                         text=True, check=True).stdout
+    assert 'A CLI for evaluating pairs trades' in out
+    assert out.splitlines()[-1] == ''
+
+
+def test_options():
+    # the choices of the CLI match the modules that implement them
+    assert options.WALK_FORWARD_METRICS == list(wf.METRICS)
+
+
+def test_bench(tmp):
+    # benchmark a small synthetic pair and compare with the results
+    fp = f"{tmp.dir}/bench.json"
+    argv = ['bench', '-i', '2k', '-r', '1', '-o', fp]
     with PairsTest(argv=argv) as app:
         app.run()
-        data,output = app.last_rendered
-        assert data['foo'] == 'bar'
-        assert output.find('Foo => bar')
-
+        assert app.exit_code == 0
+    with open(fp) as f:
+        report = json.load(f)
+    assert [x['stage'] for x in report['results']] == bench.STAGES
+    assert all(x['bars_per_sec'] > 0 for x in report['results'])
 
-    # test command1 with arguments
-    argv = ['command1', '--foo', 'not-bar']
+    argv = ['bench', '-i', '2k', '--stages', 'backtest', '-c', fp,
+            '--tolerance', '1e6']
     with PairsTest(argv=argv) as app:
         app.run()
-        data,output = app.last_rendered
-        assert data['foo'] == 'not-bar'
-        assert output.find('Foo => not-bar')
+        assert app.exit_code == 0
+
+
+def test_analyze_pair_history_days():
+    calls = analyze_pair(days=100)
+    assert len(calls) == 2
+    assert all((x['end'] - x['start']).days == 100 for x in calls)
+
+
+def test_analyze_pair_weekly():
+    calls = analyze_pair('--interval', '1wk')
+    assert [x['interval'] for x in calls] == ['1wk', '1wk']
+    assert [x['interval'] for x in analyze_pair()] == ['1d', '1d']
+
+    # the archived example only has daily bars
+    with PairsTest(argv=['analyze-pair', '--interval', '1wk']) as app:
+        with raises(PairsError):
+            app.run()
@@ -0,0 +1,128 @@
+
+import numpy as np
+import pandas as pd
+import pytest
+from pairs.core.backtest.backtest import backtest
+from pairs.core.backtest.portfolio import (allocation_weights, parse_pairs,
+                                           portfolio_backtest)
+from pairs.core.exc import PairsError
+from pairs.core.providers import MemoryProvider
+from pairs.main import PairsTest
+
+PARAMS = {
+    'window_std': 10,
+    'window_corr': 10,
+    'factor_std': 1.5,
+    'factor_profit_std': 0.75,
+    'factor_loss_size': 3,
+}
+
+PAIRS = [('A', 'B'), ('A', 'C'), ('D', 'B')]
+
+
+def panel(n=750, seed=3):
+    rng = np.random.default_rng(seed)
+    base = 100 + np.cumsum(rng.normal(0, 1, n))
+    prices = pd.DataFrame({
+        'A': base + rng.normal(0, 1, n),
+        'B': 0.5*base + 30 + rng.normal(0, 1, n),
+        'C': 2*base - 50 + rng.normal(0, 2, n),
+        'D': 80 + np.cumsum(rng.normal(0, 1, n)),
+    }, index=pd.date_range('2020-01-01', periods=n, freq='B', name='date'))
+    # a missing price drops the date for every pair
+    prices.iloc[5, 3] = np.nan
+    return prices
+
+
+def test_fixed_matches_backtest():
+    prices = panel()
+    equity, positions, summary = portfolio_backtest(prices, PAIRS, PARAMS,
+                                                    allocation='fixed',
+                                                    capital=0)
+    aligned = prices.dropna()
+    for pair in PAIRS:
+        df = (aligned[list(pair)].set_axis(['price_l', 'price_r'], axis=1)
+                                 .reset_index())
+        _, expected, _, _ = backtest(df, params=dict(PARAMS),
+                                     engine='compiled',
+                                     setup_engine='incremental')
+        got = positions[positions['pair'] == '/'.join(pair)]
+        assert len(got) == len(expected) > 5
+        for col in ['date_entry', 'date_exit', 'side', 'exit_reason']:
+            assert got[col].tolist() == expected[col].tolist()
+        np.testing.assert_allclose(got['profit'], expected['profit'])
+        assert (got['units'] == 1).all()
+
+    # contributions are marked to market and end at the realized profit
+    # of the closed positions plus the profit of open ones
+    assert len(equity) == len(aligned)
+    np.testing.assert_allclose(equity['equity'],
+                               equity[['A/B', 'A/C', 'D/B']].sum(axis=1))
+    closed = positions.groupby('pair')['pnl'].sum()
+    for label, value in summary.set_index('pair')['contribution'].items():
+        last_exit = positions.loc[positions['pair'] == label,
+                                  'date_exit'].max()
+        np.testing.assert_allclose(equity.loc[last_exit, label],
+                                   closed[label])
+
+
+def test_equal_allocation():
+    capital = 1e5
+    equity, positions, summary = portfolio_backtest(panel(), PAIRS, PARAMS,
+                                                    capital=capital)
+    assert equity['equity'].iloc[0] == capital
+    gross = positions['units']*(positions['price_entry_l']
+                                + positions['size_r'].abs()
+                                * positions['price_entry_r'])
+    np.testing.assert_allclose(gross, capital/len(PAIRS))
+    np.testing.assert_allclose(summary['sum_profit'].sum(),
+                               positions['pnl'].sum())
+
+
+
+def test_short_history():
+    prices = panel()
+    prices.iloc[:400, 2] = np.nan
+    with pytest.raises(PairsError, match='C'):
+        portfolio_backtest(prices, PAIRS, PARAMS)
+    equity, _, _ = portfolio_backtest(prices, PAIRS, PARAMS, min_coverage=0)
+    assert equity.index[0] == prices.index[400]
+
+
+def test_allocation_weights():
+    w = allocation_weights(PAIRS, {'A/B': 2, ('A', 'C'): 1, 'D/B': 1})
+    np.testing.assert_allclose(w, [0.5, 0.25, 0.25])
+    with pytest.raises(PairsError):
+        allocation_weights(PAIRS, {'A/B': 1})
+    with pytest.raises(PairsError):
+        allocation_weights(PAIRS, 'kelly')
+    assert parse_pairs('FB/AMZN, BRK-B/JPM') == [('FB', 'AMZN'),
+                                                 ('BRK-B', 'JPM')]
+    with pytest.raises(PairsError):
+        portfolio_backtest(panel(), [('A', 'Z')], PARAMS)
+
+
+class StaticProvider(MemoryProvider):
+    """Memory provider serving the class attribute `data`"""
+
+    data = None
+
+    def __init__(self, **kw):
+        super().__init__(data=self.data, **kw)
+
+
+def test_portfolio_command(tmp):
+    prices = panel()
+    data = {s: prices[s].rename_axis('date') for s in prices.columns}
+    fp = f"{tmp.dir}/equity.csv"
+    argv = ['portfolio', '--pairs', 'A/B,A/C', '--capital', '1000',
+            '-o', fp]
+    with PairsTest(argv=argv) as app:
+        app.config.set('pairs', 'provider', 'memory')
+        app.config.set('pairs', 'history_days', 365*100)
+        app.handler.register(StaticProvider, force=True)
+        StaticProvider.data = data
+        app.run()
+    equity = pd.read_csv(fp)
+    assert list(equity.columns) == ['date', 'equity', 'A/B', 'A/C']
+    assert equity['equity'].iloc[0] == 1000
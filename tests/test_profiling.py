@@ -0,0 +1,80 @@
+
+import os
+import pstats
+import numpy as np
+from pairs.core.backtest.backtest import backtest
+from pairs.core.backtest.helpers import synthetic_pair
+from pairs.core.backtest.intraday import backtest_intraday
+from pairs.core.profiling import Profiler
+from pairs.main import PairsTest
+
+PARAMS = {
+    'window_std': 10,
+    'window_corr': 10,
+    'factor_std': 1.5,
+    'factor_profit_std': 0.75,
+    'factor_loss_size': 3,
+}
+
+
+def test_profiler_stages():
+    with Profiler() as prof:
+        with prof.stage('outer'):
+            for _ in range(3):
+                with prof.stage('inner'):
+                    x = np.ones(2**20)
+                    del x
+    totals = prof.totals()
+    assert list(totals) == ['outer', 'inner']
+    assert totals['inner']['calls'] == 3
+    assert totals['outer']['wall'] >= totals['inner']['wall']
+    # 8 MB are allocated in every call of the inner stage
+    assert 7.9 < totals['inner']['peak_mb'] < 9
+    assert 7.9 < totals['outer']['peak_mb'] < 9
+
+
+def test_backtest_profile():
+    _, _, stats, _ = backtest(example=True, params=dict(PARAMS))
+    assert 'profile' not in stats
+
+    messages = list()
+    with Profiler(log=messages.append) as prof:
+        _, positions, stats, _ = backtest(example=True, params=dict(PARAMS),
+                                          profiler=prof)
+    prof.report()
+    profile = stats['profile']
+    assert list(profile) == ['fetch', 'setup', 'loop', 'model', 'positions',
+                             'stats', 'cointegration', 'table']
+    # one model call per entry, the last position may still be open
+    assert profile['model']['calls'] - len(positions) in [0, 1]
+    assert all(x['wall'] > 0 and x['cpu'] >= 0 for x in profile.values())
+    assert len(messages) == len(profile)
+
+
+def test_backtest_log():
+    messages = list()
+    backtest(example=True, params=dict(PARAMS), log=messages.append)
+    assert not messages
+    backtest(example=True, params=dict(PARAMS), verbose=True,
+             log=messages.append)
+    assert messages[0] == 'setting up dataframe, using example data...'
+    assert any(x.startswith('position initiated') for x in messages)
+
+
+def test_intraday_profile():
+    df = synthetic_pair(5000)
+    with Profiler() as prof:
+        _, _, stats, _ = backtest_intraday(df=df, params=PARAMS,
+                                           memory_mb=0.1, profiler=prof)
+    profile = stats['profile']
+    assert profile['setup']['calls'] == profile['loop']['calls'] > 1
+    assert 'cointegration' in profile
+
+
+def test_profile_command(tmp):
+    fp = os.path.join(tmp.dir, 'backtest.prof')
+    argv = ['analyze-pair', '--profile', '--profile-output', fp]
+    with PairsTest(argv=argv) as app:
+        app.run()
+        assert app.exit_code == 0
+    assert pstats.Stats(fp).total_calls > 0
@@ -0,0 +1,121 @@
+
+import threading
+import time
+from os.path import join
+import numpy as np
+import pandas as pd
+import pytest
+from pairs.core.backtest.get_data import get_pair
+from pairs.core.backtest.helpers import load_example
+from pairs.core.exc import PairsError
+from pairs.core.providers import (DirectoryProvider, MemoryProvider,
+                                  ProviderHandler)
+from pairs.main import PairsTest
+
+EXAMPLE = load_example()
+PRICES = pd.DataFrame({'FB': EXAMPLE.set_index('date')['price_l'],
+                       'AMZN': EXAMPLE.set_index('date')['price_r']})
+START = pd.Timestamp('2019-06-01', tz='US/Central')
+END = pd.Timestamp('2020-06-01', tz='US/Central')
+
+
+def test_memory_get_many():
+    provider = MemoryProvider(data=PRICES)
+    prices = provider.get_many(['AMZN', 'FB', 'AMZN'], START, END)
+    assert list(prices.columns) == ['AMZN', 'FB']
+    expected = PRICES[(PRICES.index >= START) & (PRICES.index < END)]
+    pd.testing.assert_frame_equal(prices, expected[['AMZN', 'FB']],
+                                  check_names=False, check_freq=False)
+    with pytest.raises(PairsError):
+        provider.get_many(['FB', 'XYZ'], START, END)
+
+
+def test_alignment():
+    data = {'A': PRICES['FB'].iloc[:100], 'B': PRICES['AMZN'].iloc[50:150]}
+    provider = MemoryProvider(data=data)
+    start, end = PRICES.index[0], PRICES.index[-1]
+    outer = provider.get_many(['A', 'B'], start, end, how='outer')
+    inner = provider.get_many(['A', 'B'], start, end, how='inner')
+    assert len(outer) == 150 and outer.index.is_monotonic_increasing
+    assert outer['A'].isna().sum() == 50 and outer['B'].isna().sum() == 50
+    assert len(inner) == 50 and inner.notna().all().all()
+
+
+def test_directory(tmp):
+    df = EXAMPLE[['date', 'price_l', 'price_r']].copy()
+    df['date'] = df['date'].dt.tz_localize(None)
+    df.rename(columns={'price_l': 'close'})[['date', 'close']].to_csv(
+        join(tmp.dir, 'FB.csv'), index=False)
+    df.rename(columns={'price_r': 'close'})[['date', 'close']].to_csv(
+        join(tmp.dir, 'AMZN_1d.csv'), index=False)
+
+    provider = DirectoryProvider(path=tmp.dir)
+    prices = provider.get_many(['FB', 'AMZN'], START, END, how='inner')
+    m = (EXAMPLE['date'] >= START) & (EXAMPLE['date'] < END)
+    assert np.allclose(prices['FB'], EXAMPLE.loc[m, 'price_l'])
+    assert np.allclose(prices['AMZN'], EXAMPLE.loc[m, 'price_r'])
+    with pytest.raises(PairsError):
+        provider.get('XYZ', START, END)
+
+    # timestamps with changing UTC offsets
+    EXAMPLE[['date', 'price_l']].rename(columns={'price_l': 'close'}).to_csv(
+        join(tmp.dir, 'FB_1h.csv'), index=False)
+    bars = provider.get('FB', START, END, interval='1h')
+    assert np.allclose(bars['close'], EXAMPLE.loc[m, 'price_l'])
+
+
+class SlowProvider(ProviderHandler):
+    """Records the peak number of concurrent requests"""
+
+    class Meta:
+        label = 'slow'
+
+    def __init__(self, **kw):
+        super().__init__(**kw)
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def get(self, symbol, start, end, interval='1d'):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.02)
+        with self.lock:
+            self.active -= 1
+        return pd.DataFrame({'date': PRICES.index[:5],
+                             'close': PRICES['FB'].iloc[:5].to_numpy()})
+
+
+def test_bounded_concurrency():
+    provider = SlowProvider(max_workers=3)
+    t = time.time()
+    prices = provider.get_many([f"S{i}" for i in range(12)], START, END)
+    assert prices.shape == (5, 12)
+    assert provider.peak == 3
+    assert time.time() - t < 12*0.02
+
+
+def test_get_pair():
+    df = get_pair('FB', 'AMZN', days=365*50,
+                  provider=MemoryProvider(data=PRICES))
+    pd.testing.assert_frame_equal(df, EXAMPLE[['date', 'price_l', 'price_r']],
+                                  check_names=False)
+
+
+def test_get_pair_same_symbol():
+    df = get_pair('FB', 'FB', days=365*50,
+                  provider=MemoryProvider(data=PRICES))
+    assert list(df.columns) == ['date', 'price_l', 'price_r']
+    assert df['price_l'].equals(df['price_r'])
+    assert df['price_l'].tolist() == EXAMPLE['price_l'].tolist()
+
+
+def test_resolved_from_config(tmp):
+    with PairsTest() as app:
+        app.config.merge({'provider.directory': {'path': tmp.dir}})
+        assert app.config.get('pairs', 'provider') == 'yahoo'
+        provider = app.handler.resolve('provider', 'directory', setup=True)
+        assert isinstance(provider, DirectoryProvider)
+        assert provider.path == tmp.dir
+        assert provider.max_workers == 4
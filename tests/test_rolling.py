@@ -0,0 +1,104 @@
+
+import numpy as np
+import pandas as pd
+from pairs.core.backtest import rolling
+from pairs.core.backtest.calculate_inputs import setup, setup_panel
+from pairs.core.backtest.helpers import load_example, synthetic_pair
+
+PARAMS = {
+    'window_std': 10,
+    'window_corr': 15,
+    'factor_std': 1.5,
+}
+
+
+def test_incremental_matches_pandas():
+    expected = setup(load_example(), PARAMS)
+    result = setup(load_example(), PARAMS, engine='incremental')
+    assert result.columns.tolist() == expected.columns.tolist()
+
+    # drift of the running moments versus pandas stays at rounding level
+    pd.testing.assert_frame_equal(result, expected, check_exact=False,
+                                  rtol=1e-8, atol=1e-10)
+
+
+def test_resync():
+    # recomputing the moments from the window contents changes nothing
+    df = load_example()
+    args = (df['price_l'], df['price_r'], 10, 15, 1.5)
+    expected = rolling.rolling_setup(*args)
+    result = rolling.rolling_setup(*args, resync=7)
+    for col in rolling.COLUMNS:
+        np.testing.assert_allclose(result[col], expected[col], rtol=1e-9)
+
+
+def test_missing_prices():
+    # like pandas, windows holding a NaN are undefined
+    df = load_example()
+    df.loc[200, 'price_r'] = np.nan
+    expected = setup(df, PARAMS)
+    result = setup(df, PARAMS, engine='incremental')
+    pd.testing.assert_frame_equal(result, expected, check_exact=False,
+                                  rtol=1e-8, atol=1e-10)
+
+
+def test_rolling_mean_std():
+    rng = np.random.default_rng(0)
+    a = 100 + np.cumsum(rng.normal(0, 1, (500, 3)), axis=0)
+    a[50, 1] = np.nan
+    mean, std = rolling.rolling_mean_std(a, 20)
+    expected = pd.DataFrame(a).rolling(20)
+    np.testing.assert_allclose(mean, expected.mean(), rtol=1e-10)
+    np.testing.assert_allclose(std, expected.std(), rtol=1e-8)
+
+
+
+def test_window_sum_blocks():
+    # sums restarted every few rows equal a single cumulative sum
+    rng = np.random.default_rng(0)
+    a = rng.normal(0, 1, (100, 2))
+    expected = pd.DataFrame(a).rolling(5, min_periods=1).sum()
+    for block in [1, 5, 7, 99, 100]:
+        np.testing.assert_allclose(rolling.window_sum(a, 5, block=block),
+                                   expected, rtol=1e-10)
+
+
+def test_setup_panel():
+    # every pair matches the setup of its two columns, with symbols
+    # shared between pairs
+    df = load_example()
+    df.loc[200, 'price_r'] = np.nan
+    prices = pd.DataFrame({'FB': df['price_l'], 'AMZN': df['price_r'],
+                           'FB2': 2*df['price_l']})
+    pairs = [(0, 1), (2, 1), (1, 0)]
+    cols = setup_panel(prices, pairs, PARAMS)
+    assert cols['std'].shape == (len(df), 3)
+    assert cols['spread'].shape == (len(df), 3)
+    for p, (l, r) in enumerate(pairs):
+        expected = setup(pd.DataFrame({
+            'date': df['date'],
+            'price_l': prices.iloc[:, l],
+            'price_r': prices.iloc[:, r],
+        }), PARAMS)
+        for col in ['corr_rolling', 'size_r', 'spread', 'spread_std',
+                    'spread_mean', 'band_upper', 'band_lower']:
+            np.testing.assert_allclose(cols[col][:, p], expected[col],
+                                       rtol=1e-8, atol=1e-10)
+        for col in ['signal_sell', 'signal_buy']:
+            assert (cols[col][:, p] == expected[col]).all()
+    np.testing.assert_allclose(cols['std'][:, 1], expected['std_l'],
+                               rtol=1e-10)
+
+
+def test_setup_panel_long():
+    # the rounding error of the cumulative sums does not grow with the
+    # length of the series
+    df = synthetic_pair(1_000_000)
+    cols = setup_panel(df[['price_l', 'price_r']], [(0, 1)], PARAMS)
+    expected = rolling.rolling_setup(df['price_l'], df['price_r'], 10, 15,
+                                     1.5)
+    for col in ['spread_std', 'spread_mean', 'corr_rolling']:
+        np.testing.assert_allclose(cols[col][:, 0], expected[col],
+                                   rtol=1e-7)
+    np.testing.assert_allclose(cols['std'][:, 0], expected['std_l'],
+                               rtol=1e-9)
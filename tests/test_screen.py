@@ -0,0 +1,89 @@
+
+import numpy as np
+import pandas as pd
+from pytest import raises
+from pairs.core.analyze import screen
+from pairs.core.analyze.cointegration import is_cointegrated
+from pairs.core.backtest.helpers import load_example
+from pairs.core.exc import PairsError
+from pairs.main import PairsTest
+
+
+def universe():
+    df = load_example().set_index('date')
+    rng = np.random.default_rng(0)
+    n = len(df)
+    return pd.DataFrame({
+        'FB': df['price_l'],
+        'AMZN': df['price_r'],
+        'FB2': df['price_l']*1.5 + rng.normal(0, 0.5, n),
+        'NOISE': 100 + rng.normal(0, 1, n).cumsum(),
+    })
+
+
+def test_prefilter():
+    returns = screen.returns_matrix(universe())
+    pairs, corr = screen.correlation_prefilter(returns, -1.0)
+    assert len(pairs) == 6
+    expected = np.corrcoef(returns.T)[pairs[:, 0], pairs[:, 1]]
+    np.testing.assert_allclose(corr, expected)
+
+    pairs, corr = screen.correlation_prefilter(returns, 0.9)
+    assert pairs.tolist() == [[0, 2]]
+
+
+def test_screen():
+    ranked = screen.screen(universe(), min_corr=0.3, max_workers=1)
+    pooled = screen.screen(universe(), min_corr=0.3, max_workers=2)
+    assert ranked.equals(pooled)
+    assert ranked['pvalue'].is_monotonic_increasing
+
+    # same outcome as the single pair test
+    row = ranked[(ranked['symbol_l'] == 'FB') & (ranked['symbol_r'] == 'AMZN')]
+    df = load_example()
+    assert row['is_cointegrated'].item() == is_cointegrated(df)
+
+
+
+def test_align_drops_short_history():
+    prices = universe()
+    full = screen.align(prices)
+    # a symbol listed halfway through is dropped instead of cutting the
+    # history of every other symbol
+    prices['NEW'] = prices['FB']
+    prices.iloc[:len(prices)//2, -1] = np.nan
+    messages = list()
+    aligned = screen.align(prices, log=messages.append)
+    pd.testing.assert_frame_equal(aligned, full)
+    assert len(messages) == 1 and 'NEW' in messages[0]
+    assert len(screen.align(prices, min_coverage=0)) == len(prices) // 2
+
+    ranked = screen.screen(prices, min_corr=0.3, max_workers=1)
+    assert 'NEW' not in set(ranked['symbol_l']) | set(ranked['symbol_r'])
+    assert ranked.equals(screen.screen(universe(), min_corr=0.3,
+                                       max_workers=1))
+
+
+def test_screen_needs_two_symbols():
+    with raises(PairsError):
+        screen.screen(universe()[['FB']])
+
+
+def test_screen_command(tmp):
+    fp = f"{tmp.dir}/panel.csv"
+    universe().reset_index().to_csv(fp, index=False)
+    argv = ['screen', '--file', fp, '--min-corr', '0.3', '-w', '1']
+    with PairsTest(argv=argv) as app:
+        app.run()
+        assert app.exit_code == 0
+
+
+def test_load_long_panel(tmp):
+    fp = f"{tmp.dir}/panel.csv"
+    long = (universe().reset_index()
+                      .melt(id_vars=['date'], var_name='symbol',
+                            value_name='close'))
+    long.to_csv(fp, index=False)
+    prices = screen.load_panel(fp)
+    assert sorted(prices.columns) == ['AMZN', 'FB', 'FB2', 'NOISE']
+    assert len(prices) == len(universe())
@@ -0,0 +1,77 @@
+
+import numpy as np
+import pandas as pd
+from pairs.core.backtest.backtest import backtest
+from pairs.core.backtest.calculate_inputs import setup
+from pairs.core.backtest.helpers import load_example
+from pairs.core.backtest.rolling import COLUMNS, rolling_setup
+from pairs.core.backtest.stream import PairSignalStream
+
+PARAMS = {
+    'window_std': 10,
+    'window_corr': 12,
+    'factor_std': 1.5,
+    'factor_profit_std': 0.75,
+    'factor_loss_size': 3,
+}
+
+
+def run_stream(df, params=PARAMS, **kw):
+    stream = PairSignalStream(params, **kw)
+    rows, values = list(), list()
+    for date, price_l, price_r in zip(df['date'], df['price_l'],
+                                      df['price_r']):
+        rows.append(stream.update(date, price_l, price_r))
+        values.append(stream.values())
+    return stream, pd.DataFrame(rows), pd.DataFrame(values)
+
+
+def test_same_values_as_setup():
+    df = load_example()
+    # a gap in the prices and frequent resyncs
+    df.loc[100, 'price_l'] = np.nan
+    batch = rolling_setup(df['price_l'], df['price_r'], PARAMS['window_std'],
+                          PARAMS['window_corr'], PARAMS['factor_std'],
+                          resync=50)
+    _, _, values = run_stream(df, resync=50)
+    for col in COLUMNS:
+        np.testing.assert_array_equal(values[col], batch[col])
+
+    _, rows, _ = run_stream(df)
+    expected = setup(df, dict(PARAMS), engine='incremental')
+    assert (rows['signal_buy'] == expected['signal_buy']).all()
+    assert (rows['signal_sell'] == expected['signal_sell']).all()
+    np.testing.assert_array_equal(rows['band_upper'], expected['band_upper'])
+
+
+def test_same_positions_as_backtest():
+    df = load_example()
+    _, positions, _, _ = backtest(df, params=dict(PARAMS), engine='compiled',
+                                  setup_engine='incremental')
+    stream, rows, _ = run_stream(df)
+    streamed = pd.DataFrame(stream.positions)
+    assert len(streamed) == len(positions) > 10
+    for col in streamed.columns:
+        if col in ['std_l', 'std_r']:
+            np.testing.assert_allclose(streamed[col], positions[col])
+        else:
+            assert (streamed[col] == positions[col]).all(), col
+
+    # events agree with the positions
+    assert rows['entry'].notna().sum() == len(positions) + \
+        (stream.position is not None)
+    assert (rows.loc[rows['exit'].notna(), 'date'].tolist()
+            == positions['date_exit'].tolist())
+    assert rows['profit'].notna().any()
+
+
+def test_exit_factor():
+    df = load_example()
+    params = dict(PARAMS, factor_exit_std=0.5)
+    _, positions, _, _ = backtest(df, params=dict(params), engine='compiled',
+                                  setup_engine='incremental')
+    stream, _, _ = run_stream(df, params)
+    streamed = pd.DataFrame(stream.positions)
+    assert len(streamed) == len(positions)
+    for col in ['date_entry', 'date_exit', 'side', 'exit_reason']:
+        assert streamed[col].tolist() == positions[col].tolist()
@@ -0,0 +1,68 @@
+
+from pytest import raises
+from pairs.core.backtest import sweep
+from pairs.core.backtest.helpers import load_example
+from pairs.core.exc import PairsError
+from pairs.main import PairsTest
+
+DEFAULTS = {
+    'window_std': 10,
+    'window_corr': 10,
+    'factor_std': 1.5,
+    'factor_profit_std': 0.75,
+    'factor_loss_size': 3,
+}
+
+
+def test_parse_values():
+    assert sweep.parse_values('5,10,20', int) == [5, 10, 20]
+    assert sweep.parse_values('5:20:5', int) == [5, 10, 15, 20]
+    assert sweep.parse_values('0.5:1.5:0.25') == [0.5, 0.75, 1.0, 1.25, 1.5]
+    with raises(PairsError):
+        sweep.parse_values('1:2')
+
+
+def test_make_grid():
+    grid = sweep.make_grid({'window_std': [5, 10], 'factor_std': [1, 2]},
+                           DEFAULTS)
+    assert len(grid) == 4
+    assert all(x['factor_profit_std'] == 0.75 for x in grid)
+    grid = sweep.make_grid({'window_std': [5]},
+                           dict(DEFAULTS, factor_exit_std=0.5))
+    assert grid[0]['factor_exit_std'] == 0.5
+    with raises(PairsError):
+        sweep.make_grid({'nope': [1]}, DEFAULTS)
+    with raises(PairsError, match='factor_loss_size'):
+        sweep.make_grid({'window_std': [5]},
+                        {k: v for k, v in DEFAULTS.items()
+                         if k != 'factor_loss_size'})
+
+
+def test_sweep_without_defaults():
+    grid = {k: [v] for k, v in DEFAULTS.items()}
+    grid['window_std'] = [5, 10]
+    results = sweep.sweep(load_example(), grid, max_workers=1)
+    assert sorted(results['param_window_std']) == [5, 10]
+
+
+def test_sweep():
+    grid = {'window_std': [5, 10], 'factor_std': [1.5, 50]}
+    serial = sweep.sweep(load_example(), grid, DEFAULTS, max_workers=1)
+    pooled = sweep.sweep(load_example(), grid, DEFAULTS, max_workers=2)
+    assert len(serial) == 4
+    assert serial['sum_profit'].is_monotonic_decreasing
+    assert serial.equals(pooled)
+
+    # bands this wide never trigger a trade
+    none = serial[serial['param_factor_std'] == 50]
+    assert (none['count_trades'] == 0).all()
+
+
+def test_sweep_command(tmp):
+    fp = f"{tmp.dir}/results.csv"
+    argv = ['sweep', '--factor-std', '1,2', '-w', '1', '-o', fp]
+    with PairsTest(argv=argv) as app:
+        app.run()
+        assert app.exit_code == 0
+    with open(fp) as f:
+        assert len(f.readlines()) == 3
@@ -0,0 +1,123 @@
+
+import numpy as np
+from pytest import raises
+from pairs.core.backtest import walkforward as wf
+from pairs.core.backtest.backtest import backtest
+from pairs.core.backtest.calculate_inputs import setup
+from pairs.core.backtest.costs import CostModel
+from pairs.core.backtest.helpers import load_example
+from pairs.core.exc import PairsError
+from pairs.main import PairsTest
+
+DEFAULTS = {
+    'window_std': 10,
+    'window_corr': 10,
+    'factor_std': 1.5,
+    'factor_profit_std': 0.75,
+    'factor_loss_size': 3,
+}
+
+
+def test_make_folds():
+    folds = wf.make_folds(100, 40, 25)
+    assert folds == [(0, 40, 65), (25, 65, 90), (50, 90, 100)]
+    # the test windows cover every bar after the first train window once
+    covered = np.concatenate([np.arange(b, c) for _, b, c in folds])
+    assert (covered == np.arange(40, 100)).all()
+    assert wf.make_folds(100, 40, 25, step=50) == [(0, 40, 65), (50, 90, 100)]
+    with raises(PairsError):
+        wf.make_folds(100, 100, 10)
+    # overlapping test windows would count bars and trades twice
+    with raises(PairsError):
+        wf.make_folds(100, 40, 25, step=10)
+
+
+def test_run_window():
+    df = setup(load_example(), dict(DEFAULTS), engine='incremental')
+    _, positions, _, _ = backtest(df=load_example(), params=dict(DEFAULTS),
+                                  engine='compiled',
+                                  setup_engine='incremental')
+    trades = wf.run_window(df, DEFAULTS, 0, len(df))
+    assert (trades['profit'] == positions['profit'].to_numpy()).all()
+
+    # no entries before the start, no exits after the stop
+    trades = wf.run_window(df, DEFAULTS, 200, 300)
+    assert len(trades)
+    assert (trades['idx_entry'] >= 200).all()
+    assert (trades['idx_exit'] < 300).all()
+
+
+def test_walk_forward():
+    grid = {'window_std': [5, 10], 'factor_profit_std': [0.5, 1]}
+    df = load_example()
+    serial = wf.walk_forward(df, grid, DEFAULTS, train=200, test=60,
+                             max_workers=1)
+    pooled = wf.walk_forward(df, grid, DEFAULTS, train=200, test=60,
+                             max_workers=2)
+    df_oos, positions, stats, folds = serial
+    assert len(df_oos) == len(df) - 200
+    assert len(folds) == 6
+    assert folds['count_trades_test'].sum() == stats['count_trades']
+    assert np.isclose(folds['sum_profit_test'].sum(), stats['sum_profit'])
+    assert stats['general_params'] == \
+        {k[6:]: v for k, v in folds.iloc[-1].items() if k.startswith('param_')}
+    assert positions['profit'].equals(pooled[1]['profit'])
+    assert folds.equals(pooled[3])
+
+    # every position is opened and closed within a test window
+    for _, row in folds.iterrows():
+        m = (positions['date_entry'] >= row['date_test']) \
+            & (positions['date_entry'] <= row['date_end'])
+        assert (positions.loc[m, 'date_exit'] <= row['date_end']).all()
+        assert m.sum() == row['count_trades_test']
+
+
+def test_walk_forward_no_trades():
+    _, positions, stats, folds = wf.walk_forward(
+        load_example(), {'factor_std': [50]}, DEFAULTS, train=200, test=100,
+        max_workers=1)
+    assert len(positions) == 0
+    assert stats['count_trades'] == 0
+    assert folds['score_train'].eq(0).all()
+
+
+def test_walk_forward_costs():
+    grid = {'window_std': [5, 10], 'factor_profit_std': [0.5, 1]}
+    df = load_example()
+    model = CostModel(commission=2)
+    _, gross, _, folds_gross = wf.walk_forward(df, grid, DEFAULTS, train=200,
+                                               test=60, max_workers=1)
+    _, positions, stats, folds = wf.walk_forward(
+        df, grid, DEFAULTS, train=200, test=60, max_workers=1, costs=model)
+    # ranked by the gross profit, the same params are picked
+    assert folds['score_train'].equals(folds_gross['score_train'])
+    assert positions['profit'].equals(gross['profit'])
+    assert (positions['cost'] > 0).all()
+    assert np.isclose(folds['sum_profit_net_test'].sum(),
+                      stats['sum_profit_net'])
+    assert np.isclose(stats['sum_profit_net'],
+                      stats['sum_profit'] - positions['cost'].sum())
+
+    # ranked net of costs, the train score is the best net profit
+    _, _, _, folds = wf.walk_forward(
+        df, grid, DEFAULTS, train=200, test=60, max_workers=2, costs=model,
+        metric='sum_profit_net')
+    train_start, test_start, _ = wf.make_folds(len(df), 200, 60)[0]
+    best = -np.inf
+    for params in wf.make_grid(grid, DEFAULTS):
+        d = setup(df, dict(params), engine='incremental')
+        trades = wf.run_window(d, params, train_start, test_start)
+        profits = wf.window_profits(d, trades, model)
+        best = max(best, profits['profit_net'].sum())
+    assert np.isclose(folds['score_train'].iat[0], best)
+
+
+def test_walk_forward_command(tmp):
+    fp = f"{tmp.dir}/positions.csv"
+    argv = ['walk-forward', '--window-std', '5,10', '--train', '200',
+            '--test', '100', '-w', '1', '-o', fp]
+    with PairsTest(argv=argv) as app:
+        app.run()
+        assert app.exit_code == 0
+    with open(fp) as f:
+        assert f.readline().startswith('date_entry,side')